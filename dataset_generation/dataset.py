@@ -1,30 +1,36 @@
-from os import devnull
+import sys
 from time import sleep
-from typing import List, Optional, Union
+from shutil import rmtree
+from subprocess import Popen
+from typing import List, Optional, Union, Dict, Tuple
 from pathlib import Path
-from subprocess import call
 from json import loads, dumps
-from array import array
 import numpy as np
-import pyaudio
 from tqdm import tqdm
 from tdw.tdw_utils import AudioUtils, TDWUtils
 from tdw.py_impact import PyImpact, ObjectInfo, AudioMaterial
-from tdw.output_data import Rigidbodies, Transforms, AudioSources
 from magnebot import ActionStatus
 from magnebot.scene_state import SceneState
-from magnebot.util import get_data
 from magnebot.constants import OCCUPANCY_CELL_SIZE
 from multimodal_challenge.multimodal_base import MultiModalBase
-from multimodal_challenge.paths import REHEARSAL_DIRECTORY, ENV_AUDIO_MATERIALS_PATH, DATASET_DIRECTORY,\
-    OBJECT_INIT_DIRECTORY, SCENE_BOUNDS_DIRECTORY
+from multimodal_challenge.paths import ENV_AUDIO_MATERIALS_PATH, DATASET_DIRECTORY
 from multimodal_challenge.util import get_scene_layouts, get_trial_filename
 from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
 from multimodal_challenge.trial import Trial
-from multimodal_challenge.encoder import Encoder
+from multimodal_challenge.base_layout import BaseLayout
 from multimodal_challenge.dataset.dataset_trial import DatasetTrial
 from multimodal_challenge.dataset.env_audio_materials import EnvAudioMaterials
 from multimodal_challenge.dataset.add_ons.occupancy_map import OccupancyMap
+from multimodal_challenge.dataset.settle_detector import SettleDetector
+from multimodal_challenge.dataset.settle_status import SettleStatus
+from multimodal_challenge.dataset.frame_state import FrameState
+from multimodal_challenge.dataset.occupancy_rasterizer import OccupancyRasterizer
+from multimodal_challenge.dataset.audio_renderer import AudioRenderer
+from multimodal_challenge.dataset.wav_trimmer import WavTrimmer
+from multimodal_challenge.dataset.trial_writer import TrialWriter
+from multimodal_challenge.dataset.command_log import CommandLog
+from multimodal_challenge.dataset.trial_manifest import TrialManifest
+from multimodal_challenge.dataset.rehearsal_reader import RehearsalReader
 
 
 class Dataset(MultiModalBase):
@@ -45,10 +51,9 @@ class Dataset(MultiModalBase):
       ```
       2. To create new initialization data, run [`rehearsal.py`](rehearsal.md) to generate the initialization data.
 
-    - Audio drivers
-    - [fmedia](https://stsaz.github.io/fmedia/)
-    - ffmpeg
-    - [`PyAudio`](https://people.csail.mit.edu/hubert/pyaudio/) If you're using Windows and Python 3.7 or later, use a wheel from [this site](https://www.lfd.uci.edu/~gohlke/pythonlibs/) and install it via: `pip3 install path/to/the/downloaded.whl` (replace this with the actual path to the downloaded file)
+    - Audio drivers (not required if `--offline_audio` is included)
+    - [fmedia](https://stsaz.github.io/fmedia/) (not required if `--offline_audio` is included)
+    - [`PyAudio`](https://people.csail.mit.edu/hubert/pyaudio/) (not required if `--offline_audio` is included) If you're using Windows and Python 3.7 or later, use a wheel from [this site](https://www.lfd.uci.edu/~gohlke/pythonlibs/) and install it via: `pip3 install path/to/the/downloaded.whl` (replace this with the actual path to the downloaded file)
 
     # Usage
 
@@ -88,14 +93,43 @@ class Dataset(MultiModalBase):
     | Argument | Default | Description |
     | --- | --- | --- |
     | `--random_seed` | 0 | The random seed. |
+    | `--offline_audio` | | If included, render the impact sounds in Python instead of recording the system audio. This is faster than real time and doesn't require a sound card. |
+    | `--no_reverb` | | If included with `--offline_audio`, don't apply a reverb approximation to the rendered audio. |
+    | `--json` | | If included, write the trial data as .json files instead of .bin files. |
+    | `--rasterize` | | If included, create the occupancy map of each trial from the bounds of each object with an [`OccupancyRasterizer`](../api/occupancy_rasterizer.md) instead of with raycasts in the build. |
+    | `--log` | | If included, log the commands sent to the build to compressed files in `log/`. To read the log: `python3 util/read_command_log.py` |
+    | `--log_interval` | 1 | If `--log` is included, log every nth frame. |
+    | `--log_skip_empty` | | If `--log` is included, don't log frames without any commands. |
+    | `--port` | 1071 | The socket port. If `--num_shards` is greater than 1, this is the port of the first worker. |
+    | `--num_shards` | 1 | The number of worker processes. See below. |
+    | `--shard` | -1 | The index of the shard of this worker process. This is set automatically by `--num_shards`. |
+    | `--merge` | | If included, don't generate any trials. Merge every completed scene_layout combination in `shards/` into the dataset directory. |
+    | `--regenerate` | | If included, regenerate only these trials. See below. |
+    | `--regenerate_path` | | If included, regenerate only the trials listed in this text file. See below. |
 
     Example: `python3 dataset.py --random_seed 12345`
 
+    ## Sharded generation
+
+    If `--num_shards` is greater than 1, the scene_layout combinations are divided between `--num_shards` worker processes. Each worker has its own port (`--port`, `--port` + 1, etc.) and writes to its own shard directory: `shards/0/`, `shards/1/`, etc. When every worker is done, every completed scene_layout combination is merged into the dataset directory.
+
+    You must launch a build for each worker, for example: `./TDW.x86_64 -port=1072`. Sharded generation requires `--offline_audio` because the workers can't share a system audio device.
+
+    The random seed of each trial is selected from `random_seeds.npy` by the index of the trial in the entire dataset, so the dataset is the same regardless of the number of shards.
+
+    ## Regenerating trials
+
+    To regenerate specific completed trials, for example to fix a bad trial: `python3 dataset.py --regenerate mm_kitchen_1a_0/00005 mm_kitchen_1a_1/00012`
+
+    To regenerate a long list of trials, write each trial on a separate line of a text file: `python3 dataset.py --regenerate_path trials.txt`
+
+    Each trial is regenerated with its original random seed and `DatasetTrial` parameters. No other trials are modified. The trials are grouped by scene_layout combination.
+
     # How it works
 
     **Per scene_layout combination:**
 
-    1. Load the corresponding object init data and the [`DatasetTrial`](../api/dataset_trial.md) data from rehearsal.py
+    1. Load the corresponding object init data and open the [`DatasetTrial`](../api/dataset_trial.md) data from rehearsal.py with a [`RehearsalReader`](../api/rehearsal_reader.md). Each `DatasetTrial` is read when its trial starts.
 
     **Per trial:**
 
@@ -106,24 +140,34 @@ class Dataset(MultiModalBase):
     5. Initialize audio in the scene and audio recording.
     6. Let the object fall. Use PyImpact to generate collisions.
     7. The trial stops either when the sound stops playing or if a maximum number of frames has been reached.
-    8. Save the results to disk.
+    8. Record the trajectory of the target object.
+    9. Save the results to disk on a background thread while the next trial starts. Leading and trailing silence is removed from the audio.
+
+    If `--offline_audio` is included, the impact sounds generated by PyImpact aren't played in the build. Instead, an [`AudioRenderer`](../api/audio_renderer.md) mixes them at their simulation timestamps. The trial stops as soon as the target object stops moving and there are no more collisions. The reverb is approximated from the room size and the [`EnvAudioMaterials`](../api/env_audio_materials.md) of the scene.
 
     **Result:** A directory dataset files. The dataset has a `random_seeds.npy` file that is used to select random seeds per trial.
 
     Each trial is saved in a `scene_layout` directory and has three files:
     
-    1. A .json file of the [`Trial` data](../api/trial.md).
+    1. The [`Trial` data](../api/trial.md) as a .bin file, written by [`ColumnarEncoder`](../api/columnar_encoder.md). If `--json` is included, the trial data is written as a .json file instead.
     2. An audio .wav audio file.
     3. The occupancy map as a .npy numpy file.
+
+    Each `scene_layout` directory also has a `manifest.json` file, a [`TrialManifest`](../api/trial_manifest.md) of every completed trial. If `dataset.py` is stopped, it resumes from the last trial in each manifest.
+    
+    To verify every completed trial: `python3 util/verify_dataset.py`
+
+    To summarize the dataset, for example the mean distance between the Magnebot and the target object per scene: `python3 util/dataset_stats.py --column target_distance --by scene`. Per-trial statistics are cached by [`DatasetStats`](../api/dataset_stats.md) and only new or changed trials are processed.
     
     ```
     D:/multimodal_challenge/
     ....random_seeds.npy
     ....mm_kitchen_1a_0/  # scene_layout
-    ........00000.json
+    ........manifest.json
+    ........00000.bin
     ........00000.wav
     ........00000.npy
-    ........00001.json
+    ........00001.bin
     ........00001.wav
     ........00001.npy
     ........(etc.)
@@ -131,10 +175,6 @@ class Dataset(MultiModalBase):
     ```
     """
 
-    """:class_var
-    The PyAudio object. This is used to determine when a trial ends (when the audio stops playing).
-    """
-    PY_AUDIO: pyaudio.PyAudio = pyaudio.PyAudio()
     """:class_var
     PyImpact initial amp value.
     """
@@ -147,22 +187,52 @@ class Dataset(MultiModalBase):
     The path to the temporary audio file.
     """
     TEMP_AUDIO_PATH: Path = DATASET_DIRECTORY.joinpath("temp.wav")
+    """:class_var
+    If the target object doesn't stop moving and stop making sounds after this many frames, the trial ends.
+    """
+    MAX_SETTLE_FRAMES: int = 1000
+    """:class_var
+    The maximum number of frames that can be skipped while the target object is in free fall. Frames are never skipped when the bottom of the target object is near a surface or after its first impact because every collision must generate audio.
+    """
+    MAX_FREE_FALL_SKIPPED_FRAMES: int = 5
+    """:class_var
+    The approximate height of each room in meters. This is used to estimate the reverb of the offline audio.
+    """
+    ROOM_HEIGHT: float = 3
+    """:class_var
+    The maximum number of trials that can be waiting to be written to disk. If there are this many trials, the next trial won't start until the oldest trial is written.
+    """
+    MAX_PENDING_TRIALS: int = 4
 
-    def __init__(self, port: int = 1071, random_seed: int = 0, log: bool = True):
+    def __init__(self, port: int = 1071, random_seed: int = 0, log: bool = True, offline_audio: bool = False,
+                 reverb: bool = True, log_interval: int = 1, log_skip_empty: bool = False,
+                 output_directory: Path = DATASET_DIRECTORY, scene_layouts: List[str] = None,
+                 export_json: bool = False, rasterize: bool = False):
         """
         Create the network socket and bind the socket to the port.
 
         :param port: The port number.
         :param random_seed: The seed for the random number generator.
         :param log: If True, log each list of commands sent.
+        :param offline_audio: If True, render the impact sounds in Python instead of recording the system audio.
+        :param reverb: If True and `offline_audio == True`, apply a reverb approximation to the rendered audio.
+        :param log_interval: If `log == True`, log every nth list of commands.
+        :param log_skip_empty: If True and `log == True`, don't log empty lists of commands.
+        :param output_directory: The directory of the scene_layout directories. This is either the dataset directory or a shard directory.
+        :param scene_layouts: The scene_layout combinations that this controller will generate, for example `["mm_kitchen_1a_0"]`. If None, generate every scene_layout combination.
+        :param export_json: If True, write the trial data as .json files instead of .bin files.
+        :param rasterize: If True, create the occupancy map of each trial with an `OccupancyRasterizer` instead of with raycasts.
         """
         
-        if not DATASET_DIRECTORY.exists():
-            DATASET_DIRECTORY.mkdir(parents=True)
-        self._log: bool = log
-        self._log_path: Path = DATASET_DIRECTORY.joinpath("log.txt")
-        if self._log_path.exists():
-            self._log_path.unlink()
+        if not output_directory.exists():
+            output_directory.mkdir(parents=True)
+        # The log of commands sent to the build.
+        if log:
+            self._command_log: Optional[CommandLog] = CommandLog(directory=output_directory.joinpath("log"),
+                                                                 interval=log_interval,
+                                                                 skip_empty=log_skip_empty)
+        else:
+            self._command_log: Optional[CommandLog] = None
         super().__init__(port=port, random_seed=random_seed, screen_height=128, screen_width=128, skip_frames=0)
         self.communicate([{"$type": "set_render_quality",
                            "render_quality": 0},
@@ -181,9 +251,13 @@ class Dataset(MultiModalBase):
         """
         self.layout: int = -1
         """:field
-        Parameters to define each trial. See: `rehearsal.py`.
+        The [`RehearsalReader`](../api/rehearsal_reader.md) of the parameters of each trial in the current scene_layout combination. See: `rehearsal.py`.
         """
-        self.trials: List[DatasetTrial] = list()
+        self.rehearsal: Optional[RehearsalReader] = None
+        """:field
+        The parameters of the current trial.
+        """
+        self.dataset_trial: Optional[DatasetTrial] = None
         """:field
         The ID of the target object in the current trial.
         """
@@ -196,46 +270,111 @@ class Dataset(MultiModalBase):
         A dummy object ID for the environment. This is reassigned per trial.
         """
         self.env_id: int = -1
-        # The PyAudio device index.
-        self._device_index: int = Dataset._get_pyaudio_device_index()
+        """:field
+        The directory of the scene_layout directories. This is either the dataset directory or a shard directory.
+        """
+        self.output_directory: Path = output_directory
+        """:field
+        The scene_layout combinations that this controller will generate. If None, generate every scene_layout combination.
+        """
+        self.scene_layouts: Optional[List[str]] = scene_layouts
+        """:field
+        If True, render the impact sounds in Python instead of recording the system audio.
+        """
+        self.offline_audio: bool = offline_audio
+        """:field
+        If True and `offline_audio == True`, apply a reverb approximation to the rendered audio.
+        """
+        self.reverb: bool = reverb
+        """:field
+        The [`AudioRenderer`](../api/audio_renderer.md) used if `offline_audio == True`.
+        """
+        self.audio_renderer: AudioRenderer = AudioRenderer()
+        """:field
+        The [`WavTrimmer`](../api/wav_trimmer.md) used to remove silence from the audio and to determine when the system audio is silent.
+        """
+        self.wav_trimmer: WavTrimmer = WavTrimmer()
+        """:field
+        The [`TrialWriter`](../api/trial_writer.md) that saves each trial to disk on a background thread.
+        """
+        self.trial_writer: TrialWriter = TrialWriter(max_size=Dataset.MAX_PENDING_TRIALS, wav_trimmer=self.wav_trimmer,
+                                                     audio_renderer=self.audio_renderer, export_json=export_json)
+        # The PyAudio object and device index. These are used to determine when the audio stops playing.
+        if self.offline_audio:
+            self._py_audio = None
+            self._device_index: int = -1
+        else:
+            # Import PyAudio only if it's needed so that offline audio doesn't require PortAudio or a sound card.
+            import pyaudio
+            self._py_audio = pyaudio.PyAudio()
+            self._device_index: int = self._get_pyaudio_device_index()
         # A list of random seeds per trial. We can use these to re-create any trial exactly the same every time,
         # which allows us to pause/resume dataset generation without inadvertantly changing it.
+        # The seed used to generate `random_seeds.npy`.
+        self._random_seed: int = random_seed
         self._random_seeds: np.array = np.array([])
         self._random_seed_index: int = 0
+        # The index of the first trial of each scene_layout combination in the entire dataset.
+        self._trial_offsets: Dict[str, int] = dict()
         # The IDs of the target object and the distractors.
         self._extra_object_ids: List[int] = list()
+        # The commands to add each scene object (not the target object or the distractors) in a scene_layout combination.
+        # Key = The object ID, in the order of the base layout. These are created once per scene_layout combination.
+        self._base_object_init_commands: Dict[int, List[dict]] = dict()
+        # The scene_layout combination of `self._base_object_init_commands`.
+        self._base_object_init_scene_layout: str = ""
+        """:field
+        The [`SettleDetector`](../api/settle_detector.md) used to determine when the target object stops moving.
+        """
+        self.settle_detector: SettleDetector = SettleDetector(max_frames=Dataset.MAX_SETTLE_FRAMES,
+                                                              min_step=0,
+                                                              max_step=Dataset.MAX_FREE_FALL_SKIPPED_FRAMES,
+                                                              min_y=-1)
+        """:field
+        The [`FrameState`](../api/frame_state.md) used to read the output data of each frame of a trial.
+        """
+        self.frame_state: FrameState = FrameState(max_trajectory_length=Dataset.MAX_SETTLE_FRAMES)
+        """:field
+        If True, create the occupancy map of each trial with an [`OccupancyRasterizer`](../api/occupancy_rasterizer.md) instead of with raycasts.
+        """
+        self.rasterize: bool = rasterize
+        # The occupancy map rasterizer of the current scene_layout combination.
+        self._occupancy_rasterizer: Optional[OccupancyRasterizer] = None
+        # The scene_layout combination of `self._occupancy_rasterizer`.
+        self._occupancy_rasterizer_scene_layout: str = ""
 
     def run(self) -> None:
         """
         Generate the entire dataset for each scene_layout combination.
         """
 
-        random_seed_path = DATASET_DIRECTORY.joinpath("random_seeds.npy").resolve()
-        # Load existing random seeds.
-        if random_seed_path.exists():
-            self._random_seeds = np.load(str(random_seed_path))
-        # Generate new random seeds for every trial.
-        else:
-            # Get the total number of trials.
-            num_trials: int = 0
-            for f in REHEARSAL_DIRECTORY.iterdir():
-                if f.is_file() and f.suffix == ".json":
-                    num_trials += len(loads(f.read_text(encoding="utf-8")))
-            # Generate random seeds.
-            self._random_seeds = self._rng.randint(low=0, high=2**31 - 1, size=num_trials, dtype=int)
-            # Save them to disk.
-            np.save(str(random_seed_path.resolve())[:-4], self._random_seeds)
-        pbar = tqdm(total=len(self._random_seeds))
-        scene_layouts = get_scene_layouts()
-        for scene in scene_layouts:
-            for layout in range(scene_layouts[scene]):
-                self.do_trials(scene=scene, layout=layout, pbar=pbar)
+        self._trial_offsets, num_trials = Dataset.get_trial_offsets(directory=self.output_directory)
+        self._random_seeds = Dataset.get_random_seeds(random_seed=self._random_seed, num_trials=num_trials)
+        # Get this controller's scene_layout combinations.
+        scene_layouts: List[Tuple[str, int]] = list()
+        total: int = 0
+        for scene_layout in self._trial_offsets:
+            if self.scene_layouts is not None and scene_layout not in self.scene_layouts:
+                continue
+            # Skip scene_layout combinations that were already merged from another shard.
+            if self.output_directory != DATASET_DIRECTORY and \
+                    TrialManifest(directory=DATASET_DIRECTORY.joinpath(scene_layout)).is_complete():
+                continue
+            scene, layout = scene_layout.rsplit("_", 1)
+            scene_layouts.append((scene, int(layout)))
+            total += Dataset._get_num_trials(scene=scene, layout=int(layout), directory=self.output_directory)
+        pbar = tqdm(total=total)
+        for scene, layout in scene_layouts:
+            self.do_trials(scene=scene, layout=layout, pbar=pbar)
+        # Write the number of frames that it took for the target object to stop moving.
+        self.output_directory.joinpath("settle_statistics.json").write_text(
+            dumps(self.settle_detector.get_statistics(), indent=2), encoding="utf-8")
         self.end()
 
     def do_trials(self, scene: str, layout: int, pbar: tqdm) -> None:
         """
         Get the cached trial initialization data for a scene_layout combination and do each trial.
-        This will try to avoid overwriting existing trial results.
+        Resume from the last trial in the scene_layout's [`TrialManifest`](../api/trial_manifest.md). Any files of an incomplete trial are overwritten.
         This will start a thread to listen to audio on the sound card to determine if a trial is done.
 
         :param scene: The name of the scene.
@@ -247,40 +386,94 @@ class Dataset(MultiModalBase):
         # Remember the name of the scene.
         self.scene = scene
         self.layout = layout
-        output_directory = DATASET_DIRECTORY.joinpath(f"{scene}_{layout}")
+        output_directory = self.output_directory.joinpath(f"{scene}_{layout}")
         if not output_directory.exists():
             output_directory.mkdir(parents=True)
 
         # Get the environment audio materials.
         data = loads(ENV_AUDIO_MATERIALS_PATH.read_text(encoding="utf-8"))
         self.env_audio_materials = EnvAudioMaterials(**data[scene])
-        self.trial_count: int = 0
-        # Get the last trial number, to prevent overwriting files.
-        for f in output_directory.iterdir():
-            # Get the last trial completed.
-            if f.is_file() and f.suffix == ".json":
-                # Increment the random seed index.
-                self._random_seed_index += 1
-                # Try to get the last trial.
-                self.trial_count += 1
-        # Load the cached trial data.
-        self.trials = [DatasetTrial(**d) for d in
-                       loads(REHEARSAL_DIRECTORY.joinpath(f"{scene}_{layout}.json").read_text(encoding="utf-8"))]
+        # Get the last completed trial.
+        manifest = TrialManifest(directory=output_directory)
+        # Save the manifest of a scene_layout directory that was generated by an older version of `dataset.py`.
+        manifest.migrate()
+        self.trial_count: int = manifest.get_num_completed()
+        # The random seed index is the index of the trial in the entire dataset.
+        self._random_seed_index = self._trial_offsets[f"{scene}_{layout}"] + self.trial_count
         pbar.update(self.trial_count)
         # We already completed this portion of the dataset.
-        if self.trial_count == len(self.trials):
+        if manifest.is_complete():
             return
+        # Open the cached trial data. Each trial is read when it starts.
+        self.rehearsal = RehearsalReader(scene=scene, layout=layout)
+        manifest.set_num_trials(self.rehearsal.get_num_trials())
         try:
             # Initialize the scene and do the trial.
             pbar.set_description(f"{scene}_{layout}")
-            for i in range(self.trial_count, len(self.trials)):
-                self.do_trial(output_directory=output_directory)
+            for i in range(self.trial_count, self.rehearsal.get_num_trials()):
+                self.do_trial(output_directory=output_directory, manifest=manifest)
                 pbar.update(1)
         # Stop fmedia from recording.
         finally:
-            AudioUtils.stop()
+            if not self.offline_audio:
+                AudioUtils.stop()
+            self.rehearsal.close()
 
-    def do_trial(self, output_directory: Path) -> None:
+    def regenerate(self, targets: List[Tuple[str, int, int]]) -> None:
+        """
+        Regenerate specific completed trials with their original random seeds and `DatasetTrial` parameters. Every other trial is left alone.
+        The targets are grouped by scene_layout combination so that each scene_layout combination is set up only once.
+        Every target is checked before any trial is regenerated: it must be a completed trial and its scene_layout combination must have rehearsal data.
+
+        :param targets: A list of tuples: The name of the scene, the layout index, and the trial index.
+        """
+
+        self._trial_offsets, num_trials = Dataset.get_trial_offsets(directory=self.output_directory)
+        self._random_seeds = Dataset.get_random_seeds(random_seed=self._random_seed, num_trials=num_trials)
+        # Group the targets by scene_layout combination.
+        groups: Dict[Tuple[str, int], List[int]] = dict()
+        for scene, layout, trial in targets:
+            if (scene, layout) not in groups:
+                groups[(scene, layout)] = list()
+            if trial not in groups[(scene, layout)]:
+                groups[(scene, layout)].append(trial)
+        # Check every target first so that an invalid target doesn't leave the dataset partially regenerated.
+        manifests: Dict[Tuple[str, int], TrialManifest] = dict()
+        for (scene, layout), trials in groups.items():
+            if not RehearsalReader.exists(scene=scene, layout=layout):
+                raise Exception(f"Can't regenerate {scene}_{layout} because there is no rehearsal data.")
+            manifest = TrialManifest(directory=self.output_directory.joinpath(f"{scene}_{layout}"))
+            # Only completed trials can be regenerated. Otherwise, the manifest would have gaps.
+            for trial in trials:
+                if get_trial_filename(trial) not in manifest.trials:
+                    raise Exception(f"Can't regenerate {scene}_{layout} trial {trial} because it isn't complete.")
+            manifests[(scene, layout)] = manifest
+        pbar = tqdm(total=sum([len(trials) for trials in groups.values()]))
+        for (scene, layout), trials in groups.items():
+            output_directory = self.output_directory.joinpath(f"{scene}_{layout}")
+            manifest = manifests[(scene, layout)]
+            self._start_action()
+            self.scene = scene
+            self.layout = layout
+            # Get the environment audio materials.
+            data = loads(ENV_AUDIO_MATERIALS_PATH.read_text(encoding="utf-8"))
+            self.env_audio_materials = EnvAudioMaterials(**data[scene])
+            self.rehearsal = RehearsalReader(scene=scene, layout=layout)
+            try:
+                pbar.set_description(f"{scene}_{layout}")
+                for trial in sorted(trials):
+                    self.trial_count = trial
+                    self._random_seed_index = self._trial_offsets[f"{scene}_{layout}"] + trial
+                    self.do_trial(output_directory=output_directory, manifest=manifest)
+                    pbar.update(1)
+            finally:
+                if not self.offline_audio:
+                    AudioUtils.stop()
+                self.rehearsal.close()
+        pbar.close()
+        self.end()
+
+    def do_trial(self, output_directory: Path, manifest: TrialManifest) -> None:
         """
         Initialize the scene. This will add the target (dropped) object, the scene objects, and the Magnebot,
         as well as set a position, rotation, torso height, column rotation, and camera angles for the Magnebot.
@@ -289,10 +482,13 @@ class Dataset(MultiModalBase):
         if the simulation continued for too long.
 
         :param output_directory: The output directory for the trial data.
+        :param manifest: The manifest of the output directory.
         """
 
         # Set the next random seed.
         self._rng = np.random.RandomState(self._random_seeds[self._random_seed_index])
+        # Read the parameters of the trial.
+        self.dataset_trial = self.rehearsal.get_trial(self.trial_count)
         # Initialize the scene.
         self.init_scene(scene=self.scene, layout=self.layout)
         # Get the PyImpact audio materials for the floor and walls.
@@ -315,68 +511,84 @@ class Dataset(MultiModalBase):
                 size=1,
                 library="")
         try:
-            # Start recording the audio.
-            AudioUtils.start(output_path=Dataset.TEMP_AUDIO_PATH)
-            # Add a little silence to catch a potential clicking effect.
-            sleep(0.1)
+            if self.offline_audio:
+                self.audio_renderer.start()
+            else:
+                # Start recording the audio.
+                AudioUtils.start(output_path=Dataset.TEMP_AUDIO_PATH)
+                # Add a little silence to catch a potential clicking effect.
+                sleep(0.1)
             # These commands must be sent here because `init_scene()` will try to make the Magnebot movable.
             # Also, we need some extra output data to handle audio recording.
-            resp = self.communicate([{"$type": "send_rigidbodies",
-                                      "frequency": "always"},
-                                     {"$type": "set_immovable",
-                                      "immovable": True},
-                                     {"$type": "enable_image_sensor",
-                                      "enable": False},
-                                     {"$type": "send_audio_sources",
-                                      "frequency": "always"}])
+            commands = [{"$type": "send_rigidbodies",
+                         "frequency": "always"},
+                        {"$type": "set_immovable",
+                         "immovable": True},
+                        {"$type": "enable_image_sensor",
+                         "enable": False}]
+            # The settle detector needs the bounds of the target object to estimate when it will hit a surface.
+            # Transforms and rigidbodies are already requested for every object.
+            self.settle_detector.start(object_ids=[self.target_object_id])
+            commands.extend(self.settle_detector.get_output_data_commands(bounds_only=True))
+            resp = self.communicate(commands)
             done: bool = False
-            below_floor = False
-            num_frames: int = 0
+            # If True, there was at least one impact. After the first impact, every frame is needed for audio.
+            impacted: bool = False
+            self.frame_state.start(object_ids=list(self.objects_static.keys()), target_object_id=self.target_object_id)
             # Let the simulation run until there's too many frames or if there's no audio.
-            while not done and num_frames < 1000:
+            while not done:
                 # Get impact sound commands.
                 commands = Dataset.PY_IMPACT.get_audio_commands(resp=resp, floor=floor, wall=wall, resonance_audio=True)
+                pending_audio = len(commands) > 0
+                impacted = impacted or pending_audio
                 # Check if the object stopped moving (there won't be audio or collisions while it's falling).
-                rigidbodies = get_data(resp=resp, d_type=Rigidbodies)
-                sleeping = False
-                for i in range(rigidbodies.get_num()):
-                    if rigidbodies.get_id(i) == self.target_object_id:
-                        sleeping = rigidbodies.get_sleeping(i)
-                        break
-                transforms = get_data(resp=resp, d_type=Transforms)
-                # Stop if the object somehow fell below the floor.
-                for i in range(transforms.get_num()):
-                    if transforms.get_id(i) == self.target_object_id:
-                        below_floor = transforms.get_position(i)[1] < -1
-                        break
-                audio = get_data(resp=resp, d_type=AudioSources)
+                status = self.settle_detector.update(resp=resp)
+                # Read the positions, velocities, and audio sources of this frame.
+                self.frame_state.update(resp=resp, frame=self.settle_detector.frames)
                 audio_playing = False
-                for i in range(audio.get_num()):
-                    if audio.get_is_playing(i):
-                        audio_playing = True
-                        break
+                if self.offline_audio:
+                    # Mix the impact sounds in Python instead of playing them in the build.
+                    # The commands will be executed at the current physics frame of the detection.
+                    self.audio_renderer.add_commands(commands=commands, frame=self.settle_detector.frames)
+                    commands = list()
+                else:
+                    audio_playing = self.frame_state.is_playing()
+                    # Request audio source data for any object that is about to play audio for the first time.
+                    commands.extend(self.frame_state.get_audio_sources_commands(commands=commands))
                 # This trial is done if the object isn't moving, there's no audio playing, and no pending collisions.
-                if below_floor or (sleeping and not audio_playing and len(commands) == 0):
+                # Stop if the object somehow fell below the floor or if there were too many frames.
+                if status == SettleStatus.below_floor or status == SettleStatus.timeout or \
+                        (status == SettleStatus.settled and not audio_playing and not pending_audio):
                     done = True
                 else:
+                    # Skip frames only while the object is falling before its first impact.
+                    if impacted:
+                        self.settle_detector.step = 0
+                    else:
+                        commands.extend(self.settle_detector.get_raycast_commands())
+                    self._skip_frames = self.settle_detector.step
                     resp = self.communicate(commands)
-                num_frames += 1
+            self._skip_frames = 0
+            self.settle_detector.end(status=status)
+            below_floor = status == SettleStatus.below_floor
             # Resonance Audio might continue generating reverb after the AudioSource finishes.
             # So we'll listen to the system audio until we can't hear anything.
-            self._listen_for_audio()
+            if not self.offline_audio:
+                self._listen_for_audio()
         finally:
-            AudioUtils.stop()
+            if not self.offline_audio:
+                AudioUtils.stop()
 
-        # Convert the current state of each object to initialization data.
-        state = SceneState(resp=self.communicate([]))
+        # Convert the current state of each object to initialization data. Stop requesting bounds.
+        state = SceneState(resp=self.communicate(self.settle_detector.get_stop_commands()))
         # If the object fell through the floor, snap it to floor level (y=0).
         if below_floor:
             state.object_transforms[self.target_object_id].position[1] = 0
 
-        # Capture the state of each object.
+        # Capture the state of each object. The scene objects are in the order of the base layout.
         object_init_data: List[MultiModalObjectInitData] = list()
         target_object_index: int = -1
-        for o_id in self.objects_static:
+        for o_id in list(self._base_object_init_commands.keys()) + self._extra_object_ids:
             i = MultiModalObjectInitData(name=self.objects_static[o_id].name,
                                          kinematic=self.objects_static[o_id].kinematic,
                                          position=TDWUtils.array_to_vector3(state.object_transforms[o_id].position),
@@ -389,36 +601,49 @@ class Dataset(MultiModalBase):
             object_init_data.append(i)
 
         # Re-create the occupancy map to include the distractors and the target object.
-        occupancy_mapper = OccupancyMap(cell_size=OCCUPANCY_CELL_SIZE)
-        resp = self.communicate(occupancy_mapper.get_initialization_commands())
-        occupancy_mapper.initialized = True
-        occupancy_mapper.on_send(resp=resp)
-        occupancy_mapper.generate()
-        resp = self.communicate(occupancy_mapper.commands)
-        occupancy_mapper.on_send(resp=resp)
-        self.occupancy_map = occupancy_mapper.occupancy_map
-
-        # Update the scene state (just in case something actually moved).
-        state = SceneState(resp=resp)
+        if self.rasterize:
+            scene_layout = f"{self.scene}_{self.layout}"
+            if scene_layout != self._occupancy_rasterizer_scene_layout:
+                self._occupancy_rasterizer = OccupancyRasterizer(scene=self.scene, layout=self.layout)
+                self._occupancy_rasterizer_scene_layout = scene_layout
+            self.occupancy_map = self._occupancy_rasterizer.rasterize(objects=object_init_data)
+        else:
+            occupancy_mapper = OccupancyMap(cell_size=OCCUPANCY_CELL_SIZE)
+            self.add_ons.append(occupancy_mapper)
+            self.communicate([])
+            occupancy_mapper.generate()
+            resp = self.communicate([])
+            self.add_ons.remove(occupancy_mapper)
+            self.occupancy_map = occupancy_mapper.occupancy_map
+            # Update the scene state (just in case something actually moved).
+            state = SceneState(resp=resp)
         # Create the trial.
         trial = Trial(object_init_data=object_init_data,
                       target_object_index=target_object_index,
                       magnebot_rotation=state.magnebot_transform.rotation,
-                      magnebot_position=state.magnebot_transform.position)
+                      magnebot_position=state.magnebot_transform.position,
+                      target_object_trajectory=self.frame_state.get_trajectory(),
+                      scene_layout=f"{self.scene}_{self.layout}")
         # Get the zero-padded filename.
         filename = get_trial_filename(self.trial_count)
-        # Save the trial.
-        output_directory.joinpath(f"{filename}.json").write_text(dumps(trial, cls=Encoder), encoding="utf-8")
-        # Save the occupancy map.
-        np.save(str(output_directory.joinpath(filename).resolve()), self.occupancy_map)
-        # Use ffmpeg to remove the initial silence.
-        with open(devnull, "w+") as f:
-            call(["ffmpeg", "-i", str(Dataset.TEMP_AUDIO_PATH.resolve()),
-                  "-ss", "00:00:00.1",
-                  str(output_directory.joinpath(f"{filename}.wav"))],
-                 stderr=f)
-        # Move the audio file.
-        Dataset.TEMP_AUDIO_PATH.unlink()
+        if self.offline_audio:
+            # Mix the impact sounds.
+            if self.reverb:
+                reverb_time = self.env_audio_materials.get_reverb_time(
+                    width=self._scene_bounds.x_max - self._scene_bounds.x_min,
+                    length=self._scene_bounds.z_max - self._scene_bounds.z_min,
+                    height=Dataset.ROOM_HEIGHT)
+            else:
+                reverb_time = 0
+            audio: Union[Path, np.array] = self.audio_renderer.render(reverb_time=reverb_time)
+        else:
+            # Move the recording so that the next trial doesn't overwrite it.
+            audio = output_directory.joinpath(f"{filename}.recording.wav")
+            Dataset.TEMP_AUDIO_PATH.replace(audio)
+        # Save the trial on a background thread.
+        # Remove the initial 0.1 seconds of a recording (which might include a clicking effect) and any other silence.
+        self.trial_writer.write(output_directory=output_directory, filename=filename, trial=trial,
+                                occupancy_map=self.occupancy_map, audio=audio, manifest=manifest, skip=0.1)
         # Increment the trial counter and the random seed counter.
         self.trial_count += 1
         self._random_seed_index += 1
@@ -433,24 +658,20 @@ class Dataset(MultiModalBase):
         :return: An `ActionStatus` (always success).
         """
 
-        # Load object initialization data.
-        object_init_data = loads(OBJECT_INIT_DIRECTORY.joinpath(f"{scene}_{layout}.json").read_text(encoding="utf-8"))
-        for o in object_init_data:
-            o_id, o_commands = MultiModalObjectInitData(**o).get_commands()
-            self._object_init_commands[o_id] = o_commands
+        # Add the scene objects.
+        self._object_init_commands.update(self._get_base_object_init_commands(scene=scene, layout=layout))
         # Add the target object.
-        self.target_object_id, target_object_commands = self.trials[self.trial_count].target_object.get_commands()
+        self.target_object_id, target_object_commands = self.dataset_trial.target_object.get_commands()
         self._extra_object_ids.clear()
         self._extra_object_ids.append(self.target_object_id)
         self._object_init_commands[self.target_object_id] = target_object_commands
         # Add the distractor objects.
-        for distractor in self.trials[self.trial_count].distractors:
+        for distractor in self.dataset_trial.distractors:
             o_id, o_commands = distractor.get_commands()
             self._extra_object_ids.append(o_id)
             self._object_init_commands[o_id] = o_commands
         # We need every frame for audio recording, but not right now, so let's speed things up.
         self._skip_frames = 10
-        self._scene_bounds = loads(SCENE_BOUNDS_DIRECTORY.joinpath(f"{scene[:-1]}.json").read_text())
         # Initialize the scene.
         super().init_scene(scene=scene, layout=layout)
         # Turn the Magnebot by a random angle.
@@ -466,7 +687,7 @@ class Dataset(MultiModalBase):
                                            "use_gravity": True},
                                           {"$type": "apply_force_to_object",
                                            "id": self.target_object_id,
-                                           "force": self.trials[self.trial_count].force},
+                                           "force": self.dataset_trial.force},
                                           {"$type": "send_collisions",
                                            "enter": True,
                                            "stay": True,
@@ -476,16 +697,135 @@ class Dataset(MultiModalBase):
         Dataset.PY_IMPACT.reset(initial_amp=Dataset.INITIAL_AMP)
         return ActionStatus.success
 
-    def communicate(self, commands: Union[dict, List[dict]]) -> List[bytes]:
-        # Log the message.
-        if self._log:
-            if isinstance(commands, list):
-                msg = dumps(commands)
-            else:
-                msg = dumps([commands])
-            with self._log_path.open("at", encoding="utf-8") as f:
-                f.write(msg + "\n")
-        return super().communicate(commands=commands)
+    def end(self) -> None:
+        """
+        Wait for every trial to be written to disk and close the command log. Then, end the simulation and terminate the build process.
+        """
+
+        try:
+            self.trial_writer.close()
+        finally:
+            if self._command_log is not None:
+                self._command_log.close()
+            super().end()
+
+    @staticmethod
+    def get_trial_offsets(directory: Path = DATASET_DIRECTORY) -> Tuple[Dict[str, int], int]:
+        """
+        :param directory: The directory of the scene_layout directories. This is either the dataset directory or a shard directory.
+
+        :return: Tuple: A dictionary of the index of the first trial of each scene_layout combination in the entire dataset (key = the scene_layout combination, for example `"mm_kitchen_1a_0"`), and the total number of trials.
+        """
+
+        offsets: Dict[str, int] = dict()
+        num_trials: int = 0
+        scene_layouts = get_scene_layouts()
+        for scene in scene_layouts:
+            for layout in range(scene_layouts[scene]):
+                offsets[f"{scene}_{layout}"] = num_trials
+                num_trials += Dataset._get_num_trials(scene=scene, layout=layout, directory=directory)
+        return offsets, num_trials
+
+    @staticmethod
+    def get_random_seeds(random_seed: int, num_trials: int) -> np.array:
+        """
+        Load the random seeds of every trial in the dataset. If they don't exist, generate them and save them to disk.
+
+        :param random_seed: The random seed used to generate the random seeds.
+        :param num_trials: The total number of trials in the dataset.
+
+        :return: A random seed per trial in the dataset.
+        """
+
+        random_seed_path = DATASET_DIRECTORY.joinpath("random_seeds.npy").resolve()
+        # Load existing random seeds.
+        if random_seed_path.exists():
+            return np.load(str(random_seed_path))
+        if not DATASET_DIRECTORY.exists():
+            DATASET_DIRECTORY.mkdir(parents=True)
+        # Generate new random seeds for every trial.
+        random_seeds = np.random.RandomState(random_seed).randint(low=0, high=2**31 - 1, size=num_trials, dtype=int)
+        # Save them to disk.
+        np.save(str(random_seed_path.resolve())[:-4], random_seeds)
+        return random_seeds
+
+    @staticmethod
+    def get_shard_directory(shard: int) -> Path:
+        """
+        :param shard: The index of the shard.
+
+        :return: The directory of the shard.
+        """
+
+        return DATASET_DIRECTORY.joinpath(f"shards/{shard}")
+
+    @staticmethod
+    def get_shard_scene_layouts(shard: int, num_shards: int) -> List[str]:
+        """
+        :param shard: The index of the shard.
+        :param num_shards: The total number of shards.
+
+        :return: The scene_layout combinations of the shard. The scene_layout combinations are divided evenly between the shards.
+        """
+
+        scene_layouts = get_scene_layouts()
+        return [f"{scene}_{layout}" for scene in scene_layouts for layout in range(scene_layouts[scene])][
+               shard::num_shards]
+
+    @staticmethod
+    def run_shards(num_shards: int, port: int = 1071, random_seed: int = 0, arguments: List[str] = None) -> None:
+        """
+        Generate the dataset with a worker process per shard. Each worker process runs `dataset.py` with its own port and writes to its own shard directory.
+        When every worker is done, merge the shards into the dataset directory.
+
+        :param num_shards: The number of shards.
+        :param port: The port of the first worker. Each subsequent worker's port is incremented by 1.
+        :param random_seed: The random seed used to generate `random_seeds.npy`.
+        :param arguments: Additional command-line arguments for each worker, for example `["--offline_audio"]`.
+        """
+
+        if arguments is None:
+            arguments = list()
+        # Generate the random seeds before launching the workers so that they don't all try to write the file.
+        Dataset.get_random_seeds(random_seed=random_seed, num_trials=Dataset.get_trial_offsets()[1])
+        processes: List[Popen] = list()
+        for shard in range(num_shards):
+            processes.append(Popen([sys.executable, __file__, "--shard", str(shard), "--num_shards", str(num_shards),
+                                    "--port", str(port + shard), "--random_seed", str(random_seed)] + arguments))
+        failed = [shard for shard, process in enumerate(processes) if process.wait() != 0]
+        Dataset.merge_shards()
+        if len(failed) > 0:
+            raise Exception(f"Shards failed: {failed}")
+
+    @staticmethod
+    def merge_shards() -> None:
+        """
+        Move every completed scene_layout combination from each shard directory into the dataset directory. Incomplete scene_layout combinations remain in the shard directories.
+        """
+
+        shards_directory = DATASET_DIRECTORY.joinpath("shards")
+        if not shards_directory.exists():
+            return
+        for shard_directory in sorted(shards_directory.iterdir()):
+            if not shard_directory.is_dir():
+                continue
+            for directory in sorted(shard_directory.iterdir()):
+                if not directory.is_dir() or not TrialManifest(directory=directory).is_complete():
+                    continue
+                destination = DATASET_DIRECTORY.joinpath(directory.name)
+                # Replace any partial results.
+                if destination.exists():
+                    rmtree(str(destination.resolve()))
+                directory.replace(destination)
+            # Keep the settle statistics of each shard.
+            statistics_path = shard_directory.joinpath("settle_statistics.json")
+            if statistics_path.exists():
+                statistics_path.replace(DATASET_DIRECTORY.joinpath(f"settle_statistics_{shard_directory.name}.json"))
+
+    def _before_send(self, commands: List[dict]) -> None:
+        # Log the commands that are actually sent, including the add-ons' commands.
+        if self._command_log is not None:
+            self._command_log.log(commands)
 
     def _cache_static_data(self, resp: List[bytes]) -> None:
         super()._cache_static_data(resp=resp)
@@ -499,6 +839,9 @@ class Dataset(MultiModalBase):
                  "enable": False}]
 
     def _get_end_commands(self) -> List[dict]:
+        # The offline audio doesn't need an audio sensor.
+        if self.offline_audio:
+            return []
         # Add a reverb space and an audio sensor.
         return [{"$type": "set_reverb_space_simple",
                  "env_id": -1,
@@ -511,47 +854,80 @@ class Dataset(MultiModalBase):
                 {"$type": "add_environ_audio_sensor"}]
 
     def _get_magnebot_position(self) -> np.array:
-        return TDWUtils.vector3_to_array(self.trials[self.trial_count].magnebot_position)
+        return TDWUtils.vector3_to_array(self.dataset_trial.magnebot_position)
 
     def _listen_for_audio(self) -> None:
         """
         Source: https://stackoverflow.com/questions/892199/detect-record-audio-in-python
 
-        Loop until audio stops playing.
+        Loop until audio stops playing. Each read blocks until a chunk of audio is available.
         """
 
-        threshold = 5
         chunk_size = 1024
-        audio_format = pyaudio.paInt16
+        # 16-bit audio.
+        audio_format = self._py_audio.get_format_from_width(2)
         rate = 44100
-        stream = Dataset.PY_AUDIO.open(format=audio_format, channels=1, rate=rate,
-                                       input=True, output=True,
-                                       frames_per_buffer=chunk_size,
-                                       input_device_index=self._device_index)
+        stream = self._py_audio.open(format=audio_format, channels=1, rate=rate,
+                                     input=True, output=True,
+                                     frames_per_buffer=chunk_size,
+                                     input_device_index=self._device_index)
         audio = True
         try:
-            # Periodically check to see if any audio is playing.
+            # Check each chunk to see if any audio is playing.
             while audio:
-                snd_data = array('h', stream.read(chunk_size))
-                audio = max(snd_data) > threshold
-                sleep(0.1)
+                audio = not self.wav_trimmer.is_silent(np.frombuffer(stream.read(chunk_size), dtype=np.int16) / 32767)
         finally:
             stream.stop_stream()
             stream.close()
 
+    def _get_base_object_init_commands(self, scene: str, layout: int) -> Dict[int, List[dict]]:
+        """
+        Get the commands to add the objects of the [`BaseLayout`](../api/base_layout.md) of a scene_layout combination. The commands are cached so that they are created only once per scene_layout combination.
+
+        :param scene: The name of the scene.
+        :param layout: The layout index.
+
+        :return: The commands to add each scene object in the order of the base layout. Key = The object ID.
+        """
+
+        scene_layout = f"{scene}_{layout}"
+        if scene_layout != self._base_object_init_scene_layout:
+            self._base_object_init_commands.clear()
+            for o in BaseLayout.get_object_init_data(scene_layout=scene_layout):
+                o_id, o_commands = o.get_commands()
+                self._base_object_init_commands[o_id] = o_commands
+            self._base_object_init_scene_layout = scene_layout
+        return self._base_object_init_commands
+
     @staticmethod
-    def _get_pyaudio_device_index() -> int:
+    def _get_num_trials(scene: str, layout: int, directory: Path = DATASET_DIRECTORY) -> int:
+        """
+        :param scene: The name of the scene.
+        :param layout: The layout index.
+        :param directory: The directory of the scene_layout directories.
+
+        :return: The number of trials of a scene_layout combination. If the dataset manifest doesn't know the number of trials, get the number of trials from the rehearsal index.
+        """
+
+        manifest = TrialManifest(directory=directory.joinpath(f"{scene}_{layout}"))
+        if manifest.num_trials >= 0:
+            return manifest.num_trials
+        if not RehearsalReader.exists(scene=scene, layout=layout):
+            return 0
+        return RehearsalReader(scene=scene, layout=layout).get_num_trials()
+
+    def _get_pyaudio_device_index(self) -> int:
         """
         Source: https://stackoverflow.com/questions/36894315/how-to-select-a-specific-input-device-with-pyaudio
 
         :return: The index of the system audio device in PyAudio.
         """
 
-        info = Dataset.PY_AUDIO.get_host_api_info_by_index(0)
+        info = self._py_audio.get_host_api_info_by_index(0)
         num_devices = info.get('deviceCount')
         for i in range(0, num_devices):
-            if Dataset.PY_AUDIO.get_device_info_by_host_api_device_index(0, i).get('maxInputChannels') > 0:
-                device_name = Dataset.PY_AUDIO.get_device_info_by_host_api_device_index(0, i).get('name')
+            if self._py_audio.get_device_info_by_host_api_device_index(0, i).get('maxInputChannels') > 0:
+                device_name = self._py_audio.get_device_info_by_host_api_device_index(0, i).get('name')
                 if "Stereo Mix" in device_name:
                     return i
         raise Exception("Couldn't find a suitable audio device!")
@@ -562,6 +938,70 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--random_seed", type=int, default=0, help="The total number of trials.")
     parser.add_argument("--log", action="store_true", help="Log all commands sent to the build.")
+    parser.add_argument("--log_interval", type=int, default=1, help="If --log is included, log every nth frame.")
+    parser.add_argument("--log_skip_empty", action="store_true",
+                        help="If --log is included, don't log frames without any commands.")
+    parser.add_argument("--offline_audio", action="store_true",
+                        help="Render the impact sounds in Python instead of recording the system audio.")
+    parser.add_argument("--no_reverb", action="store_true",
+                        help="Don't apply a reverb approximation to the offline audio.")
+    parser.add_argument("--json", action="store_true",
+                        help="Write the trial data as .json files instead of .bin files.")
+    parser.add_argument("--rasterize", action="store_true",
+                        help="Create occupancy maps from object bounds instead of with raycasts.")
+    parser.add_argument("--port", type=int, default=1071,
+                        help="The socket port. If --num_shards > 1, this is the port of the first worker.")
+    parser.add_argument("--num_shards", type=int, default=1, help="The number of worker processes.")
+    parser.add_argument("--shard", type=int, default=-1,
+                        help="The index of the shard of this worker process. This is set automatically.")
+    parser.add_argument("--merge", action="store_true", help="Merge the completed shards into the dataset directory.")
+    parser.add_argument("--regenerate", type=str, nargs="+", default=None,
+                        help="Regenerate these trials, for example: mm_kitchen_1a_0/00005 mm_kitchen_1a_1/00012")
+    parser.add_argument("--regenerate_path", type=str, default=None,
+                        help="Regenerate each trial listed in this text file (one trial per line).")
     args = parser.parse_args()
-    dataset_generator = Dataset(random_seed=args.random_seed, log=args.log)
-    dataset_generator.run()
+    if args.merge:
+        Dataset.merge_shards()
+    # Regenerate specific trials.
+    elif args.regenerate is not None or args.regenerate_path is not None:
+        regenerate_targets: List[str] = list()
+        if args.regenerate is not None:
+            regenerate_targets.extend(args.regenerate)
+        if args.regenerate_path is not None:
+            regenerate_text = Path(args.regenerate_path).read_text(encoding="utf-8")
+            regenerate_targets.extend([t.strip() for t in regenerate_text.split("\n") if t.strip() != ""])
+        targets: List[Tuple[str, int, int]] = list()
+        for target in regenerate_targets:
+            # Accept either `scene_layout/trial` or a path to a trial file.
+            target_scene_layout, target_trial = target.replace("\\", "/").split("/")[-2:]
+            target_scene, target_layout = target_scene_layout.rsplit("_", 1)
+            targets.append((target_scene, int(target_layout), int(Path(target_trial).stem)))
+        dataset_generator = Dataset(port=args.port, random_seed=args.random_seed, log=args.log,
+                                    offline_audio=args.offline_audio, reverb=not args.no_reverb,
+                                    log_interval=args.log_interval, log_skip_empty=args.log_skip_empty,
+                                    export_json=args.json, rasterize=args.rasterize)
+        dataset_generator.regenerate(targets=targets)
+    # Launch a worker process per shard.
+    elif args.num_shards > 1 and args.shard < 0:
+        if not args.offline_audio:
+            raise Exception("Sharded generation requires --offline_audio")
+        worker_arguments = ["--log_interval", str(args.log_interval), "--offline_audio"]
+        for flag, value in zip(["--log", "--log_skip_empty", "--no_reverb", "--json", "--rasterize"],
+                               [args.log, args.log_skip_empty, args.no_reverb, args.json, args.rasterize]):
+            if value:
+                worker_arguments.append(flag)
+        Dataset.run_shards(num_shards=args.num_shards, port=args.port, random_seed=args.random_seed,
+                           arguments=worker_arguments)
+    else:
+        if args.shard >= 0:
+            shard_directory = Dataset.get_shard_directory(shard=args.shard)
+            shard_scene_layouts = Dataset.get_shard_scene_layouts(shard=args.shard, num_shards=args.num_shards)
+        else:
+            shard_directory = DATASET_DIRECTORY
+            shard_scene_layouts = None
+        dataset_generator = Dataset(port=args.port, random_seed=args.random_seed, log=args.log,
+                                    offline_audio=args.offline_audio, reverb=not args.no_reverb,
+                                    log_interval=args.log_interval, log_skip_empty=args.log_skip_empty,
+                                    output_directory=shard_directory, scene_layouts=shard_scene_layouts,
+                                    export_json=args.json, rasterize=args.rasterize)
+        dataset_generator.run()
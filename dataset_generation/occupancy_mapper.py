@@ -5,8 +5,9 @@ from tdw.librarian import SceneLibrarian
 from tdw.output_data import OutputData, Overlap
 from magnebot.constants import OCCUPANCY_CELL_SIZE
 from multimodal_challenge.util import get_object_init_commands
-from multimodal_challenge.paths import OCCUPANCY_MAPS_DIRECTORY, MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY
-from multimodal_challenge.dataset.constants import MIN_OBJECT_DISTANCE_FROM_MAGNEBOT
+from multimodal_challenge.paths import OCCUPANCY_MAPS_DIRECTORY, MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY, \
+    CANDIDATE_POSITIONS_DIRECTORY
+from multimodal_challenge.dataset.candidate_positions import CandidatePositions
 from multimodal_challenge.dataset.add_ons.occupancy_map import OccupancyMap
 
 
@@ -73,31 +74,18 @@ class OccupancyMapper(Controller):
                     magnebot_occupancy_map[idx][idz] = 0
         # Make sure that there are positions to place objects.
         # There must be at least 1 place to drop an object that is far away from each Magnebot spawn position.
-        for idxm, idzm in np.ndindex(magnebot_occupancy_map.shape):
-            if magnebot_occupancy_map[idxm][idzm] != 0:
-                continue
-            xm, zm = o.get_occupancy_position(idxm, idzm)
-            pm = np.array([xm, zm])
-            has_object_spawns: bool = False
-            for idxo, idzo in np.ndindex(o.occupancy_map.shape):
-                if idxo == idxm and idzo == idzm:
-                    continue
-                if o.occupancy_map[idxo][idzo] != 0:
-                    continue
-                xo, zo = o.get_occupancy_position(idxo, idzo)
-                if np.linalg.norm(pm - np.array([xo, zo])) >= MIN_OBJECT_DISTANCE_FROM_MAGNEBOT:
-                    has_object_spawns = True
-                    break
+        candidate_positions = CandidatePositions.create(magnebot_occupancy_map=magnebot_occupancy_map,
+                                                        occupancy_map=o.occupancy_map,
+                                                        x_min=o.scene_bounds.x_min,
+                                                        z_min=o.scene_bounds.z_min)
+        for i in range(len(candidate_positions.magnebot_cells)):
             # If there aren't any sufficiently distance object spawn positions from this Magnebot spawn position,
             # this isn't a valid Magnebot spawn position.
-            if not has_object_spawns:
+            if len(candidate_positions.get_object_indices(i)) == 0:
+                idxm, idzm = candidate_positions.magnebot_cells[i]
                 magnebot_occupancy_map[idxm][idzm] = 1
         # Check if there are any Magnebot spawn positions.
-        has_magnebot_positions = False
-        for idxm, idzm in np.ndindex(magnebot_occupancy_map.shape):
-            if magnebot_occupancy_map[idxm][idzm] == 0:
-                has_magnebot_positions = True
-                break
+        has_magnebot_positions = np.any(magnebot_occupancy_map == 0)
         filename = f"{scene}_{layout}"
         if not has_magnebot_positions:
             o.show()
@@ -109,6 +97,12 @@ class OccupancyMapper(Controller):
         # Save the occupancy maps.
         np.save(str(OCCUPANCY_MAPS_DIRECTORY.joinpath(filename).resolve()), o.occupancy_map)
         np.save(str(MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY.joinpath(filename).resolve()), magnebot_occupancy_map)
+        # Save the candidate positions.
+        candidate_positions = CandidatePositions.create(magnebot_occupancy_map=magnebot_occupancy_map,
+                                                        occupancy_map=o.occupancy_map,
+                                                        x_min=o.scene_bounds.x_min,
+                                                        z_min=o.scene_bounds.z_min)
+        candidate_positions.save(CANDIDATE_POSITIONS_DIRECTORY.joinpath(f"{filename}.npz"))
 
     def run(self) -> None:
         """
@@ -1,23 +1,26 @@
 from json import dumps
-from typing import Optional, List, Dict
-from pathlib import Path
+from time import time
+from typing import Optional, List, Dict, Tuple
 from tqdm import tqdm
 import numpy as np
 from tdw.controller import Controller
 from tdw.tdw_utils import TDWUtils
-from tdw.output_data import Transforms
+from tdw.output_data import Transforms, Bounds
 from tdw.object_init_data import TransformInitData
 from tdw.scene.scene_bounds import SceneBounds
 from magnebot.constants import OCCUPANCY_CELL_SIZE
 from magnebot.util import get_data
 from multimodal_challenge.util import TARGET_OBJECTS, get_object_init_commands, get_scene_librarian, get_scene_layouts,\
     check_pip_version, check_build_version
-from multimodal_challenge.paths import REHEARSAL_DIRECTORY, OCCUPANCY_MAPS_DIRECTORY, DISTRACTOR_OBJECTS_PATH, \
-    MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY
+from multimodal_challenge.paths import REHEARSAL_DIRECTORY, DISTRACTOR_OBJECTS_PATH
 from multimodal_challenge.dataset.dataset_trial import DatasetTrial
-from multimodal_challenge.encoder import Encoder
+from multimodal_challenge.dataset.rehearsal_log import RehearsalLog
+from multimodal_challenge.dataset.rehearsal_reader import RehearsalReader
+from multimodal_challenge.dataset.rehearsal_telemetry import RehearsalTelemetry
+from multimodal_challenge.dataset.settle_detector import SettleDetector
+from multimodal_challenge.dataset.settle_status import SettleStatus
 from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
-from multimodal_challenge.dataset.constants import MIN_OBJECT_DISTANCE_FROM_MAGNEBOT
+from multimodal_challenge.dataset.candidate_positions import CandidatePositions
 
 
 class Rehearsal(Controller):
@@ -75,6 +78,8 @@ class Rehearsal(Controller):
     | --- | --- | --- |
     | `--random_seed` | 0 | The random seed. |
     | `--num_trials` | 10000 | Generate this many trials. |
+    | `--batch_distractors` | | If included, drop all of the distractors at the same time. This is faster but more trials will be discarded. |
+    | `--weighted_sampling` | | If included, sample drop positions and models that have been rejected often less frequently. |
 
     Example: `python3 rehearsal.py --random_seed 12345 --num_trials 300`
 
@@ -89,16 +94,31 @@ class Rehearsal(Controller):
 
     1. Randomly set the parameters of a new [`DatasetTrial`](../api/dataset_trial.md) for initialization.
     2. Let each distractor object fall, one at a time (to avoid interpentration). If the objects fall in acceptable positions, continue.
+       - If `--batch_distractors` is included, drop the distractors at the same time from positions that are far apart from each other. If the objects fall in acceptable positions and don't intersect each other, continue.
     3. Let the target object fall.
     4. If the target object is in an acceptable position, generate a `DatasetTrial` object.
 
+    Each accepted `DatasetTrial` is immediately appended to a log file (`mm_kitchen_1a_0.jsonl`) along with the state of the random number generator.
+    If `rehearsal.py` is stopped, it will resume from the last logged trial of the scene_layout combination.
+    When there are enough trials, the log is compacted into a JSON lines file with an index of the offset of each trial (`mm_kitchen_1a_0.trials.jsonl` and `mm_kitchen_1a_0.trials.idx`) and deleted. The state of the random number generator after the last trial is saved to `mm_kitchen_1a_0.trials.rng.json`; if `rehearsal.py` is restarted, it restores this state when it skips the completed scene_layout combination so that the remaining trials are the same as in an uninterrupted run. `dataset.py` reads the trials one at a time with a [`RehearsalReader`](../api/rehearsal_reader.md).
+
+    Every rejected trial is recorded by [`RehearsalTelemetry`](../api/rehearsal_telemetry.md): the reason, the occupancy map cell and model of the object that caused the rejection, the number of simulated physics frames, and the wall time.
+    The attempts and rejections are saved in the log along with each accepted trial. When a scene_layout combination is complete, its rejections are appended to `rejections.jsonl` and the number of attempts and rejections per cell and per model are added to `run_statistics.json`. When the run is complete, they are added to `rejection_statistics.json`.
+    If `--weighted_sampling` is included, drop cells and models are sampled with weights derived from the `rejection_statistics.json` of the previous runs. These statistics are frozen in `run_statistics.json` when the run starts and reused if the run is resumed, so the sampling is reproducible for a given random seed.
+
     **Result:** A list of `DatasetTrial` initialization objects per scene_layout combination:
 
     ```
     D:/multimodal_challenge/
     ....rehearsal/
-    ........mm_kitchen_1a_0.json  # scene_layout
-    ........mm_kitchen_1a_1.json
+    ........mm_kitchen_1a_0.trials.jsonl  # scene_layout
+    ........mm_kitchen_1a_0.trials.idx
+    ........mm_kitchen_1a_1.trials.jsonl
+    ........mm_kitchen_1a_1.trials.idx
+    ........mm_kitchen_1a_2.jsonl  # An incomplete scene_layout
+    ........rejections.jsonl
+    ........rejection_statistics.json
+    ........run_statistics.json  # An incomplete run
     ........(etc.)
     ```
     """
@@ -120,16 +140,39 @@ class Rehearsal(Controller):
     """
     MAX_DROP_Y: float = 2.8
     """:class_var
-    The amount of frames skipped while objects are falling.
+    The maximum amount of frames skipped while objects are falling.
     """
     SKIPPED_FRAMES: int = 20
+    """:class_var
+    The minimum amount of frames skipped while objects are falling. Fewer frames are skipped when objects are close to a surface.
+    """
+    MIN_SKIPPED_FRAMES: int = 2
+    """:class_var
+    If the objects don't stop moving after this many frames, the trial is discarded.
+    """
+    MAX_SETTLE_FRAMES: int = 20000
+    """:class_var
+    Flush the rehearsal log to disk after this many trials have been accepted.
+    """
+    LOG_FLUSH_INTERVAL: int = 10
+    """:class_var
+    If distractors are dropped at the same time, their initial positions must be at least this far apart from each other.
+    """
+    MIN_BATCH_DISTRACTOR_DISTANCE: float = 1
+    """:class_var
+    If distractors are dropped at the same time, they intersect each other if their bounds overlap by more than this distance.
+    """
+    BOUNDS_TOLERANCE: float = 0.01
 
-    def __init__(self, port: int = 1071, random_seed: int = None):
+    def __init__(self, port: int = 1071, random_seed: int = None, batch_distractors: bool = False,
+                 weighted_sampling: bool = False):
         """
         Create the network socket and bind the socket to the port.
 
         :param port: The port number.
         :param random_seed: The seed used for random numbers. If None, this is chosen randomly.
+        :param batch_distractors: If True, drop all of the distractors at the same time. If False, drop the distractors one at a time.
+        :param weighted_sampling: If True, sample drop positions and models with weights derived from the rejection statistics of previous runs. If False, sample them uniformly.
         """
 
         super().__init__(port=port, launch_build=False, check_version=False)
@@ -159,13 +202,50 @@ class Rehearsal(Controller):
         self.distractors: List[str] = [lib.get_record(d).name for d in
                                        DISTRACTOR_OBJECTS_PATH.read_text().strip().split("\n")]
         """:field
-        A list of all possible initial object positions per trial.
+        The [`CandidatePositions`](../api/candidate_positions.md) of the current scene_layout combination.
+        """
+        self.candidate_positions: Optional[CandidatePositions] = None
+        """:field
+        All possible initial object positions per trial as an `(n, 3)` array.
+        """
+        self.object_positions: np.array = np.array([])
+        """:field
+        All possible initial Magnebot positions per trial as an `(n, 3)` array.
+        """
+        self.magnebot_positions: np.array = np.array([])
+        """:field
+        If True, drop all of the distractors at the same time. If False, drop the distractors one at a time.
+        """
+        self.batch_distractors: bool = batch_distractors
+        """:field
+        The [`SettleDetector`](../api/settle_detector.md) used to determine when falling objects stop moving.
+        """
+        self.settle_detector: SettleDetector = SettleDetector(max_frames=Rehearsal.MAX_SETTLE_FRAMES,
+                                                              min_step=Rehearsal.MIN_SKIPPED_FRAMES,
+                                                              max_step=Rehearsal.SKIPPED_FRAMES)
+        """:field
+        The [`RehearsalTelemetry`](../api/rehearsal_telemetry.md) that records rejected trials.
         """
-        self.object_positions: List[np.array] = list()
+        self.telemetry: RehearsalTelemetry = RehearsalTelemetry(directory=REHEARSAL_DIRECTORY)
         """:field
-        A list of all possible initial Magnebot positions per trial.
+        If True, sample drop positions and models with weights derived from the rejection statistics of previous runs.
         """
-        self.magnebot_positions: List[np.array] = list()
+        self.weighted_sampling: bool = weighted_sampling
+        # The sampling probabilities of the distractor models and the target object models.
+        self._distractor_probabilities: np.array = RehearsalTelemetry.get_probabilities(
+            self.telemetry.get_model_weights(self.distractors))
+        self._target_probabilities: np.array = RehearsalTelemetry.get_probabilities(
+            self.telemetry.get_model_weights(TARGET_OBJECTS))
+        # The sampling weights of each cell in `self.candidate_positions.object_cells`.
+        self._cell_weights: np.array = np.array([])
+        # The name of the current scene_layout combination.
+        self._scene_layout: str = ""
+        # The time at which the current trial started.
+        self._trial_start_time: float = 0
+        # The number of physics frames simulated in the current trial.
+        self._trial_frames: int = 0
+        # The model name and occupancy map cell of each object in the current trial. Key = The object ID.
+        self._trial_objects: Dict[int, Tuple[str, np.array]] = dict()
 
     def do_trial(self) -> Optional[DatasetTrial]:
         """
@@ -175,16 +255,17 @@ class Rehearsal(Controller):
         :return: A `DatasetTrial` if this is a good trial.
         """
 
+        self._trial_start_time = time()
+        self._trial_frames = 0
+        self._trial_objects.clear()
         # Randomly choose a Magnebot position.
-        magnebot_position = self.magnebot_positions[self.rng.randint(0, len(self.magnebot_positions))]
+        magnebot_index: int = self.rng.randint(0, len(self.magnebot_positions))
+        magnebot_position: np.array = self.magnebot_positions[magnebot_index]
 
-        # Get far away object positions.
-        object_positions: List[np.array] = list()
-        for op in self.object_positions:
-            if np.linalg.norm(magnebot_position - op) >= MIN_OBJECT_DISTANCE_FROM_MAGNEBOT:
-                object_positions.append(op)
+        # Get the indices of far away object positions.
+        object_indices: np.array = self.candidate_positions.get_object_indices(magnebot_index)
         # Get the number of distractors in the scene.
-        max_num_distractors: int = len(object_positions) - 1
+        max_num_distractors: int = len(object_indices) - 1
         min_num_distractors: int = Rehearsal.MIN_DISTRACTORS
         if min_num_distractors >= max_num_distractors:
             min_num_distractors = 0
@@ -196,72 +277,81 @@ class Rehearsal(Controller):
             num_distractors: int = self.rng.randint(min_num_distractors, max_num_distractors)
 
         # Randomize the starting positions.
-        self.rng.shuffle(object_positions)
+        if self.weighted_sampling:
+            # Sample a weighted permutation without replacement.
+            # Roll it so that the target object (the last object) gets the first weighted draw, not the highest-weight cell.
+            object_indices = np.roll(self.rng.choice(object_indices, size=len(object_indices), replace=False,
+                                                     p=RehearsalTelemetry.get_probabilities(
+                                                         self._cell_weights[object_indices])), -1)
+        else:
+            object_indices = object_indices.copy()
+            self.rng.shuffle(object_indices)
+        # Get random parameters for every object in the trial. The last object is the target object.
+        if self.weighted_sampling:
+            names: np.array = self.rng.choice(len(self.distractors), size=num_distractors,
+                                              p=self._distractor_probabilities)
+        else:
+            names: np.array = self.rng.randint(0, len(self.distractors), size=num_distractors)
+        drop_offsets, rotations = self._get_drop_parameters(num_objects=num_distractors + 1)
         # Remember the IDs and names of the distractors.
         distractor_ids: List[int] = list()
         distractor_names: Dict[int, str] = dict()
         # This flag is used to determine if whether we should immediately discard the trial.
-        good = True
-        # Drop the distractors one at a time to avoid interpenetration.
-        # Each time, make sure that the distractors actually stop moving and actually land above floor level.
-        for i in range(num_distractors):
-            name = self.distractors[self.rng.randint(0, len(self.distractors))]
-            init_data: MultiModalObjectInitData = MultiModalObjectInitData(
-                name=name,
-                position=self._get_position(object_positions[i]),
-                rotation=self._get_rotation(),
-                kinematic=False)
-            # Get the commands and the object ID.
-            o_id, commands = init_data.get_commands()
-            distractor_names[o_id] = name
-            distractor_ids.append(o_id)
-            # Request Transforms data per frame for this object only.
-            commands.extend([{"$type": "send_transforms",
-                              "frequency": "always",
-                              "ids": [o_id]},
-                             {"$type": "step_physics",
-                              "frames": Rehearsal.SKIPPED_FRAMES}])
-            resp = self.communicate(commands)
-            good = self._wait_for_object_to_fall(resp=resp)
-            if not good:
-                break
+        if self.batch_distractors:
+            good = self._drop_distractors_batch(object_indices=object_indices[:-1],
+                                                names=names,
+                                                drop_offsets=drop_offsets,
+                                                rotations=rotations,
+                                                distractor_ids=distractor_ids,
+                                                distractor_names=distractor_names)
+        else:
+            good = self._drop_distractors_sequential(object_indices=object_indices,
+                                                     names=names,
+                                                     drop_offsets=drop_offsets,
+                                                     rotations=rotations,
+                                                     distractor_ids=distractor_ids,
+                                                     distractor_names=distractor_names)
         # A list of commands for destroying the non-floorplan objects in the scene.
         destroy_objects = [{"$type": "destroy_object", "id": o_id} for o_id in distractor_ids]
         # If this isn't a good trial, stop here.
         if not good:
-            # Remove the distractor objects.
-            self.communicate(destroy_objects)
+            # Stop requesting output data and remove the distractor objects.
+            self.communicate(self.settle_detector.get_stop_commands() + destroy_objects)
             return None
         # Get the next object.
-        name = self.rng.choice(TARGET_OBJECTS)
+        if self.weighted_sampling:
+            name = self.rng.choice(TARGET_OBJECTS, p=self._target_probabilities)
+        else:
+            name = self.rng.choice(TARGET_OBJECTS)
         # Get the init data.
         a = MultiModalObjectInitData(name=name,
-                                     position=self._get_position(object_positions[-1]),
-                                     rotation=self._get_rotation(),
+                                     position=TDWUtils.array_to_vector3(self.object_positions[object_indices[-1]] +
+                                                                        drop_offsets[-1]),
+                                     rotation=TDWUtils.array_to_vector3(rotations[-1]),
                                      kinematic=False)
         # Define the drop force.
-        force = {"x": float(self.rng.uniform(-0.1, 0.1)),
-                 "y": float(self.rng.uniform(-0.05, 0.05)),
-                 "z": float(self.rng.uniform(-0.1, 0.1))}
+        force = TDWUtils.array_to_vector3(self.rng.uniform(low=[-0.1, -0.05, -0.1], high=[0.1, 0.05, 0.1]))
         # Add the initialization commands.
         self.target_object_id, commands = a.get_commands()
-        # Apply the force. Request Transforms data for this object.
-        commands.extend([{"$type": "apply_force_to_object",
-                          "id": self.target_object_id,
-                          "force": force},
-                         {"$type": "send_transforms",
-                          "ids": [self.target_object_id],
-                          "frequency": "always"}])
+        self._add_attempt(object_id=self.target_object_id, name=name, object_index=object_indices[-1])
+        # Apply the force. Request output data for this object.
+        self.settle_detector.start(object_ids=[self.target_object_id])
+        commands.append({"$type": "apply_force_to_object",
+                         "id": self.target_object_id,
+                         "force": force})
+        commands.extend(self.settle_detector.get_output_data_commands())
         # Send the commands!
         resp = self.communicate(commands)
         # Wait for the object to finish falling.
-        good = self._wait_for_object_to_fall(resp=resp)
+        good = self._wait_for_objects_to_fall(resp=resp, role="target")
         # Get the transform data for the final state.
         object_ids = distractor_ids[:]
         object_ids.append(self.target_object_id)
-        resp = self.communicate({"$type": "send_transforms",
-                                 "frequency": "once",
-                                 "ids": object_ids})
+        commands = self.settle_detector.get_stop_commands()
+        commands.append({"$type": "send_transforms",
+                         "frequency": "once",
+                         "ids": object_ids})
+        resp = self.communicate(commands)
         # Destroy all of the objects.
         destroy_objects.extend([{"$type": "destroy_object",
                                 "id": self.target_object_id}])
@@ -311,13 +401,18 @@ class Rehearsal(Controller):
             for layout in range(scene_layouts[scene]):
                 self.do_trials(scene=scene, layout=layout, num_trials=trials_per_scene_layout, pbar=pbar)
         pbar.close()
+        # Write the number of frames that it took for objects to stop moving.
+        REHEARSAL_DIRECTORY.joinpath("settle_statistics.json").write_text(
+            dumps(self.settle_detector.get_statistics(), indent=2), encoding="utf-8")
+        self.telemetry.close()
         self.communicate({"$type": "terminate"})
 
     def do_trials(self, scene: str, layout: int, num_trials: int, pbar: tqdm = None) -> None:
         """
         Load a scene_layout combination and its objects.
         Run random trials until we have enough "good" trials.
-        Save the result to disk.
+        Each good trial is appended to a log file. If there is already a log file, resume from the last logged trial.
+        When there are enough trials, compact the log file into the indexed file that `dataset.py` reads.
 
         :param scene: The scene name.
         :param layout: The object layout variant of the scene.
@@ -325,13 +420,56 @@ class Rehearsal(Controller):
         :param pbar: Progress bar.
         """
 
+        log_path = REHEARSAL_DIRECTORY.joinpath(f"{scene}_{layout}.jsonl")
         # Skip over existing rehearsal data.
-        output_path: Path = REHEARSAL_DIRECTORY.joinpath(f"{scene}_{layout}.json")
-        if output_path.exists():
+        # Restore the random state so that the next scene_layout combination is the same as in an uninterrupted run.
+        if RehearsalReader.exists(scene=scene, layout=layout):
+            rng_state = RehearsalLog.load_rng_state(output_path=RehearsalReader.get_path(scene=scene, layout=layout),
+                                                    log_path=log_path)
+            if rng_state is not None:
+                self.rng.set_state(rng_state)
             if pbar is not None:
                 pbar.update(num_trials)
             return
 
+        # Resume from the last logged trial.
+        log = RehearsalLog(path=log_path, flush_interval=Rehearsal.LOG_FLUSH_INTERVAL)
+        if log.num_trials > 0:
+            self.rng.set_state(log.get_rng_state())
+        close_bar = pbar is None
+        if pbar is None:
+            pbar = tqdm(total=num_trials)
+        pbar.set_description(f"{scene}_{layout}")
+        pbar.update(min(log.num_trials, num_trials))
+        if log.num_trials < num_trials:
+            self._init_scene_layout(scene=scene, layout=layout)
+            try:
+                while log.num_trials < num_trials:
+                    # Do a trial.
+                    dataset_trial = self.do_trial()
+                    # If we got an object back, then this was a good trial.
+                    if dataset_trial is not None:
+                        # Save the data.
+                        log.append(trial=dataset_trial, rng_state=self.rng.get_state(),
+                                   telemetry=self.telemetry.get_pending())
+                        pbar.update(1)
+            finally:
+                log.close()
+        # Record the attempts and rejections of this scene_layout combination before the log is deleted.
+        self.telemetry.commit(scene_layout=f"{scene}_{layout}", pending=log.get_telemetry())
+        # Write the results to disk.
+        log.finalize(output_path=RehearsalReader.get_path(scene=scene, layout=layout), num_trials=num_trials)
+        if close_bar:
+            pbar.close()
+
+    def _init_scene_layout(self, scene: str, layout: int) -> None:
+        """
+        Load a scene_layout combination and its objects. Get the possible object and Magnebot positions.
+
+        :param scene: The scene name.
+        :param layout: The object layout variant of the scene.
+        """
+
         scene_record = self.scene_librarian.get_record(scene)
         commands: List[dict] = [{"$type": "add_scene",
                                  "name": scene_record.name,
@@ -349,88 +487,217 @@ class Rehearsal(Controller):
         # Set the scene environment.
         self.scene_bounds = SceneBounds(resp=resp)
 
-        # Get all object positions. A valid position is a free position not too far from the center of the room.
-        self.object_positions.clear()
-        self.magnebot_positions.clear()
-
-        np_filename = f"{scene}_{layout}.npy"
-        # Get the positions where the Magnebot can spawn.
-        magnebot_occupancy_map: np.array = np.load(str(MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY.joinpath(np_filename).resolve()))
-        for ix, iy in np.ndindex(magnebot_occupancy_map.shape):
-            if magnebot_occupancy_map[ix][iy] == 0:
-                x = self.scene_bounds.x_min + (ix * OCCUPANCY_CELL_SIZE)
-                z = self.scene_bounds.z_min + (iy * OCCUPANCY_CELL_SIZE)
-                self.magnebot_positions.append(np.array([x, 0, z]))
-        # Get the occupancy map.
-        occupancy_map: np.array = np.load(str(OCCUPANCY_MAPS_DIRECTORY.joinpath(np_filename).resolve()))
-        for ix, iy in np.ndindex(occupancy_map.shape):
-            if occupancy_map[ix][iy] == 0:
-                x = self.scene_bounds.x_min + (ix * OCCUPANCY_CELL_SIZE)
-                z = self.scene_bounds.z_min + (iy * OCCUPANCY_CELL_SIZE)
-                self.object_positions.append(np.array([x, 0, z]))
+        # Get all object positions and Magnebot positions.
+        self.candidate_positions = CandidatePositions.get(scene=scene, layout=layout,
+                                                          x_min=self.scene_bounds.x_min,
+                                                          z_min=self.scene_bounds.z_min)
+        self.magnebot_positions = self.candidate_positions.magnebot_positions
+        self.object_positions = self.candidate_positions.object_positions
+        self._scene_layout = f"{scene}_{layout}"
+        self._cell_weights = self.telemetry.get_cell_weights(scene_layout=self._scene_layout,
+                                                             cells=self.candidate_positions.object_cells)
+
+    def _drop_distractors_sequential(self, object_indices: np.array, names: np.array, drop_offsets: np.array,
+                                     rotations: np.array, distractor_ids: List[int],
+                                     distractor_names: Dict[int, str]) -> bool:
+        """
+        Drop the distractors one at a time to avoid interpenetration.
+        Each time, make sure that the distractors actually stop moving and actually land above floor level.
 
-        close_bar = pbar is None
-        if pbar is None:
-            pbar = tqdm(total=num_trials)
-        pbar.set_description(f"{scene}_{layout}")
-        # Remember all good drops.
-        dataset_trials: List[DatasetTrial] = list()
-        while len(dataset_trials) < num_trials:
-            # Do a trial.
-            dataset_trial = self.do_trial()
-            # If we got an object back, then this was a good trial.
-            if dataset_trial is not None:
-                # Save the data.
-                dataset_trials.append(dataset_trial)
-                pbar.update(1)
-        # Write the results to disk.
-        output_path.write_text(dumps(dataset_trials, cls=Encoder),
-                               encoding="utf-8")
-        if close_bar:
-            pbar.close()
+        :param object_indices: The shuffled indices of the possible object positions in `self.object_positions`.
+        :param names: The indices in `self.distractors` of the distractor models. The length of this array is the number of distractors.
+        :param drop_offsets: The random drop offsets from each object position.
+        :param rotations: The random initial rotations.
+        :param distractor_ids: The IDs of the distractors. This list will be filled in by this function.
+        :param distractor_names: The names of the distractors. This dictionary will be filled in by this function.
+
+        :return: True if all of the distractors landed in acceptable positions.
+        """
+
+        for i in range(len(names)):
+            o_id, commands = self._get_distractor_commands(name=self.distractors[names[i]],
+                                                           position=self.object_positions[object_indices[i]] +
+                                                           drop_offsets[i],
+                                                           rotation=rotations[i],
+                                                           distractor_ids=distractor_ids,
+                                                           distractor_names=distractor_names)
+            self._add_attempt(object_id=o_id, name=self.distractors[names[i]], object_index=object_indices[i])
+            # Request output data per frame for this object only.
+            self.settle_detector.start(object_ids=[o_id])
+            commands.extend(self.settle_detector.get_output_data_commands())
+            commands.append({"$type": "step_physics",
+                             "frames": self.settle_detector.step})
+            resp = self.communicate(commands)
+            if not self._wait_for_objects_to_fall(resp=resp, role="distractor"):
+                return False
+        return True
+
+    def _drop_distractors_batch(self, object_indices: np.array, names: np.array, drop_offsets: np.array,
+                                rotations: np.array, distractor_ids: List[int],
+                                distractor_names: Dict[int, str]) -> bool:
+        """
+        Drop all of the distractors at the same time from positions that are at least `MIN_BATCH_DISTRACTOR_DISTANCE` apart.
+        Wait until every distractor stops moving, then make sure that none of them are below the floor, outside of the scene, or intersecting each other.
+
+        :param object_indices: The shuffled indices of the possible object positions in `self.object_positions`. This excludes the target object's position.
+        :param names: The indices in `self.distractors` of the distractor models. The length of this array is the number of distractors.
+        :param drop_offsets: The random drop offsets from each object position.
+        :param rotations: The random initial rotations.
+        :param distractor_ids: The IDs of the distractors. This list will be filled in by this function.
+        :param distractor_names: The names of the distractors. This dictionary will be filled in by this function.
+
+        :return: True if all of the distractors landed in acceptable positions.
+        """
+
+        # Greedily choose positions that are far away from each other.
+        drop_indices: List[int] = list()
+        for object_index in object_indices:
+            if len(drop_indices) >= len(names):
+                break
+            if len(drop_indices) == 0 or np.min(np.linalg.norm(self.object_positions[drop_indices] -
+                                                               self.object_positions[object_index], axis=1)) >= \
+                    Rehearsal.MIN_BATCH_DISTRACTOR_DISTANCE:
+                drop_indices.append(object_index)
+        if len(drop_indices) == 0:
+            return True
+        commands: List[dict] = list()
+        for i, object_index in enumerate(drop_indices):
+            o_id, distractor_commands = self._get_distractor_commands(name=self.distractors[names[i]],
+                                                                      position=self.object_positions[object_index] +
+                                                                      drop_offsets[i],
+                                                                      rotation=rotations[i],
+                                                                      distractor_ids=distractor_ids,
+                                                                      distractor_names=distractor_names)
+            commands.extend(distractor_commands)
+            self._add_attempt(object_id=o_id, name=self.distractors[names[i]], object_index=object_index)
+        # Request output data per frame for all of the distractors.
+        self.settle_detector.start(object_ids=distractor_ids)
+        commands.extend(self.settle_detector.get_output_data_commands())
+        commands.append({"$type": "step_physics",
+                         "frames": self.settle_detector.step})
+        resp = self.communicate(commands)
+        if not self._wait_for_objects_to_fall(resp=resp, role="distractor"):
+            return False
+        # Check the final positions and bounds of the distractors.
+        commands = self.settle_detector.get_stop_commands()
+        commands.append({"$type": "send_bounds",
+                         "frequency": "once",
+                         "ids": distractor_ids})
+        resp = self.communicate(commands)
+        bounds = get_data(resp=resp, d_type=Bounds)
+        boxes: Dict[int, np.array] = dict()
+        for i in range(bounds.get_num()):
+            points = np.array([bounds.get_front(i), bounds.get_back(i), bounds.get_left(i), bounds.get_right(i),
+                               bounds.get_top(i), bounds.get_bottom(i)])
+            box_min = np.min(points, axis=0)
+            box_max = np.max(points, axis=0)
+            # The object is outside of the scene.
+            if box_max[0] < self.scene_bounds.x_min or box_min[0] > self.scene_bounds.x_max or \
+                    box_max[2] < self.scene_bounds.z_min or box_min[2] > self.scene_bounds.z_max:
+                self._reject(reason="distractor_outside_scene", object_ids=[bounds.get_id(i)])
+                return False
+            # The object is intersecting another distractor.
+            for b_id in boxes:
+                b = boxes[b_id]
+                if np.all(box_min + Rehearsal.BOUNDS_TOLERANCE < b[1]) and \
+                        np.all(b[0] + Rehearsal.BOUNDS_TOLERANCE < box_max):
+                    self._reject(reason="distractor_intersection", object_ids=[bounds.get_id(i), b_id])
+                    return False
+            boxes[bounds.get_id(i)] = np.array([box_min, box_max])
+        return True
 
     @staticmethod
-    def _get_distractor_position(resp: List[bytes]) -> np.array:
+    def _get_distractor_commands(name: str, position: np.array, rotation: np.array, distractor_ids: List[int],
+                                 distractor_names: Dict[int, str]) -> Tuple[int, List[dict]]:
         """
-        :param resp: The response from the build.
+        :param name: The name of the distractor model.
+        :param position: The initial position.
+        :param rotation: The initial rotation in Euler angles.
+        :param distractor_ids: The IDs of the distractors. The new ID will be appended to this list.
+        :param distractor_names: The names of the distractors. The new name will be added to this dictionary.
 
-        :return: The position of the distractor object currently being dropped.
+        :return: Tuple: The object ID, the commands to add the distractor.
         """
 
-        return np.array(get_data(resp=resp, d_type=Transforms).get_position(0))
+        init_data: MultiModalObjectInitData = MultiModalObjectInitData(
+            name=name,
+            position=TDWUtils.array_to_vector3(position),
+            rotation=TDWUtils.array_to_vector3(rotation),
+            kinematic=False)
+        # Get the commands and the object ID.
+        o_id, commands = init_data.get_commands()
+        distractor_names[o_id] = name
+        distractor_ids.append(o_id)
+        return o_id, commands
+
+    def _wait_for_objects_to_fall(self, resp: List[bytes], role: str) -> bool:
+        """
+        Step the simulation until every object tracked by `self.settle_detector` stops moving.
+        If the objects didn't stop moving above floor level, record the rejection.
 
-    def _get_position(self, p: np.array) -> Dict[str, float]:
-        return {"x": float(p[0]) + float(self.rng.uniform(-OCCUPANCY_CELL_SIZE * 0.5,
-                                                          OCCUPANCY_CELL_SIZE * 0.5)),
-                "y": float(self.rng.uniform(Rehearsal.MIN_DROP_Y, Rehearsal.MAX_DROP_Y)),
-                "z": float(p[2]) + float(self.rng.uniform(-OCCUPANCY_CELL_SIZE * 0.5,
-                                                          OCCUPANCY_CELL_SIZE * 0.5))}
+        :param resp: The response from the build.
+        :param role: The role of the falling objects (`"distractor"` or `"target"`). This is used as a prefix of the rejection reason.
 
-    def _get_rotation(self) -> Dict[str, float]:
-        return {"x": float(self.rng.uniform(-360, 360)),
-                "y": float(self.rng.uniform(-360, 360)),
-                "z": float(self.rng.uniform(-360, 360))}
+        :return: True if every object stopped moving above floor level.
+        """
 
-    def _wait_for_object_to_fall(self, resp: List[bytes]) -> bool:
-        position_0 = Rehearsal._get_distractor_position(resp=resp)
-        num_frames = 0
-        while num_frames < 1000:
+        status = self.settle_detector.update(resp=resp)
+        while status == SettleStatus.moving:
             # Skip some frames because we only care about where the objects land.
-            resp = self.communicate([{"$type": "step_physics",
-                                      "frames": Rehearsal.SKIPPED_FRAMES}])
-            position_1 = Rehearsal._get_distractor_position(resp=resp)
-            # If the object is below the floor, this is a bad trial.
-            if position_1[1] < -0.1:
-                return False
-            # If the object stopped moving, this is a (potentially) good trial.
-            elif np.linalg.norm(position_0 - position_1) <= 0.001:
-                return True
-            # The object is still moving.
-            else:
-                num_frames += 1
-                position_0 = position_1
-        # The object took too long to fall.
-        return False
+            commands = self.settle_detector.get_raycast_commands()
+            commands.append({"$type": "step_physics",
+                             "frames": self.settle_detector.step})
+            resp = self.communicate(commands)
+            status = self.settle_detector.update(resp=resp)
+        self.settle_detector.end(status=status)
+        self._trial_frames += self.settle_detector.frames
+        if status != SettleStatus.settled:
+            self._reject(reason=f"{role}_{status.name}", object_ids=self.settle_detector.failed_object_ids)
+            return False
+        return True
+
+    def _add_attempt(self, object_id: int, name: str, object_index: int) -> None:
+        """
+        Remember the model name and drop cell of an object in this trial and record the attempt.
+
+        :param object_id: The ID of the object.
+        :param name: The name of the model.
+        :param object_index: The index of the drop position in `self.object_positions`.
+        """
+
+        cell = self.candidate_positions.object_cells[object_index]
+        self._trial_objects[object_id] = (name, cell)
+        self.telemetry.add_attempt(scene_layout=self._scene_layout, cell=cell, model=name)
+
+    def _reject(self, reason: str, object_ids: List[int]) -> None:
+        """
+        Record that the objects caused this trial to be rejected.
+
+        :param reason: Why the trial was rejected.
+        :param object_ids: The IDs of the objects that caused the rejection.
+        """
+
+        wall_time = time() - self._trial_start_time
+        for object_id in object_ids:
+            if object_id not in self._trial_objects:
+                continue
+            name, cell = self._trial_objects[object_id]
+            self.telemetry.add_rejection(scene_layout=self._scene_layout, reason=reason, cell=cell, model=name,
+                                         frames=self._trial_frames, wall_time=wall_time)
+
+    def _get_drop_parameters(self, num_objects: int) -> Tuple[np.array, np.array]:
+        """
+        :param num_objects: The number of objects.
+
+        :return: Tuple: Random drop offsets from the center of each occupancy map cell as an `(n, 3)` array (the y value is the drop height); random rotations in Euler angles as an `(n, 3)` array.
+        """
+
+        half_cell = OCCUPANCY_CELL_SIZE * 0.5
+        drop_offsets = self.rng.uniform(low=[-half_cell, Rehearsal.MIN_DROP_Y, -half_cell],
+                                        high=[half_cell, Rehearsal.MAX_DROP_Y, half_cell],
+                                        size=(num_objects, 3))
+        rotations = self.rng.uniform(low=-360, high=360, size=(num_objects, 3))
+        return drop_offsets, rotations
 
 
 if __name__ == "__main__":
@@ -438,6 +705,12 @@ if __name__ == "__main__":
     parser = ArgumentParser()
     parser.add_argument("--num_trials", type=int, default=10000, help="The total number of trials.")
     parser.add_argument("--random_seed", type=int, default=0, help="The random seed.")
+    parser.add_argument("--batch_distractors", action="store_true",
+                        help="If included, drop all of the distractors at the same time.")
+    parser.add_argument("--weighted_sampling", action="store_true",
+                        help="If included, sample drop positions and models that have been rejected often less "
+                             "frequently.")
     args = parser.parse_args()
-    m = Rehearsal(random_seed=args.random_seed)
+    m = Rehearsal(random_seed=args.random_seed, batch_distractors=args.batch_distractors,
+                  weighted_sampling=args.weighted_sampling)
     m.run(num_trials=args.num_trials)
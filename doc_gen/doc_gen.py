@@ -6,7 +6,27 @@ if __name__ == "__main__":
     # API documentation.
     md = PyMdDoc(input_directory=Path("../multimodal_challenge"), files=["dataset/dataset_trial.py",
                                                                          "dataset/env_audio_materials.py",
+                                                                         "dataset/audio_renderer.py",
+                                                                         "dataset/wav_trimmer.py",
+                                                                         "dataset/trial_writer.py",
+                                                                         "dataset/trial_manifest.py",
+                                                                         "dataset/command_log.py",
+                                                                         "dataset/rehearsal_log.py",
+                                                                         "dataset/rehearsal_reader.py",
+                                                                         "dataset/rehearsal_telemetry.py",
+                                                                         "dataset/candidate_positions.py",
+                                                                         "dataset/settle_detector.py",
+                                                                         "dataset/settle_status.py",
+                                                                         "dataset/frame_state.py",
+                                                                         "dataset/dataset_stats.py",
+                                                                         "dataset/occupancy_rasterizer.py",
                                                                          "multimodal_object_init_data.py",
+                                                                         "columnar_encoder.py",
+                                                                         "base_layout.py",
+                                                                         "object_init_table.py",
+                                                                         "object_init_record.py",
+                                                                         "asset_cache.py",
+                                                                         "spatial_index.py",
                                                                          "multimodal_base.py",
                                                                          "trial.py"])
     md.get_docs(output_directory=Path("../doc/api"))
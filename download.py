@@ -1,68 +1,255 @@
+import re
+from hashlib import md5
+from json import loads, dumps
 from argparse import ArgumentParser
 from pathlib import Path
 from platform import system
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Tuple, Optional
 from tqdm import tqdm
-from requests import get
+from requests import Session
+from requests.adapters import HTTPAdapter
 from tdw.librarian import ModelLibrarian, SceneLibrarian
 from multimodal_challenge.paths import OBJECT_LIBRARY_PATH, SCENE_LIBRARY_PATH
+from multimodal_challenge.util import atomic_write
 
 """
 Download every scene and model asset bundle used in this challenge from the remote S3 server to a local directory.
+
+Asset bundles are downloaded in parallel and streamed to temporary `.part` files, which are renamed when they are complete.
+If a download is interrupted, the next run resumes the `.part` file with an HTTP range request.
+The size and MD5 hash of every downloaded file are saved to `manifest.json` in the root download directory. Files in the manifest are skipped by later runs.
+
+Usage: `python3 download.py [ARGUMENTS]`
+
+| Argument | Default | Description |
+| --- | --- | --- |
+| `--dst` | D:/multimodal_asset_bundles | The root download directory. |
+| `--bucket` | https://tdw-public.s3.amazonaws.com | The root URL of the server. This can be any HTTP server with the same directory structure, for example a local mirror. |
+| `--threads` | 8 | The number of concurrent downloads. |
+| `--verify` | | If included, re-hash every file in the manifest and download it again if it doesn't match. |
 """
 
+# The filename of the manifest in the root download directory.
+MANIFEST_FILENAME = "manifest.json"
+# Stream each download in chunks of this many bytes.
+CHUNK_SIZE = 1024 * 1024
+# Write the manifest after this many completed files.
+MANIFEST_WRITE_INTERVAL = 50
+# The URLs of these models have a double slash.
+DOUBLE_SLASHES = ['baking_sheet01', 'baking_sheet02', 'jigsaw_puzzle_composite', 'puzzle_box_composite',
+                  'rattan_basket', 'stack_of_cups_composite']
+
+
+def get_tasks(bucket: str) -> List[Tuple[str, str]]:
+    """
+    :param bucket: The root URL of the server.
+
+    :return: A list of tuples: The URL of each asset bundle and its path relative to the root download directory.
+    """
+
+    tasks: List[Tuple[str, str]] = list()
+    for lib in [SceneLibrarian(library=str(SCENE_LIBRARY_PATH.resolve())),
+                ModelLibrarian(library=str(OBJECT_LIBRARY_PATH.resolve()))]:
+        for record in lib.records:
+            if record.do_not_use:
+                continue
+            p = record.urls[system()].split("ROOT")[1][1:]
+            if record.name in DOUBLE_SLASHES:
+                url = bucket + "/" + str(Path(p).parent).replace("\\", "/") + "//" + record.name
+            else:
+                url = bucket + "/" + p
+            tasks.append((url, p))
+    return tasks
+
+
+def get_md5(path: Path) -> str:
+    """
+    :param path: The path to a file.
+
+    :return: The MD5 hash of the file.
+    """
+
+    h = md5()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def get_etag_md5(headers: dict) -> Optional[str]:
+    """
+    :param headers: The headers of a response.
+
+    :return: The MD5 hash of the file if the ETag is an MD5 hash (this is true of S3 files that weren't uploaded in parts), or None.
+    """
+
+    etag = headers.get("ETag", "").strip('"').lower()
+    if re.fullmatch(r"[0-9a-f]{32}", etag) is None:
+        return None
+    return etag
+
+
+def download(session: Session, url: str, dst: Path) -> Dict[str, object]:
+    """
+    Download a file to a temporary `.part` file and rename it when the download is complete and verified. If the `.part` file already exists, resume the download.
+
+    :param session: The HTTP session.
+    :param url: The URL of the file.
+    :param dst: The destination path.
 
-def download() -> None:
+    :return: The manifest entry of the file: `{"size": size, "md5": md5}`
     """
-    Download the asset bundle.
+
+    part = dst.parent.joinpath(dst.name + ".part")
+    h = md5()
+    offset = 0
+    if part.exists():
+        offset = part.stat().st_size
+        with part.open("rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                h.update(chunk)
+    headers = {"Range": f"bytes={offset}-"} if offset > 0 else dict()
+    with session.get(url, headers=headers, stream=True, timeout=60) as resp:
+        # The partial file is invalid, for example because the remote file is smaller. Start over.
+        if resp.status_code == 416:
+            part.unlink()
+            return download(session=session, url=url, dst=dst)
+        # Resume the partial file.
+        if resp.status_code == 206:
+            mode = "ab"
+            # Content-Range: bytes 100-199/200
+            expected_size = int(resp.headers["Content-Range"].split("/")[1])
+        # The server sent the whole file, either because this is a new download or because it ignored the range.
+        elif resp.status_code == 200:
+            mode = "wb"
+            h = md5()
+            expected_size = int(resp.headers["Content-Length"]) if "Content-Length" in resp.headers else None
+        else:
+            raise Exception(f"{url}: HTTP {resp.status_code}")
+        expected_md5 = get_etag_md5(headers=resp.headers)
+        with part.open(mode) as f:
+            for chunk in resp.iter_content(chunk_size=CHUNK_SIZE):
+                f.write(chunk)
+                h.update(chunk)
+    size = part.stat().st_size
+    # Keep the partial file so that the next run can resume it.
+    if expected_size is not None and size != expected_size:
+        raise Exception(f"{url}: Expected {expected_size} bytes but got {size} bytes.")
+    digest = h.hexdigest()
+    # The file is corrupt, so resuming it won't help.
+    if expected_md5 is not None and digest != expected_md5:
+        part.unlink()
+        raise Exception(f"{url}: Expected MD5 {expected_md5} but got {digest}.")
+    part.replace(dst)
+    return {"size": size, "md5": digest}
+
+
+def process(session: Session, url: str, dst: Path, entry: Optional[dict], verify: bool) -> Optional[Dict[str, object]]:
+    """
+    Download a file if it isn't in the manifest, or if it is in the manifest but doesn't match.
+
+    :param session: The HTTP session.
+    :param url: The URL of the file.
+    :param dst: The destination path.
+    :param entry: The manifest entry of the file. Can be None.
+    :param verify: If True, re-hash the file if it's in the manifest.
+
+    :return: The new manifest entry of the file, or None if the manifest entry is still valid.
     """
 
-    pbar.set_description(f"{record.name}")
-    p = record.urls[system()].split("ROOT")[1][1:]
-    dst = dst_dir.joinpath(p)
     if dst.exists():
-        pbar.update(1)
-        return
-    if record.do_not_use:
-        pbar.update(1)
-        return
-    if not dst.parent.exists():
-        dst.parent.mkdir(parents=True)
-    # Download the asset bundle.
-    if record.name in double_slashes:
-        url = bucket + "/" + str(Path(p).parent).replace("\\", "/") + "//" + record.name
-    else:
-        url = bucket + "/" + p
-    resp = get(url)
-    assert resp.status_code == 200, (url, resp.status_code)
-    # Save the scene.
-    dst.write_bytes(resp.content)
-    pbar.update(1)
+        size = dst.stat().st_size
+        # The file was verified by a previous run.
+        if entry is not None and entry["size"] == size and (not verify or entry["md5"] == get_md5(dst)):
+            return None
+        # The file isn't in the manifest (for example, it was downloaded by an older version of this script).
+        # Compare it to the remote file.
+        if entry is None:
+            resp = session.head(url, timeout=60, allow_redirects=True)
+            if resp.status_code != 200:
+                raise Exception(f"{url}: HTTP {resp.status_code}")
+            remote_size = int(resp.headers["Content-Length"]) if "Content-Length" in resp.headers else -1
+            remote_md5 = get_etag_md5(headers=resp.headers)
+            if remote_size == size:
+                digest = get_md5(dst)
+                if remote_md5 is None or remote_md5 == digest:
+                    return {"size": size, "md5": digest}
+            # Resume a file that is smaller than the remote file.
+            elif 0 <= size < remote_size:
+                dst.replace(dst.parent.joinpath(dst.name + ".part"))
+        if dst.exists():
+            dst.unlink()
+    elif not dst.parent.exists():
+        dst.parent.mkdir(parents=True, exist_ok=True)
+    return download(session=session, url=url, dst=dst)
+
+
+def write_manifest(manifest: Dict[str, dict], path: Path) -> None:
+    """
+    Write the manifest to disk atomically.
+
+    :param manifest: The manifest. Key = The path of a file relative to the root download directory.
+    :param path: The path to the manifest file.
+    """
+
+    with atomic_write(path) as temp_path:
+        temp_path.write_text(dumps(manifest, sort_keys=True), encoding="utf-8")
 
 
 if __name__ == "__main__":
-    bucket = "https://tdw-public.s3.amazonaws.com"
-    double_slashes = ['baking_sheet01', 'baking_sheet02', 'jigsaw_puzzle_composite', 'puzzle_box_composite',
-                      'rattan_basket', 'stack_of_cups_composite']
     parser = ArgumentParser()
     parser.add_argument("--dst", type=str, default="D:/multimodal_asset_bundles", help="The root download directory.")
+    parser.add_argument("--bucket", type=str, default="https://tdw-public.s3.amazonaws.com",
+                        help="The root URL of the server, for example a local mirror.")
+    parser.add_argument("--threads", type=int, default=8, help="The number of concurrent downloads.")
+    parser.add_argument("--verify", action="store_true",
+                        help="Re-hash every file in the manifest and download it again if it doesn't match.")
     args = parser.parse_args()
 
     # Create the root output directory.
     dst_dir = Path(args.dst)
     if not dst_dir.exists():
         dst_dir.mkdir(parents=True)
+    manifest_path = dst_dir.joinpath(MANIFEST_FILENAME)
+    if manifest_path.exists():
+        manifest: Dict[str, dict] = loads(manifest_path.read_text(encoding="utf-8"))
+    else:
+        manifest: Dict[str, dict] = dict()
+
+    # Share a pool of connections between the threads.
+    session = Session()
+    adapter = HTTPAdapter(pool_connections=args.threads, pool_maxsize=args.threads, max_retries=3)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
 
-    # Download all scenes.
-    scene_lib = SceneLibrarian(library=str(SCENE_LIBRARY_PATH.resolve()))
-    pbar = tqdm(total=len(scene_lib.records))
-    for record in scene_lib.records:
-        download()
-    pbar.close()
-
-    # Download all models.
-    # Download all scenes.
-    model_lib = ModelLibrarian(library=str(OBJECT_LIBRARY_PATH.resolve()))
-    pbar = tqdm(total=len(model_lib.records))
-    for record in model_lib.records:
-        download()
-    pbar.close()
+    tasks = get_tasks(bucket=args.bucket.rstrip("/"))
+    errors: List[str] = list()
+    num_completed = 0
+    pbar = tqdm(total=len(tasks))
+    try:
+        with ThreadPoolExecutor(max_workers=args.threads) as executor:
+            futures = {executor.submit(process, session, url, dst_dir.joinpath(p),
+                                       manifest[p] if p in manifest else None, args.verify): p for url, p in tasks}
+            for future in as_completed(futures):
+                p = futures[future]
+                pbar.set_description(Path(p).name)
+                pbar.update(1)
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    errors.append(str(e))
+                    continue
+                # Only the main thread modifies the manifest.
+                if entry is not None:
+                    manifest[p] = entry
+                    num_completed += 1
+                    if num_completed % MANIFEST_WRITE_INTERVAL == 0:
+                        write_manifest(manifest=manifest, path=manifest_path)
+    finally:
+        pbar.close()
+        write_manifest(manifest=manifest, path=manifest_path)
+        session.close()
+    for error in errors:
+        print(error)
+    print(f"Downloaded or verified {num_completed} files. Errors: {len(errors)}")
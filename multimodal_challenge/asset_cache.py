@@ -0,0 +1,385 @@
+from time import time
+from atexit import register
+from json import loads, dumps
+from hashlib import sha256
+from pathlib import Path
+from uuid import uuid4
+from threading import Lock, Thread
+from urllib.parse import unquote
+from socketserver import ThreadingMixIn
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, List, Optional
+from requests import Session
+from multimodal_challenge.paths import ASSET_BUNDLES_DIRECTORY, ASSET_CACHE_DIRECTORY, ASSET_CACHE_SIZE
+
+
+class AssetCache:
+    """
+    A local, content-addressed cache of asset bundles with a local HTTP server that the build can load asset bundles from.
+
+    To enable the cache, set the `MULTIMODAL_ASSET_CACHE` environment variable to the cache directory. The maximum size of the cache in gigabytes is set by `MULTIMODAL_ASSET_CACHE_SIZE` (default: 20). Asset bundles are downloaded from `MULTIMODAL_ASSET_BUNDLES` (either the remote S3 server or a local directory).
+    If the cache is enabled, the URL of every scene and model asset bundle points to the local server. When the build requests an asset bundle that isn't cached, the server downloads it, adds it to the cache, and then sends it to the build.
+
+    - Each asset bundle is stored in `objects/` by the SHA-256 hash of its contents. If two asset bundles are identical, only one copy is stored.
+    - `index.json` records the hash of each asset bundle path and the size and last access time of each stored file.
+    - If the total size of the stored files exceeds the maximum size, the least recently used files are removed.
+
+    To download asset bundles before they are needed, prefetch them. This doesn't block; the asset bundles are downloaded on background threads. If the build requests an asset bundle that is being prefetched or downloaded for another request, the server waits for the download to finish instead of downloading it again.
+
+    ```python
+    from multimodal_challenge.asset_cache import AssetCache
+    from multimodal_challenge.util import get_asset_bundle_paths
+
+    cache = AssetCache.get_default()
+    cache.prefetch(paths=get_asset_bundle_paths(trials=[("mm_kitchen_1a", 0, 0), ("mm_kitchen_1a", 0, 1)]))
+    ```
+    """
+
+    """:class_var
+    The filename of the index in the cache directory.
+    """
+    INDEX_FILENAME: str = "index.json"
+    # The default cache. See: `get_default()`.
+    _DEFAULT: Optional["AssetCache"] = None
+
+    def __init__(self, directory: Path, source: str = ASSET_BUNDLES_DIRECTORY, max_size: float = ASSET_CACHE_SIZE,
+                 max_downloads: int = 4):
+        """
+        :param directory: The cache directory.
+        :param source: The root URL or root directory of the asset bundles.
+        :param max_size: The maximum total size of the cached files in gigabytes.
+        :param max_downloads: The maximum number of concurrent prefetch downloads.
+        """
+
+        """:field
+        The cache directory.
+        """
+        self.directory: Path = directory
+        """:field
+        The root URL or root directory of the asset bundles.
+        """
+        self.source: str = source.rstrip("/")
+        """:field
+        The maximum total size of the cached files in bytes.
+        """
+        self.max_size: int = int(max_size * 1024 ** 3)
+        """:field
+        The URL of the local server. If None, the server hasn't been started.
+        """
+        self.server_url: Optional[str] = None
+        # The directory of the stored files.
+        self._objects_directory: Path = self.directory.joinpath("objects")
+        # The directory of files that are being downloaded.
+        self._temp_directory: Path = self.directory.joinpath("tmp")
+        for d in [self._objects_directory, self._temp_directory]:
+            if not d.exists():
+                d.mkdir(parents=True)
+        self._index_path: Path = self.directory.joinpath(AssetCache.INDEX_FILENAME)
+        # Key = An asset bundle path. Value = The hash of the file.
+        self._paths: Dict[str, str] = dict()
+        # Key = The hash of a file. Value = `{"size": size, "last_access": time}`.
+        self._blobs: Dict[str, dict] = dict()
+        self._load_index()
+        # Guards the index and `self._downloads`.
+        self._lock: Lock = Lock()
+        # Asset bundles that are being downloaded. Key = The asset bundle path.
+        self._downloads: Dict[str, Future] = dict()
+        self._executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers=max_downloads)
+        self._session: Session = Session()
+        self._server: Optional[HTTPServer] = None
+
+    def get_path(self, path: str) -> Path:
+        """
+        Get the cached file of an asset bundle. If the asset bundle isn't cached, download it. If it is being downloaded on another thread, wait for the download to finish.
+
+        :param path: The path of the asset bundle relative to the root, for example `"models/linux/2019.4/4ft_shelf_metal"`.
+
+        :return: The path to the cached file.
+        """
+
+        with self._lock:
+            blob = self._get_cached(path=path)
+            if blob is not None:
+                return blob
+            # Wait for a download on another thread.
+            if path in self._downloads:
+                future = self._downloads[path]
+                download = False
+            # Download the asset bundle on this thread. Register the download so that other threads wait for it.
+            else:
+                future = Future()
+                self._downloads[path] = future
+                download = True
+        if not download:
+            return future.result()
+        try:
+            blob = self._download(path=path)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        future.set_result(blob)
+        return blob
+
+    def prefetch(self, paths: List[str]) -> List[Future]:
+        """
+        Download asset bundles on background threads if they aren't cached.
+
+        :param paths: The paths of the asset bundles relative to the root.
+
+        :return: A list of futures, one per asset bundle that isn't cached. The result of each future is the path to the cached file.
+        """
+
+        futures: List[Future] = list()
+        with self._lock:
+            for path in paths:
+                if self._get_cached(path=path) is not None:
+                    continue
+                if path not in self._downloads:
+                    self._downloads[path] = self._executor.submit(self._download, path)
+                futures.append(self._downloads[path])
+        return futures
+
+    def get_url(self, path: str) -> str:
+        """
+        :param path: The path of the asset bundle relative to the root.
+
+        :return: The URL of the asset bundle on the local server. If the server isn't running, it is started.
+        """
+
+        if self.server_url is None:
+            self.start_server()
+        return f"{self.server_url}/{path}"
+
+    def start_server(self, port: int = 0) -> str:
+        """
+        Start the local server on a background thread.
+
+        :param port: The port. If 0, use any free port.
+
+        :return: The URL of the server.
+        """
+
+        if self._server is None:
+            self._server = _AssetCacheServer(("127.0.0.1", port), _AssetCacheRequestHandler)
+            self._server.cache = self
+            Thread(target=self._server.serve_forever, daemon=True).start()
+            self.server_url = f"http://127.0.0.1:{self._server.server_address[1]}"
+        return self.server_url
+
+    def stop_server(self) -> None:
+        """
+        Stop the local server and write the index to disk.
+        """
+
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+            self.server_url = None
+        self.flush()
+
+    def flush(self) -> None:
+        """
+        Write the index to disk, including the last access time of each file.
+        """
+
+        with self._lock:
+            self._write_index()
+
+    def get_size(self) -> int:
+        """
+        :return: The total size of the cached files in bytes.
+        """
+
+        with self._lock:
+            return sum([b["size"] for b in self._blobs.values()])
+
+    @staticmethod
+    def get_default() -> "AssetCache":
+        """
+        :return: The cache in `MULTIMODAL_ASSET_CACHE`. This is created the first time this function is called. The index is written to disk when the process exits.
+        """
+
+        if AssetCache._DEFAULT is None:
+            if ASSET_CACHE_DIRECTORY is None:
+                raise Exception("The asset cache isn't enabled. Set the MULTIMODAL_ASSET_CACHE environment variable.")
+            AssetCache._DEFAULT = AssetCache(directory=ASSET_CACHE_DIRECTORY)
+            # Save the last access times when the process exits.
+            register(AssetCache._DEFAULT.flush)
+        return AssetCache._DEFAULT
+
+    def _get_cached(self, path: str) -> Optional[Path]:
+        """
+        Call this while holding the lock.
+
+        :param path: The path of the asset bundle relative to the root.
+
+        :return: The path to the cached file and update its last access time, or None if the asset bundle isn't cached.
+        """
+
+        if path not in self._paths:
+            return None
+        h = self._paths[path]
+        blob = self._get_blob_path(h)
+        if h not in self._blobs or not blob.exists():
+            del self._paths[path]
+            return None
+        self._blobs[h]["last_access"] = time()
+        return blob
+
+    def _download(self, path: str) -> Path:
+        """
+        Download an asset bundle and add it to the cache.
+
+        :param path: The path of the asset bundle relative to the root.
+
+        :return: The path to the cached file.
+        """
+
+        temp_path = self._temp_directory.joinpath(uuid4().hex)
+        h = sha256()
+        try:
+            with temp_path.open("wb") as f:
+                if self.source.startswith("http"):
+                    with self._session.get(f"{self.source}/{path}", stream=True, timeout=60) as resp:
+                        if resp.status_code != 200:
+                            raise Exception(f"{self.source}/{path}: HTTP {resp.status_code}")
+                        for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                            f.write(chunk)
+                            h.update(chunk)
+                # Local asset bundles don't have double slashes in their paths, e.g. for baking_sheet01.
+                else:
+                    with Path(self.source).joinpath(path.replace("//", "/")).open("rb") as src:
+                        for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                            f.write(chunk)
+                            h.update(chunk)
+            digest = h.hexdigest()
+            blob = self._get_blob_path(digest)
+            with self._lock:
+                # Another asset bundle has the same contents.
+                if blob.exists():
+                    temp_path.unlink()
+                else:
+                    if not blob.parent.exists():
+                        blob.parent.mkdir(parents=True)
+                    temp_path.replace(blob)
+                    self._blobs[digest] = {"size": blob.stat().st_size, "last_access": time()}
+                self._blobs[digest]["last_access"] = time()
+                self._paths[path] = digest
+                self._evict(keep=digest)
+                self._write_index()
+            return blob
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+            with self._lock:
+                if path in self._downloads:
+                    del self._downloads[path]
+
+    def _evict(self, keep: str) -> None:
+        """
+        Remove the least recently used files until the total size is less than the maximum size. Call this while holding the lock.
+
+        :param keep: The hash of a file that won't be removed.
+        """
+
+        size = sum([b["size"] for b in self._blobs.values()])
+        for h in sorted(self._blobs, key=lambda k: self._blobs[k]["last_access"]):
+            if size <= self.max_size:
+                break
+            if h == keep:
+                continue
+            blob = self._get_blob_path(h)
+            if blob.exists():
+                blob.unlink()
+            size -= self._blobs[h]["size"]
+            del self._blobs[h]
+        # Remove paths to files that were removed.
+        self._paths = {p: h for p, h in self._paths.items() if h in self._blobs}
+
+    def _get_blob_path(self, h: str) -> Path:
+        """
+        :param h: The hash of a file.
+
+        :return: The path to the stored file.
+        """
+
+        return self._objects_directory.joinpath(h[:2]).joinpath(h)
+
+    def _load_index(self) -> None:
+        """
+        Load the index and reconcile it with the stored files. Files that aren't in the index are added and files that don't exist are removed from the index.
+        """
+
+        if self._index_path.exists():
+            data = loads(self._index_path.read_text(encoding="utf-8"))
+            self._paths = data["paths"]
+            self._blobs = data["blobs"]
+        blobs: Dict[str, dict] = dict()
+        for d in self._objects_directory.iterdir():
+            for f in d.iterdir():
+                if f.name in self._blobs:
+                    blobs[f.name] = self._blobs[f.name]
+                else:
+                    blobs[f.name] = {"size": f.stat().st_size, "last_access": f.stat().st_mtime}
+        self._blobs = blobs
+        self._paths = {p: h for p, h in self._paths.items() if h in self._blobs}
+        # Remove incomplete downloads.
+        for f in self._temp_directory.iterdir():
+            f.unlink()
+
+    def _write_index(self) -> None:
+        """
+        Write the index to disk atomically. Call this while holding the lock.
+        """
+
+        # This can't use `atomic_write()` from `multimodal_challenge.util` because that module imports this one.
+        temp_path = self._index_path.parent.joinpath(self._index_path.name + ".tmp")
+        temp_path.write_text(dumps({"paths": self._paths, "blobs": self._blobs}), encoding="utf-8")
+        temp_path.replace(self._index_path)
+
+
+class _AssetCacheServer(ThreadingMixIn, HTTPServer):
+    """
+    A multi-threaded HTTP server of an `AssetCache`.
+    """
+
+    daemon_threads = True
+    cache: Optional[AssetCache] = None
+
+
+class _AssetCacheRequestHandler(BaseHTTPRequestHandler):
+    """
+    Send cached asset bundles. Asset bundles that aren't cached are downloaded first.
+    """
+
+    def do_GET(self) -> None:
+        self._send(body=True)
+
+    def do_HEAD(self) -> None:
+        self._send(body=False)
+
+    def _send(self, body: bool) -> None:
+        """
+        :param body: If True, send the file. If False, send only the headers.
+        """
+
+        path = unquote(self.path.split("?")[0]).lstrip("/")
+        try:
+            blob = self.server.cache.get_path(path=path)
+        except Exception as e:
+            self.send_error(404, str(e))
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(blob.stat().st_size))
+        self.end_headers()
+        if body:
+            with blob.open("rb") as f:
+                for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                    self.wfile.write(chunk)
+
+    def log_message(self, format: str, *args) -> None:
+        # Don't log every request.
+        return
@@ -0,0 +1,120 @@
+from json import loads
+from typing import List, Dict, Tuple, Union
+import numpy as np
+from multimodal_challenge.paths import OBJECT_INIT_DIRECTORY
+from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+from multimodal_challenge.object_init_table import ObjectInitTable
+
+
+class BaseLayout:
+    """
+    The object initialization data of each scene_layout combination (`OBJECT_INIT_DIRECTORY/{scene}_{layout}.json`).
+
+    Most of the objects in a [`Trial`](trial.md) are scene objects that haven't moved from their positions in the base layout. A trial stores only the scene objects whose pose changed, plus the target object and the distractors, as a delta against the base layout:
+
+    - Encoded trial data has a list of objects and a list of `base_indices`. For each object, this is either the index of the scene object that it replaces in the base layout, or -1 if it isn't a scene object.
+    - A decoded (full) list of objects is every scene object in the order of the base layout followed by every other object.
+
+    Each base layout is read and parsed the first time it is needed and then cached as an [`ObjectInitTable`](object_init_table.md) for the rest of the process.
+
+    ```python
+    from multimodal_challenge.base_layout import BaseLayout
+
+    object_init_data = BaseLayout.get_object_init_data(scene_layout="mm_kitchen_1a_0")
+    ```
+    """
+
+    """:class_var
+    If a scene object moved more than this many meters from its position in the base layout, it is included in the delta.
+    """
+    POSITION_TOLERANCE: float = 0.001
+    """:class_var
+    If a scene object rotated more than this many degrees from its rotation in the base layout, it is included in the delta.
+    """
+    ROTATION_TOLERANCE: float = 0.1
+    # The table of each base layout. Key = The scene_layout combination.
+    _CACHE: Dict[str, ObjectInitTable] = dict()
+
+    @staticmethod
+    def get_table(scene_layout: str) -> ObjectInitTable:
+        """
+        :param scene_layout: The scene_layout combination, for example `"mm_kitchen_1a_0"`.
+
+        :return: The cached [`ObjectInitTable`](object_init_table.md) of the scene objects in the base layout. Don't modify this table.
+        """
+
+        if scene_layout not in BaseLayout._CACHE:
+            path = OBJECT_INIT_DIRECTORY.joinpath(f"{scene_layout}.json")
+            if not path.exists():
+                raise Exception(f"Base layout not found: {path}")
+            BaseLayout._CACHE[scene_layout] = ObjectInitTable.from_object_init_data(
+                objects=loads(path.read_text(encoding="utf-8")))
+        return BaseLayout._CACHE[scene_layout]
+
+    @staticmethod
+    def get_object_init_data(scene_layout: str) -> List[MultiModalObjectInitData]:
+        """
+        :param scene_layout: The scene_layout combination, for example `"mm_kitchen_1a_0"`.
+
+        :return: New initialization data for each scene object in the base layout.
+        """
+
+        return BaseLayout.get_table(scene_layout=scene_layout).get_object_init_data()
+
+    @staticmethod
+    def encode(scene_layout: str, object_init_data: Union[ObjectInitTable, List[MultiModalObjectInitData]]) -> \
+            Tuple[ObjectInitTable, List[int]]:
+        """
+        :param scene_layout: The scene_layout combination, for example `"mm_kitchen_1a_0"`.
+        :param object_init_data: The full list of objects: Every scene object in the order of the base layout, followed by every other object.
+
+        :return: Tuple: A table of the objects in the delta, and the index of each of these objects in the base layout (-1 if the object isn't a scene object).
+        """
+
+        base = BaseLayout.get_table(scene_layout=scene_layout)
+        table = ObjectInitTable.from_object_init_data(objects=object_init_data)
+        num_base = len(base)
+        if len(table) < num_base:
+            raise Exception(f"Expected at least {num_base} objects in {scene_layout} but got {len(table)}.")
+        for i in range(num_base):
+            if table.names[i] != base.names[i]:
+                raise Exception(f"Expected {base.names[i]} at index {i} of {scene_layout} but got {table.names[i]}.")
+        # Compare the scene objects to the base layout.
+        changed = np.logical_or(table.kinematic[:num_base] != base.kinematic,
+                                np.any(table.scale_factors[:num_base] != base.scale_factors, axis=1))
+        changed |= np.linalg.norm(table.positions[:num_base] - base.positions, axis=1) > BaseLayout.POSITION_TOLERANCE
+        q0 = base.rotations
+        q1 = table.rotations[:num_base]
+        euler = np.logical_or(np.isnan(q0[:, 3]), np.isnan(q1[:, 3]))
+        # Compare Euler angles component-wise.
+        changed[euler] |= np.logical_not(np.all((q0[euler] == q1[euler]) |
+                                                (np.isnan(q0[euler]) & np.isnan(q1[euler])), axis=1))
+        # Compare quaternions by the angle between them.
+        quaternion = np.logical_not(euler)
+        dot = np.abs(np.sum(q0[quaternion] * q1[quaternion], axis=1)) / \
+            (np.linalg.norm(q0[quaternion], axis=1) * np.linalg.norm(q1[quaternion], axis=1))
+        changed[quaternion] |= np.rad2deg(2 * np.arccos(np.minimum(dot, 1))) > BaseLayout.ROTATION_TOLERANCE
+        indices = np.concatenate([np.flatnonzero(changed), np.arange(num_base, len(table))]).tolist()
+        base_indices = [i if i < num_base else -1 for i in indices]
+        return table.select(indices=indices), base_indices
+
+    @staticmethod
+    def decode(scene_layout: str, object_init_data: Union[ObjectInitTable, List[MultiModalObjectInitData]],
+               base_indices: List[int]) -> ObjectInitTable:
+        """
+        :param scene_layout: The scene_layout combination, for example `"mm_kitchen_1a_0"`.
+        :param object_init_data: The objects in the delta.
+        :param base_indices: The index of each object of the delta in the base layout (-1 if the object isn't a scene object).
+
+        :return: A table of the full list of objects: Every scene object in the order of the base layout, followed by every other object.
+        """
+
+        table = BaseLayout.get_table(scene_layout=scene_layout).copy()
+        delta = ObjectInitTable.from_object_init_data(objects=object_init_data)
+        extra: List[int] = list()
+        for i, base_index in enumerate(base_indices):
+            if base_index < 0:
+                extra.append(i)
+            else:
+                table.set(index=base_index, object_init_data=delta[i])
+        return ObjectInitTable.concatenate(tables=[table, delta.select(indices=extra)])
@@ -61,6 +61,10 @@ class AddOn(ABC):
         If True, this module has been initialized.
         """
         self.initialized: bool = False
+        """:field
+        The total time in seconds that the controller spent in this add-on's `on_send()` function.
+        """
+        self.on_send_time: float = 0
 
     @abstractmethod
     def get_initialization_commands(self) -> List[dict]:
@@ -0,0 +1,151 @@
+from json import dumps
+from time import perf_counter
+from pathlib import Path
+from collections import deque
+from typing import List, Dict, Union
+import numpy as np
+from multimodal_challenge.dataset.add_ons.add_on import AddOn
+
+
+class Benchmark(AddOn):
+    """
+    Measure the performance of every `communicate()` call:
+
+    - `latency`: The time in seconds between sending the commands and receiving the response.
+    - `commands`: The number of commands.
+    - `command_bytes`: The size of the JSON payload of the commands in bytes.
+    - `response_frames`: The number of output data byte arrays in the response, including the frame number.
+    - `response_bytes`: The total size of the response in bytes.
+
+    The most recent samples of each metric are kept in a rolling window. `get_summary()` returns statistics and a histogram of each metric over the window, plus the frames per second (the number of `communicate()` calls divided by the wall time of the window, including the time spent in Python between calls).
+
+    ```python
+    from multimodal_challenge.multimodal import MultiModal
+    from multimodal_challenge.dataset.add_ons.benchmark import Benchmark
+
+    m = MultiModal()
+    b = Benchmark()
+    m.add_ons.append(b)
+    m.init_scene(scene="mm_kitchen_1a", layout=0, trial=57)
+    for i in range(100):
+        m.communicate([])
+    print(b.fps)
+    b.write(path="benchmark.json")
+    m.end()
+    ```
+
+    The commands are measured after duplicate output data requests are removed. They include the Magnebot API's per-frame commands but not its `step_physics` command.
+    """
+
+    """:class_var
+    The name of each metric.
+    """
+    METRICS: List[str] = ["latency", "commands", "command_bytes", "response_frames", "response_bytes"]
+
+    def __init__(self, window: int = 1000, bins: int = 20, measure_payload: bool = True):
+        """
+        :param window: The number of recent `communicate()` calls to keep.
+        :param bins: The number of bins of each histogram.
+        :param measure_payload: If True, measure the size of the JSON payload of the commands. This serializes the commands a second time, which adds some overhead.
+        """
+
+        super().__init__()
+        """:field
+        If True, record each `communicate()` call. Set this to False to pause the benchmark.
+        """
+        self.enabled: bool = True
+        """:field
+        The frames per second over the rolling window. This is updated after every `communicate()` call.
+        """
+        self.fps: float = 0
+        """:field
+        The total number of recorded `communicate()` calls, including calls that are no longer in the rolling window.
+        """
+        self.num_frames: int = 0
+        """:field
+        The samples of each metric in the rolling window. Key = The name of the metric.
+        """
+        self.samples: Dict[str, deque] = {m: deque(maxlen=window) for m in Benchmark.METRICS}
+        # The number of bins of each histogram.
+        self._bins: int = bins
+        # If True, measure the size of the JSON payload.
+        self._measure_payload: bool = measure_payload
+        # The time at which the most recent commands were sent. If -1, there are no pending commands.
+        self._send_time: float = -1
+        # The time at which each call in the rolling window started.
+        self._start_times: deque = deque(maxlen=window)
+
+    def get_initialization_commands(self) -> List[dict]:
+        return []
+
+    def before_send(self, commands: List[dict]) -> None:
+        if not self.enabled:
+            return
+        self.samples["commands"].append(len(commands))
+        self.samples["command_bytes"].append(len(dumps(commands).encode("utf-8")) if self._measure_payload else 0)
+        self._send_time = perf_counter()
+        self._start_times.append(self._send_time)
+
+    def on_send(self, resp: List[bytes]) -> None:
+        # Ignore a response whose commands weren't recorded, for example because the benchmark was just enabled.
+        if not self.enabled or self._send_time < 0:
+            return
+        t = perf_counter()
+        self.samples["latency"].append(t - self._send_time)
+        self.samples["response_frames"].append(len(resp))
+        self.samples["response_bytes"].append(sum([len(r) for r in resp]))
+        self._send_time = -1
+        self.num_frames += 1
+        dt = t - self._start_times[0]
+        self.fps = len(self._start_times) / dt if dt > 0 else 0
+
+    def reset(self) -> None:
+        """
+        Clear every sample.
+        """
+
+        for m in self.samples:
+            self.samples[m].clear()
+        self._start_times.clear()
+        self._send_time = -1
+        self.fps = 0
+        self.num_frames = 0
+
+    def get_summary(self) -> Dict[str, Union[float, int, Dict[str, Union[float, List[float]]]]]:
+        """
+        :return: A dictionary: `"fps"`, `"num_frames"`, and a dictionary per metric of the mean, standard deviation, minimum, 50th/90th/99th percentiles, and maximum of the samples in the rolling window, and a histogram: `"bins"` (the edges of each bin) and `"counts"` (the number of samples per bin).
+        """
+
+        summary: Dict[str, Union[float, int, Dict[str, Union[float, List[float]]]]] = {"fps": self.fps,
+                                                                                      "num_frames": self.num_frames}
+        for m in Benchmark.METRICS:
+            # The latency has one fewer sample than the other metrics if there is a pending response.
+            values = np.array(self.samples[m], dtype=np.float64)
+            if len(values) == 0:
+                summary[m] = dict()
+                continue
+            counts, bins = np.histogram(values, bins=self._bins)
+            percentiles = np.percentile(values, [50, 90, 99])
+            summary[m] = {"mean": float(np.mean(values)),
+                          "std": float(np.std(values)),
+                          "min": float(np.min(values)),
+                          "p50": float(percentiles[0]),
+                          "p90": float(percentiles[1]),
+                          "p99": float(percentiles[2]),
+                          "max": float(np.max(values)),
+                          "bins": bins.tolist(),
+                          "counts": counts.tolist()}
+        return summary
+
+    def write(self, path: Union[str, Path]) -> None:
+        """
+        Write the summary to a .json file.
+
+        :param path: The path to the file.
+        """
+
+        if isinstance(path, str):
+            path = Path(path)
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        path.write_text(dumps(self.get_summary(), indent=2), encoding="utf-8")
@@ -0,0 +1,136 @@
+import wave
+from base64 import b64decode
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+
+
+class AudioRenderer:
+    """
+    Render impact sounds offline, without playing them in the build or recording a sound card.
+
+    Per frame, pass the audio commands generated by PyImpact (`play_audio_data` or `play_point_source_data`) to `add_commands()` along with the number of physics frames simulated so far.
+    The renderer decodes each impact sound and remembers when it started. `render()` mixes every impact sound into a mono buffer at its simulation timestamp and optionally applies a reverb approximation.
+
+    ```python
+    renderer = AudioRenderer()
+    renderer.start()
+    # Per frame:
+    commands = py_impact.get_audio_commands(resp=resp, floor=floor, wall=wall)
+    renderer.add_commands(commands=commands, frame=frame)
+    # After the trial:
+    samples = renderer.render(reverb_time=env_audio_materials.get_reverb_time(width=6, length=7, height=3))
+    renderer.write(samples=samples, path=Path("0000.wav"))
+    ```
+
+    Unlike audio recorded from the build, the rendered audio isn't spatialized.
+    """
+
+    """:class_var
+    The ratio of the reverberated signal to the dry signal.
+    """
+    REVERB_WET: float = 0.15
+    """:class_var
+    The random seed used to generate the noise of the reverb impulse response. This is constant so that the reverb is the same every time.
+    """
+    REVERB_SEED: int = 0
+
+    def __init__(self, frame_rate: int = 44100, time_step: float = 0.01):
+        """
+        :param frame_rate: The audio frame rate (samples per second).
+        :param time_step: The duration of each physics frame in seconds.
+        """
+
+        """:field
+        The audio frame rate (samples per second).
+        """
+        self.frame_rate: int = frame_rate
+        """:field
+        The duration of each physics frame in seconds.
+        """
+        self.time_step: float = time_step
+        # A list of impact sounds: The first audio sample and the samples as a float array.
+        self._events: List[Tuple[int, np.array]] = list()
+
+    def start(self) -> None:
+        """
+        Discard any impact sounds and start a new recording.
+        """
+
+        self._events.clear()
+
+    def add_commands(self, commands: List[dict], frame: int) -> None:
+        """
+        Remember the impact sounds in a list of commands.
+
+        :param commands: The commands. Commands that don't play audio data are ignored.
+        :param frame: The physics frame at which the commands will be executed.
+        """
+
+        start = int(round(frame * self.time_step * self.frame_rate))
+        for command in commands:
+            if command["$type"] != "play_audio_data" and command["$type"] != "play_point_source_data":
+                continue
+            samples = np.frombuffer(b64decode(command["wav_data"]), dtype=np.int16).astype(float) / 32767
+            self._events.append((start, samples))
+
+    def get_num_sounds(self) -> int:
+        """
+        :return: The number of impact sounds in the current recording.
+        """
+
+        return len(self._events)
+
+    def render(self, reverb_time: float = 0) -> np.array:
+        """
+        Mix every impact sound into a single buffer.
+
+        :param reverb_time: The reverberation time (RT60) in seconds. If 0, there is no reverb.
+
+        :return: The mixed mono audio as an array of floats between -1 and 1.
+        """
+
+        if len(self._events) == 0:
+            return np.zeros(0)
+        length = max([start + len(samples) for start, samples in self._events])
+        mix = np.zeros(length)
+        for start, samples in self._events:
+            mix[start: start + len(samples)] += samples
+        if reverb_time > 0:
+            impulse_response = self._get_impulse_response(reverb_time=reverb_time)
+            # Convolve via FFT.
+            n = len(mix) + len(impulse_response) - 1
+            fft_length = 1 << int(np.ceil(np.log2(n)))
+            reverb = np.fft.irfft(np.fft.rfft(mix, fft_length) * np.fft.rfft(impulse_response, fft_length),
+                                  fft_length)[:n] * AudioRenderer.REVERB_WET
+            # Add the dry signal.
+            reverb[:len(mix)] += mix
+            mix = reverb
+        return np.clip(mix, -1, 1)
+
+    def write(self, samples: np.array, path: Path) -> None:
+        """
+        Write audio to a 16-bit mono .wav file.
+
+        :param samples: The audio as an array of floats between -1 and 1.
+        :param path: The path to the .wav file.
+        """
+
+        with wave.open(str(path.resolve()), "wb") as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(self.frame_rate)
+            f.writeframes((samples * 32767).astype("<i2").tobytes())
+
+    def _get_impulse_response(self, reverb_time: float) -> np.array:
+        """
+        :param reverb_time: The reverberation time (RT60) in seconds.
+
+        :return: A synthetic impulse response: exponentially decaying noise that is attenuated by 60 dB after `reverb_time` seconds. The impulse response has unit energy.
+        """
+
+        t = np.arange(int(reverb_time * self.frame_rate)) / self.frame_rate
+        noise = np.random.RandomState(AudioRenderer.REVERB_SEED).uniform(-1, 1, len(t))
+        # ln(10^3) = 6.91: The amplitude decays by 60 dB.
+        impulse_response = noise * np.exp(-6.91 * t / reverb_time)
+        return impulse_response / np.sqrt(np.sum(impulse_response ** 2))
@@ -0,0 +1,171 @@
+from pathlib import Path
+import numpy as np
+from magnebot.constants import OCCUPANCY_CELL_SIZE
+from multimodal_challenge.paths import OCCUPANCY_MAPS_DIRECTORY, MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY, \
+    CANDIDATE_POSITIONS_DIRECTORY
+from multimodal_challenge.dataset.constants import MIN_OBJECT_DISTANCE_FROM_MAGNEBOT
+
+
+class CandidatePositions:
+    """
+    An index of every position where the Magnebot can spawn and every position where an object can be dropped in a scene_layout combination.
+    For each Magnebot spawn position, the index stores the object positions that are at least `MIN_OBJECT_DISTANCE_FROM_MAGNEBOT` away.
+
+    Positions are derived from the occupancy maps. The index is cached in `multimodal_challenge/data/dataset/candidate_positions/` as a .npz file.
+
+    ```python
+    from multimodal_challenge.dataset.candidate_positions import CandidatePositions
+
+    c = CandidatePositions.get(scene="mm_kitchen_1a", layout=0, x_min=-3.0015454292297363, z_min=-3.483069896697998)
+    magnebot_position = c.magnebot_positions[0]
+    object_positions = c.get_object_positions(0)
+    ```
+    """
+
+    def __init__(self, magnebot_cells: np.array, object_cells: np.array, magnebot_positions: np.array,
+                 object_positions: np.array, offsets: np.array, indices: np.array):
+        """
+        :param magnebot_cells: The occupancy map indices of each Magnebot spawn position as an `(n, 2)` array.
+        :param object_cells: The occupancy map indices of each object position as an `(m, 2)` array.
+        :param magnebot_positions: The worldspace Magnebot spawn positions as an `(n, 3)` array.
+        :param object_positions: The worldspace object positions as an `(m, 3)` array.
+        :param offsets: For each Magnebot spawn position `i`, the object positions that are far enough away are `indices[offsets[i]:offsets[i + 1]]`. This is an `(n + 1)` array.
+        :param indices: Indices of `object_positions`. See `offsets`.
+        """
+
+        """:field
+        The occupancy map indices of each Magnebot spawn position as an `(n, 2)` array.
+        """
+        self.magnebot_cells: np.array = magnebot_cells
+        """:field
+        The occupancy map indices of each object position as an `(m, 2)` array.
+        """
+        self.object_cells: np.array = object_cells
+        """:field
+        The worldspace Magnebot spawn positions as an `(n, 3)` array.
+        """
+        self.magnebot_positions: np.array = magnebot_positions
+        """:field
+        The worldspace object positions as an `(m, 3)` array.
+        """
+        self.object_positions: np.array = object_positions
+        # For each Magnebot spawn position i, the far object positions are indices[offsets[i]:offsets[i + 1]].
+        self._offsets: np.array = offsets
+        self._indices: np.array = indices
+
+    def get_object_indices(self, magnebot_index: int) -> np.array:
+        """
+        :param magnebot_index: The index of the Magnebot spawn position in `self.magnebot_positions`.
+
+        :return: The indices in `self.object_positions` of each object position that is far enough away from the Magnebot spawn position.
+        """
+
+        return self._indices[self._offsets[magnebot_index]:self._offsets[magnebot_index + 1]]
+
+    def get_object_positions(self, magnebot_index: int) -> np.array:
+        """
+        :param magnebot_index: The index of the Magnebot spawn position in `self.magnebot_positions`.
+
+        :return: A new `(k, 3)` array of each object position that is far enough away from the Magnebot spawn position.
+        """
+
+        return self.object_positions[self.get_object_indices(magnebot_index)]
+
+    def save(self, path: Path) -> None:
+        """
+        Save the index to disk.
+
+        :param path: The path to the .npz file.
+        """
+
+        if not path.parent.exists():
+            path.parent.mkdir(parents=True)
+        np.savez(str(path.resolve()), magnebot_cells=self.magnebot_cells, object_cells=self.object_cells,
+                 magnebot_positions=self.magnebot_positions, object_positions=self.object_positions,
+                 offsets=self._offsets, indices=self._indices)
+
+    @staticmethod
+    def load(path: Path) -> "CandidatePositions":
+        """
+        :param path: The path to the .npz file.
+
+        :return: The cached index.
+        """
+
+        data = np.load(str(path.resolve()))
+        return CandidatePositions(magnebot_cells=data["magnebot_cells"], object_cells=data["object_cells"],
+                                  magnebot_positions=data["magnebot_positions"],
+                                  object_positions=data["object_positions"],
+                                  offsets=data["offsets"], indices=data["indices"])
+
+    @staticmethod
+    def create(magnebot_occupancy_map: np.array, occupancy_map: np.array, x_min: float, z_min: float,
+               cell_size: float = OCCUPANCY_CELL_SIZE,
+               min_distance: float = MIN_OBJECT_DISTANCE_FROM_MAGNEBOT) -> "CandidatePositions":
+        """
+        :param magnebot_occupancy_map: The Magnebot occupancy map. Free cells (0) are Magnebot spawn positions.
+        :param occupancy_map: The object occupancy map. Free cells (0) are object positions.
+        :param x_min: The minimum x coordinate of the scene bounds (the x coordinate of the occupancy map's origin).
+        :param z_min: The minimum z coordinate of the scene bounds (the z coordinate of the occupancy map's origin).
+        :param cell_size: The size of each occupancy map cell.
+        :param min_distance: The minimum distance between a Magnebot spawn position and an object position.
+
+        :return: A new index.
+        """
+
+        magnebot_cells = np.argwhere(magnebot_occupancy_map == 0)
+        object_cells = np.argwhere(occupancy_map == 0)
+        magnebot_positions = CandidatePositions._get_positions(cells=magnebot_cells, x_min=x_min, z_min=z_min,
+                                                               cell_size=cell_size)
+        object_positions = CandidatePositions._get_positions(cells=object_cells, x_min=x_min, z_min=z_min,
+                                                             cell_size=cell_size)
+        # Get the distance from each Magnebot position to each object position as an (n, m) array.
+        distances = np.linalg.norm(magnebot_positions[:, np.newaxis, :] - object_positions[np.newaxis, :, :], axis=2)
+        far = distances >= min_distance
+        offsets = np.zeros(len(magnebot_cells) + 1, dtype=int)
+        offsets[1:] = np.cumsum(np.count_nonzero(far, axis=1))
+        indices = np.nonzero(far)[1]
+        return CandidatePositions(magnebot_cells=magnebot_cells, object_cells=object_cells,
+                                  magnebot_positions=magnebot_positions, object_positions=object_positions,
+                                  offsets=offsets, indices=indices)
+
+    @staticmethod
+    def get(scene: str, layout: int, x_min: float, z_min: float) -> "CandidatePositions":
+        """
+        Load the cached index of a scene_layout combination. If there isn't a cached index, create one from the occupancy maps and save it.
+
+        :param scene: The name of the scene.
+        :param layout: The layout index.
+        :param x_min: The minimum x coordinate of the scene bounds (the x coordinate of the occupancy map's origin).
+        :param z_min: The minimum z coordinate of the scene bounds (the z coordinate of the occupancy map's origin).
+
+        :return: The index.
+        """
+
+        path = CANDIDATE_POSITIONS_DIRECTORY.joinpath(f"{scene}_{layout}.npz")
+        if path.exists():
+            return CandidatePositions.load(path)
+        np_filename = f"{scene}_{layout}.npy"
+        candidate_positions = CandidatePositions.create(
+            magnebot_occupancy_map=np.load(str(MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY.joinpath(np_filename).resolve())),
+            occupancy_map=np.load(str(OCCUPANCY_MAPS_DIRECTORY.joinpath(np_filename).resolve())),
+            x_min=x_min,
+            z_min=z_min)
+        candidate_positions.save(path)
+        return candidate_positions
+
+    @staticmethod
+    def _get_positions(cells: np.array, x_min: float, z_min: float, cell_size: float) -> np.array:
+        """
+        :param cells: Occupancy map indices as an `(n, 2)` array.
+        :param x_min: The x coordinate of the occupancy map's origin.
+        :param z_min: The z coordinate of the occupancy map's origin.
+        :param cell_size: The size of each occupancy map cell.
+
+        :return: Worldspace positions as an `(n, 3)` array. The y coordinate is always 0.
+        """
+
+        positions = np.zeros(shape=(len(cells), 3), dtype=float)
+        positions[:, 0] = x_min + cells[:, 0] * cell_size
+        positions[:, 2] = z_min + cells[:, 1] * cell_size
+        return positions
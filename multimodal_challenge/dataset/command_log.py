@@ -0,0 +1,199 @@
+import gzip
+import zlib
+from json import dumps, loads
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import List, Optional, Iterator, Tuple, BinaryIO
+
+
+class CommandLog:
+    """
+    Log the commands sent to the build on a background thread.
+
+    Each logged list of commands is a compact JSON line, `[frame, commands]`, where `frame` is the number of lists of commands that had been sent before this one. The lines are gzip-compressed.
+    When a log file is larger than `max_size` bytes, a new file is started: `log_00000.jsonl.gz`, `log_00001.jsonl.gz`, etc.
+
+    To reduce overhead, the log can be sampled: only every nth list of commands is logged, and empty lists of commands can be skipped.
+
+    The compressed stream is flushed to disk every `flush_interval` lines. If the process is killed, the log can still be read up to the last flush.
+
+    To read a log, call `CommandLog.read()` or run `python3 util/read_command_log.py --directory [DIRECTORY]`
+
+    ```python
+    from pathlib import Path
+    from multimodal_challenge.dataset.command_log import CommandLog
+
+    for frame, commands in CommandLog.read(directory=Path("D:/multimodal_challenge/log")):
+        print(frame, commands)
+    ```
+    """
+
+    def __init__(self, directory: Path, max_size: int = 104857600, interval: int = 1, skip_empty: bool = False,
+                 max_queue_size: int = 1000, flush_interval: int = 100):
+        """
+        :param directory: The log directory. Existing log files in this directory will be deleted.
+        :param max_size: The maximum size of a compressed log file in bytes.
+        :param interval: Log every nth list of commands.
+        :param skip_empty: If True, don't log empty lists of commands.
+        :param max_queue_size: The maximum number of lists of commands that can be waiting to be written. If the queue is full, `log()` blocks until there is space.
+        :param flush_interval: Flush the compressed stream to disk after this many lines have been written.
+        """
+
+        """:field
+        The log directory.
+        """
+        self.directory: Path = directory
+        """:field
+        The maximum size of a compressed log file in bytes.
+        """
+        self.max_size: int = max_size
+        """:field
+        Log every nth list of commands.
+        """
+        self.interval: int = max(1, interval)
+        """:field
+        If True, don't log empty lists of commands.
+        """
+        self.skip_empty: bool = skip_empty
+        """:field
+        Flush the compressed stream to disk after this many lines have been written.
+        """
+        self.flush_interval: int = max(1, flush_interval)
+        """:field
+        The number of lists of commands that have been passed to `log()`.
+        """
+        self.frame: int = 0
+        if not self.directory.exists():
+            self.directory.mkdir(parents=True)
+        for f in CommandLog._get_paths(self.directory):
+            f.unlink()
+        # The pending lines. None tells the thread to stop.
+        self._queue: Queue = Queue(maxsize=max_queue_size)
+        # An exception raised by the background thread.
+        self._error: Optional[Exception] = None
+        # The index of the current log file.
+        self._file_index: int = 0
+        # The number of lines written since the last flush.
+        self._num_unflushed: int = 0
+        # The current raw and compressed files.
+        self._raw: Optional[BinaryIO] = None
+        self._file: Optional[gzip.GzipFile] = None
+        self._thread: Thread = Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def log(self, commands: List[dict]) -> None:
+        """
+        Log a list of commands if it is sampled.
+
+        :param commands: The list of commands.
+        """
+
+        if self._error is not None:
+            raise self._error
+        frame = self.frame
+        self.frame += 1
+        if frame % self.interval != 0 or (self.skip_empty and len(commands) == 0):
+            return
+        # Copy the list because the controller might append commands to it after it is logged.
+        self._queue.put((frame, commands[:]))
+
+    def close(self) -> None:
+        """
+        Write every pending list of commands and close the log file.
+        """
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        if self._error is not None:
+            raise self._error
+
+    @staticmethod
+    def read(directory: Path) -> Iterator[Tuple[int, List[dict]]]:
+        """
+        Read each log file in a directory.
+        If the last log file is truncated (because the process was killed), it is read up to the last complete line.
+
+        :param directory: The log directory.
+
+        :return: An iterator of tuples: The frame and the list of commands.
+        """
+
+        paths = CommandLog._get_paths(directory)
+        for i, path in enumerate(paths):
+            with gzip.open(str(path.resolve()), "rt", encoding="utf-8") as f:
+                try:
+                    for line in f:
+                        # An incomplete last line.
+                        if not line.endswith("\n"):
+                            break
+                        frame, commands = loads(line)
+                        yield frame, commands
+                # The last file might not have been closed.
+                except (EOFError, gzip.BadGzipFile):
+                    if i < len(paths) - 1:
+                        raise
+
+    def _run(self) -> None:
+        """
+        Write lines until `close()` is called.
+        """
+
+        try:
+            while True:
+                item: Optional[Tuple[int, List[dict]]] = self._queue.get()
+                if item is None:
+                    break
+                if self._file is None or self._raw.tell() >= self.max_size:
+                    self._open_next_file()
+                self._file.write((dumps(item, separators=(",", ":")) + "\n").encode("utf-8"))
+                self._num_unflushed += 1
+                if self._num_unflushed >= self.flush_interval:
+                    # Flush the compressed stream so that the file can be read if the process is killed.
+                    self._file.flush(zlib_mode=zlib.Z_SYNC_FLUSH)
+                    self._raw.flush()
+                    self._num_unflushed = 0
+        except Exception as e:
+            self._error = e
+            # Unblock `log()`.
+            while not self._queue.empty():
+                self._queue.get()
+        finally:
+            self._close_file()
+
+    def _open_next_file(self) -> None:
+        """
+        Close the current log file and open the next one.
+        """
+
+        self._close_file()
+        self._raw = self.directory.joinpath(f"log_{str(self._file_index).zfill(5)}.jsonl.gz").open("wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb")
+        self._file_index += 1
+        self._num_unflushed = 0
+
+    def _close_file(self) -> None:
+        """
+        Close the current log file.
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._raw.close()
+            self._file = None
+            self._raw = None
+
+    @staticmethod
+    def _get_paths(directory: Path) -> List[Path]:
+        """
+        :param directory: The log directory.
+
+        :return: The paths to the log files in the directory, in order.
+        """
+
+        if not directory.exists():
+            return []
+        return sorted([f for f in directory.iterdir() if f.is_file() and f.name.startswith("log_") and
+                       f.name.endswith(".jsonl.gz")])
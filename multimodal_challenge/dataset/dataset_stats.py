@@ -0,0 +1,278 @@
+import wave
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple, Union
+import numpy as np
+from multimodal_challenge.paths import DATASET_DIRECTORY
+from multimodal_challenge.util import get_trial_data_path, load_trial, atomic_write
+from multimodal_challenge.base_layout import BaseLayout
+from multimodal_challenge.dataset.trial_manifest import TrialManifest
+
+
+class DatasetStats:
+    """
+    Per-trial statistics of the dataset, cached as columns of numpy arrays.
+
+    The features of each completed trial are extracted once from its trial data, .wav file, and occupancy map and saved to `stats.npz` in the dataset directory. `update()` reads the [`TrialManifest`](trial_manifest.md) of each scene_layout directory and extracts features only for trials that are new or whose files changed since the last update.
+
+    Summaries are computed from the cached columns with array operations, so they don't read any trial files:
+
+    ```python
+    from multimodal_challenge.dataset.dataset_stats import DatasetStats
+
+    stats = DatasetStats()
+    stats.update()
+    summary = stats.summarize(column="target_distance", by="scene")
+    for scene, mean in zip(summary["group"], summary["mean"]):
+        print(scene, mean)
+    ```
+
+    | Column | Type | Description |
+    | --- | --- | --- |
+    | `key` | str | `scene_layout/trial`, for example `"mm_kitchen_1a_0/00000"` |
+    | `scene_layout` | str | The scene_layout combination. |
+    | `scene` | str | The name of the scene. |
+    | `layout` | int | The layout variant. |
+    | `trial` | str | The filename of the trial without an extension. |
+    | `target_model` | str | The name of the model of the target object. |
+    | `target_distance` | float | The distance in meters on the xz plane between the Magnebot and the target object. |
+    | `fall_distance` | float | The distance in meters between the first and last point of the trajectory of the target object. NaN if there is no trajectory. |
+    | `num_objects` | int | The total number of objects. |
+    | `num_distractors` | int | The number of objects that aren't scene objects or the target object. -1 if the trial doesn't have a base layout. |
+    | `audio_duration` | float | The duration of the audio in seconds. |
+    | `audio_peak` | float | The peak level of the audio in dBFS. |
+    | `free_cells` | int | The number of free cells in the occupancy map. |
+    | `modified` | int | The latest modification time of the trial's files in nanoseconds. |
+    | `size` | int | The total size of the trial's files in bytes. |
+    """
+
+    """:class_var
+    The filename of the cache in the dataset directory.
+    """
+    FILENAME: str = "stats.npz"
+    """:class_var
+    The name and numpy type of each column.
+    """
+    COLUMNS: Dict[str, type] = {"key": np.str_,
+                                "scene_layout": np.str_,
+                                "scene": np.str_,
+                                "layout": np.int32,
+                                "trial": np.str_,
+                                "target_model": np.str_,
+                                "target_distance": np.float32,
+                                "fall_distance": np.float32,
+                                "num_objects": np.int32,
+                                "num_distractors": np.int32,
+                                "audio_duration": np.float32,
+                                "audio_peak": np.float32,
+                                "free_cells": np.int32,
+                                "modified": np.int64,
+                                "size": np.int64}
+
+    def __init__(self, directory: Path = DATASET_DIRECTORY):
+        """
+        :param directory: The dataset directory.
+        """
+
+        """:field
+        The dataset directory.
+        """
+        self.directory: Path = directory
+        """:field
+        The path to the cache file.
+        """
+        self.path: Path = directory.joinpath(DatasetStats.FILENAME)
+        """:field
+        The cached columns. Key = The name of the column. Value = A numpy array with one element per trial.
+        """
+        self.columns: Dict[str, np.array] = {k: np.zeros(0, dtype=v) for k, v in DatasetStats.COLUMNS.items()}
+        if self.path.exists():
+            with np.load(str(self.path.resolve()), allow_pickle=False) as f:
+                # Ignore a cache that was written with different columns.
+                if set(f.files) == set(DatasetStats.COLUMNS.keys()):
+                    self.columns = {k: f[k] for k in f.files}
+        """:field
+        A list of problems from the last call to `update()`, one per trial whose features couldn't be extracted.
+        """
+        self.errors: List[str] = list()
+
+    def update(self, processes: int = None) -> int:
+        """
+        Extract the features of every completed trial that is new or changed, remove trials that are no longer in any manifest, and write the cache to disk.
+
+        :param processes: The number of processes. If None, use every CPU. If 1, extract the features in this process.
+
+        :return: The number of trials whose features were extracted.
+        """
+
+        self.errors.clear()
+        rows: Dict[str, int] = {k: i for i, k in enumerate(self.columns["key"].tolist())}
+        keep: List[int] = list()
+        tasks: List[Tuple[Path, str, int, int]] = list()
+        if self.directory.exists():
+            for directory in sorted(self.directory.iterdir()):
+                if not directory.is_dir() or not directory.joinpath(TrialManifest.FILENAME).exists():
+                    continue
+                for filename in TrialManifest(directory=directory).trials:
+                    key = f"{directory.name}/{filename}"
+                    try:
+                        modified, size = DatasetStats._get_signature(directory=directory, filename=filename)
+                    except OSError as e:
+                        self.errors.append(f"{key}: {e}")
+                        continue
+                    # The trial hasn't changed.
+                    if key in rows and self.columns["modified"][rows[key]] == modified and \
+                            self.columns["size"][rows[key]] == size:
+                        keep.append(rows[key])
+                    else:
+                        tasks.append((directory, filename, modified, size))
+        # Extract the features.
+        features: List[dict] = list()
+        if processes == 1:
+            results = [DatasetStats._extract(*task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                results = list(executor.map(DatasetStats._extract, *zip(*tasks))) if len(tasks) > 0 else list()
+        for (directory, filename, modified, size), result in zip(tasks, results):
+            if isinstance(result, str):
+                self.errors.append(f"{directory.name}/{filename}: {result}")
+            else:
+                features.append(result)
+        # Combine the unchanged rows and the new rows.
+        columns: Dict[str, np.array] = dict()
+        for k, v in DatasetStats.COLUMNS.items():
+            columns[k] = np.concatenate([self.columns[k][keep], np.array([f[k] for f in features], dtype=v)])
+        order = np.argsort(columns["key"], kind="stable")
+        self.columns = {k: v[order] for k, v in columns.items()}
+        self._write()
+        return len(features)
+
+    def summarize(self, column: str, by: str = None, mask: np.array = None) -> Dict[str, np.array]:
+        """
+        Summarize a numeric column per group. Non-finite values (for example, NaN) are ignored.
+
+        :param column: The name of a numeric column, for example `"target_distance"`.
+        :param by: The name of the column to group by, for example `"scene"`. If None, there is a single group of every trial.
+        :param mask: If not None, a boolean numpy array with one element per trial. Only trials where this is True are summarized.
+
+        :return: A dictionary of numpy arrays with one element per group: `"group"`, `"count"`, `"mean"`, `"std"`, `"min"`, `"median"`, and `"max"`.
+        """
+
+        values = self.columns[column].astype(np.float64)
+        keys = self.columns[by] if by is not None else np.full(len(values), "all")
+        valid = np.isfinite(values)
+        if mask is not None:
+            valid &= mask
+        groups, inverse = np.unique(keys[valid], return_inverse=True)
+        values = values[valid]
+        if len(values) == 0:
+            empty = np.zeros(0)
+            return {"group": groups, "count": np.zeros(0, dtype=int), "mean": empty, "std": empty, "min": empty,
+                    "median": empty, "max": empty}
+        count = np.bincount(inverse, minlength=len(groups))
+        mean = np.bincount(inverse, weights=values, minlength=len(groups)) / count
+        std = np.sqrt(np.bincount(inverse, weights=(values - mean[inverse]) ** 2, minlength=len(groups)) / count)
+        # Sort the values by group and then by value. Each group is a contiguous, sorted slice.
+        values = values[np.lexsort((values, inverse))]
+        starts = np.concatenate([[0], np.cumsum(count)[:-1]])
+        return {"group": groups,
+                "count": count,
+                "mean": mean,
+                "std": std,
+                "min": values[starts],
+                "median": (values[starts + (count - 1) // 2] + values[starts + count // 2]) / 2,
+                "max": values[starts + count - 1]}
+
+    def count(self, column: str, by: str = None) -> Dict[str, np.array]:
+        """
+        Count the trials per value of a column, for example the number of trials per target model.
+
+        :param column: The name of the column, for example `"target_model"`.
+        :param by: The name of the column to group by, for example `"scene"`. If None, there is a single group of every trial.
+
+        :return: A dictionary of numpy arrays with one element per combination of group and value: `"group"`, `"value"`, and `"count"`.
+        """
+
+        values = self.columns[column]
+        keys = self.columns[by] if by is not None else np.full(len(values), "all")
+        groups, group_indices = np.unique(keys, return_inverse=True)
+        uniques, value_indices = np.unique(values, return_inverse=True)
+        pairs, counts = np.unique(group_indices * len(uniques) + value_indices, return_counts=True)
+        return {"group": groups[pairs // max(len(uniques), 1)],
+                "value": uniques[pairs % max(len(uniques), 1)],
+                "count": counts}
+
+    @staticmethod
+    def _get_signature(directory: Path, filename: str) -> Tuple[int, int]:
+        """
+        :param directory: The scene_layout directory.
+        :param filename: The filename of the trial without an extension.
+
+        :return: Tuple: The latest modification time of the trial's files in nanoseconds, and their total size in bytes.
+        """
+
+        stats = [p.stat() for p in [get_trial_data_path(directory=directory, filename=filename),
+                                    directory.joinpath(f"{filename}.wav"),
+                                    directory.joinpath(f"{filename}.npy")]]
+        return max([s.st_mtime_ns for s in stats]), sum([s.st_size for s in stats])
+
+    @staticmethod
+    def _extract(directory: Path, filename: str, modified: int, size: int) -> Union[dict, str]:
+        """
+        :param directory: The scene_layout directory.
+        :param filename: The filename of the trial without an extension.
+        :param modified: The latest modification time of the trial's files in nanoseconds.
+        :param size: The total size of the trial's files in bytes.
+
+        :return: A dictionary of the features of the trial. If the features can't be extracted, the error as a string.
+        """
+
+        try:
+            trial = load_trial(directory=directory, filename=filename)
+            scene, layout = directory.name.rsplit("_", 1)
+            objects = trial.object_init_data
+            target = objects.positions[trial.target_object_index]
+            if len(trial.target_object_trajectory) > 0:
+                fall_distance = float(np.linalg.norm(trial.target_object_trajectory[-1, 1:] -
+                                                     trial.target_object_trajectory[0, 1:]))
+            else:
+                fall_distance = np.nan
+            if trial.scene_layout is not None:
+                num_distractors = len(objects) - len(BaseLayout.get_table(scene_layout=trial.scene_layout)) - 1
+            else:
+                num_distractors = -1
+            with wave.open(str(directory.joinpath(f"{filename}.wav").resolve()), "rb") as f:
+                audio_duration = f.getnframes() / f.getframerate()
+                samples = np.frombuffer(f.readframes(f.getnframes()), dtype=np.int16)
+            peak = np.max(np.abs(samples.astype(np.int32))) / 32768 if len(samples) > 0 else 0
+            audio_peak = 20 * np.log10(peak) if peak > 0 else -np.inf
+            occupancy_map = np.load(str(directory.joinpath(f"{filename}.npy").resolve()))
+            return {"key": f"{directory.name}/{filename}",
+                    "scene_layout": directory.name,
+                    "scene": scene,
+                    "layout": int(layout),
+                    "trial": filename,
+                    "target_model": objects.names[trial.target_object_index],
+                    "target_distance": float(np.linalg.norm(target[[0, 2]] - trial.magnebot_position[[0, 2]])),
+                    "fall_distance": fall_distance,
+                    "num_objects": len(objects),
+                    "num_distractors": num_distractors,
+                    "audio_duration": audio_duration,
+                    "audio_peak": audio_peak,
+                    "free_cells": int(np.count_nonzero(occupancy_map == 0)),
+                    "modified": modified,
+                    "size": size}
+        except Exception as e:
+            return str(e)
+
+    def _write(self) -> None:
+        """
+        Write the cache to disk atomically.
+        """
+
+        if not self.directory.exists():
+            self.directory.mkdir(parents=True)
+        with atomic_write(self.path) as temp_path:
+            # Write to an open file so that numpy doesn't append a file extension to the temporary path.
+            with temp_path.open("wb") as f:
+                np.savez(f, **self.columns)
@@ -1,5 +1,6 @@
 from typing import Dict, List, Union
 from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+from multimodal_challenge.object_init_table import ObjectInitTable
 
 
 class DatasetTrial:
@@ -10,13 +11,13 @@ class DatasetTrial:
     def __init__(self, target_object: MultiModalObjectInitData, force: Dict[str, float],
                  magnebot_position: Dict[str, float],
                  target_object_position: Dict[str, float],
-                 distractors: List[Union[dict, MultiModalObjectInitData]]):
+                 distractors: Union[ObjectInitTable, List[Union[dict, MultiModalObjectInitData]]]):
         """
         :param target_object: [`MultiModalObjectInitData` initialization data](multimodal_object_init_data.md) for the target object.
         :param force: The initial force of the target object as a Vector3 dictionary.
         :param magnebot_position: The initial position of the Magnebot.
         :param target_object_position: The final position of the target object.
-        :param distractors: Initialization data for the distractor objects.
+        :param distractors: Initialization data for the distractor objects. This can be a list of `MultiModalObjectInitData`, a list of dictionaries, or an `ObjectInitTable`.
         """
 
         # Load the drop parameters from a dictionary.
@@ -41,7 +42,6 @@ class DatasetTrial:
         """
         self.target_object_position: Dict[str, float] = target_object_position
         """:field
-        Initialization data for the distractor objects.
+        Initialization data for the distractor objects as an [`ObjectInitTable`](object_init_table.md). Iterate over the table to get the data of each distractor.
         """
-        self.distractors: List[MultiModalObjectInitData] = [d if isinstance(d, MultiModalObjectInitData) else
-                                                            MultiModalObjectInitData(**d) for d in distractors]
+        self.distractors: ObjectInitTable = ObjectInitTable.from_object_init_data(objects=distractors)
@@ -16,6 +16,15 @@ class EnvAudioMaterials:
                                                               "wood": AudioMaterial.wood_soft,
                                                               "smoothPlaster": AudioMaterial.wood_soft,
                                                               "acousticTile": AudioMaterial.cardboard}
+    """:class_var
+    A dictionary. Key = A Resonance Audio material. Value = The approximate absorption coefficient of the material. This is used to estimate the reverberation time of a room.
+    """
+    ABSORPTION: Dict[str, float] = {"roughPlaster": 0.06,
+                                    "tile": 0.02,
+                                    "concrete": 0.02,
+                                    "wood": 0.1,
+                                    "smoothPlaster": 0.03,
+                                    "acousticTile": 0.72}
 
     def __init__(self, floor: str, wall: str):
         """
@@ -31,3 +40,22 @@ class EnvAudioMaterials:
         The Resonance Audio wall material.
         """
         self.wall: str = wall
+
+    def get_reverb_time(self, width: float, length: float, height: float, ceiling: str = "acousticTile") -> float:
+        """
+        Estimate the reverberation time (RT60) of a rectangular room with the Sabine equation.
+
+        :param width: The width of the room in meters.
+        :param length: The length of the room in meters.
+        :param height: The height of the room in meters.
+        :param ceiling: The Resonance Audio ceiling material.
+
+        :return: The reverberation time in seconds.
+        """
+
+        volume = width * length * height
+        # The absorption area of each surface.
+        absorption = width * length * EnvAudioMaterials.ABSORPTION[self.floor] + \
+            width * length * EnvAudioMaterials.ABSORPTION[ceiling] + \
+            2 * height * (width + length) * EnvAudioMaterials.ABSORPTION[self.wall]
+        return 0.161 * volume / absorption
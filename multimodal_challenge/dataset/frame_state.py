@@ -0,0 +1,209 @@
+from typing import List, Dict
+import numpy as np
+from tdw.output_data import OutputData, Transforms, Rigidbodies, AudioSources
+
+
+class FrameState:
+    """
+    Decode the output data of each frame once into preallocated arrays that are indexed by object ID.
+
+    Call `start()` at the start of each trial with the IDs of every object in the scene. The arrays are allocated once and reused for as long as the number of objects doesn't change.
+    Per frame, call `update()`. This decodes `Transforms`, `Rigidbodies`, and `AudioSources` output data in a single pass over the response. Afterwards, positions, velocities, and whether each object is playing audio can be read without scanning the output data again.
+
+    `AudioSources` output data is requested only for objects that have played audio. Pass each list of audio commands generated by PyImpact to `get_audio_sources_commands()`; if an object played audio for the first time, the returned list includes a new `send_audio_sources` command.
+
+    The target object's trajectory is stored in a ring buffer of `[frame, x, y, z]` rows (see `get_trajectory()`).
+
+    ```python
+    frame_state = FrameState()
+    frame_state.start(object_ids=object_ids, target_object_id=target_object_id)
+    resp = c.communicate([])
+    frame_state.update(resp=resp, frame=1)
+    commands = py_impact.get_audio_commands(resp=resp, floor=floor, wall=wall)
+    commands.extend(frame_state.get_audio_sources_commands(commands=commands))
+    print(frame_state.get_position(target_object_id), frame_state.is_playing())
+    ```
+    """
+
+    def __init__(self, max_trajectory_length: int = 1000):
+        """
+        :param max_trajectory_length: The maximum number of rows in the target object's trajectory. If there are more updates than this, the oldest rows are overwritten.
+        """
+
+        """:field
+        The IDs of every object in the scene, in the order of the rows of each array.
+        """
+        self.object_ids: np.array = np.zeros(0, dtype=int)
+        """:field
+        The position of each object as an `(n, 3)` array.
+        """
+        self.positions: np.array = np.zeros((0, 3))
+        """:field
+        The velocity of each object as an `(n, 3)` array.
+        """
+        self.velocities: np.array = np.zeros((0, 3))
+        """:field
+        An `(n,)` boolean array. True if the object's rigidbody is sleeping.
+        """
+        self.sleeping: np.array = np.zeros(0, dtype=bool)
+        """:field
+        An `(n,)` boolean array. True if the object is playing audio.
+        """
+        self.playing: np.array = np.zeros(0, dtype=bool)
+        """:field
+        The ID of the target object.
+        """
+        self.target_object_id: int = -1
+        """:field
+        The physics frame of the most recent update.
+        """
+        self.frame: int = 0
+        # Key = The object ID. Value = The index of the row in each array.
+        self._indices: Dict[int, int] = dict()
+        # The IDs of the objects that have played audio.
+        self._audio_ids: List[int] = list()
+        # If True, request `AudioSources` for every object. This is set if an audio command targets an unknown ID.
+        self._all_audio: bool = False
+        # If True, audio is playing on something that isn't a scene object.
+        self._other_playing: bool = False
+        # The ring buffer of `[frame, x, y, z]` rows.
+        self._trajectory: np.array = np.zeros((max(1, max_trajectory_length), 4))
+        # The total number of rows added to the ring buffer in this trial.
+        self._trajectory_count: int = 0
+
+    def start(self, object_ids: List[int], target_object_id: int) -> None:
+        """
+        Start a new trial.
+
+        :param object_ids: The IDs of every object in the scene.
+        :param target_object_id: The ID of the target object. This must be in `object_ids`.
+        """
+
+        num_objects = len(object_ids)
+        if len(self.object_ids) != num_objects:
+            self.object_ids = np.zeros(num_objects, dtype=int)
+            self.positions = np.zeros((num_objects, 3))
+            self.velocities = np.zeros((num_objects, 3))
+            self.sleeping = np.zeros(num_objects, dtype=bool)
+            self.playing = np.zeros(num_objects, dtype=bool)
+        else:
+            self.positions.fill(0)
+            self.velocities.fill(0)
+            self.sleeping.fill(False)
+            self.playing.fill(False)
+        self.object_ids[:] = object_ids
+        self._indices = {object_id: i for i, object_id in enumerate(object_ids)}
+        if target_object_id not in self._indices:
+            raise Exception(f"Target object {target_object_id} isn't in the list of object IDs.")
+        self.target_object_id = target_object_id
+        self.frame = 0
+        self._audio_ids.clear()
+        self._all_audio = False
+        self._other_playing = False
+        self._trajectory_count = 0
+
+    def get_audio_sources_commands(self, commands: List[dict]) -> List[dict]:
+        """
+        :param commands: The audio commands that will be sent on this frame.
+
+        :return: A `send_audio_sources` command if any object in `commands` hasn't played audio before. Otherwise, an empty list.
+        """
+
+        added = False
+        for command in commands:
+            if command["$type"] != "play_audio_data" and command["$type"] != "play_point_source_data":
+                continue
+            object_id = command["id"]
+            if object_id in self._audio_ids:
+                continue
+            self._audio_ids.append(object_id)
+            added = True
+            # Audio is playing on something that isn't a scene object, e.g. a Magnebot joint.
+            if object_id not in self._indices:
+                self._all_audio = True
+        if not added:
+            return []
+        # An empty list of IDs requests data for every object.
+        return [{"$type": "send_audio_sources",
+                 "frequency": "always",
+                 "ids": [] if self._all_audio else self._audio_ids[:]}]
+
+    def update(self, resp: List[bytes], frame: int) -> None:
+        """
+        Decode the output data of a frame. Objects that aren't in the output data keep their previous values.
+
+        :param resp: The response from the build.
+        :param frame: The current physics frame.
+        """
+
+        self.frame = frame
+        # If there is no `AudioSources` output data, nothing is playing.
+        self.playing.fill(False)
+        self._other_playing = False
+        for i in range(len(resp) - 1):
+            r_id = OutputData.get_data_type_id(resp[i])
+            if r_id == "tran":
+                transforms = Transforms(resp[i])
+                for j in range(transforms.get_num()):
+                    index = self._indices.get(transforms.get_id(j))
+                    if index is not None:
+                        self.positions[index] = transforms.get_position(j)
+            elif r_id == "rigi":
+                rigidbodies = Rigidbodies(resp[i])
+                for j in range(rigidbodies.get_num()):
+                    index = self._indices.get(rigidbodies.get_id(j))
+                    if index is not None:
+                        self.velocities[index] = rigidbodies.get_velocity(j)
+                        self.sleeping[index] = rigidbodies.get_sleeping(j)
+            elif r_id == "auds":
+                audio_sources = AudioSources(resp[i])
+                for j in range(audio_sources.get_num()):
+                    if not audio_sources.get_is_playing(j):
+                        continue
+                    index = self._indices.get(audio_sources.get_object_id(j))
+                    # Audio is playing on something that isn't a scene object.
+                    if index is None:
+                        self._other_playing = True
+                    else:
+                        self.playing[index] = True
+        # Add the target object's position to the ring buffer.
+        row = self._trajectory[self._trajectory_count % len(self._trajectory)]
+        row[0] = frame
+        row[1:] = self.positions[self._indices[self.target_object_id]]
+        self._trajectory_count += 1
+
+    def get_position(self, object_id: int) -> np.array:
+        """
+        :param object_id: The object ID.
+
+        :return: The position of the object as an `[x, y, z]` array.
+        """
+
+        return self.positions[self._indices[object_id]]
+
+    def get_velocity(self, object_id: int) -> np.array:
+        """
+        :param object_id: The object ID.
+
+        :return: The velocity of the object as an `[x, y, z]` array.
+        """
+
+        return self.velocities[self._indices[object_id]]
+
+    def is_playing(self) -> bool:
+        """
+        :return: True if any object is playing audio.
+        """
+
+        return self._other_playing or bool(self.playing.any())
+
+    def get_trajectory(self) -> np.array:
+        """
+        :return: The target object's trajectory as an `(n, 4)` array of `[frame, x, y, z]` rows, from oldest to newest. This is a copy.
+        """
+
+        length = len(self._trajectory)
+        if self._trajectory_count <= length:
+            return self._trajectory[:self._trajectory_count].copy()
+        start = self._trajectory_count % length
+        return np.concatenate((self._trajectory[start:], self._trajectory[:start]))
@@ -0,0 +1,306 @@
+from json import loads
+from collections import deque
+from typing import List, Dict, Tuple, Union, Optional
+import numpy as np
+from tdw.librarian import ModelLibrarian
+from magnebot.constants import OCCUPANCY_CELL_SIZE
+from multimodal_challenge.paths import SCENE_BOUNDS_DIRECTORY, OCCUPANCY_MAPS_DIRECTORY, OBJECT_LIBRARY_PATH
+from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+from multimodal_challenge.object_init_table import ObjectInitTable
+from multimodal_challenge.base_layout import BaseLayout
+
+
+class OccupancyRasterizer:
+    """
+    Create an occupancy map without the build. Instead of casting rays and overlap capsules (see [`OccupancyMap`](../../multimodal_challenge/dataset/add_ons/occupancy_map.py)), the bounds of each model are rotated by the rotation of the object and projected onto the grid.
+
+    The grid is the same as that of an `OccupancyMap`: it is derived from the scene bounds in `SCENE_BOUNDS_DIRECTORY` and each cell is as wide as `OCCUPANCY_CELL_SIZE`. A cell is occupied if an object's footprint is within half of a cell of the center of the cell.
+
+    The scene's occupancy map in `OCCUPANCY_MAPS_DIRECTORY` (which was created with raycasts) is used to find cells that are out of bounds and cells that are occupied by walls and other parts of the scene that aren't objects. As in an `OccupancyMap`, every free cell that isn't in the largest continuous region of free cells is marked as out of bounds.
+
+    ```python
+    from multimodal_challenge.util import load_trial
+    from multimodal_challenge.paths import DATASET_DIRECTORY
+    from multimodal_challenge.dataset.occupancy_rasterizer import OccupancyRasterizer
+
+    directory = DATASET_DIRECTORY.joinpath("mm_kitchen_1a_0")
+    trial = load_trial(directory=directory, filename="00000")
+    rasterizer = OccupancyRasterizer(scene="mm_kitchen_1a", layout=0)
+    occupancy_map = rasterizer.rasterize(objects=trial.object_init_data)
+    ```
+
+    To compare the rasterized occupancy maps to the occupancy maps of the dataset: `python3 util/validate_occupancy_rasterizer.py`
+    """
+
+    def __init__(self, scene: str, layout: int, cell_size: float = OCCUPANCY_CELL_SIZE, use_scene_map: bool = True):
+        """
+        :param scene: The name of the scene.
+        :param layout: The layout variant.
+        :param cell_size: The diameter of each cell in meters.
+        :param use_scene_map: If True, use the scene's occupancy map to find cells that are out of bounds or occupied by walls. If False, only the edges of the occupancy map are out of bounds and walls are ignored.
+        """
+
+        # The scene bounds are the same for each variant of a room, for example mm_kitchen_1a and mm_kitchen_1b.
+        bounds: Dict[str, float] = loads(SCENE_BOUNDS_DIRECTORY.joinpath(f"{scene[:-1]}.json").read_text(
+            encoding="utf-8"))
+        """:field
+        The minimum x coordinate of the scene bounds (the x coordinate of the occupancy map's origin).
+        """
+        self.x_min: float = bounds["x_min"]
+        """:field
+        The minimum z coordinate of the scene bounds (the z coordinate of the occupancy map's origin).
+        """
+        self.z_min: float = bounds["z_min"]
+        """:field
+        The diameter of each cell in meters.
+        """
+        self.cell_size: float = cell_size
+        """:field
+        The shape of the occupancy map.
+        """
+        self.shape: Tuple[int, int] = (OccupancyRasterizer._get_num_cells(bounds["x_min"], bounds["x_max"],
+                                                                          cell_size) + 1,
+                                       OccupancyRasterizer._get_num_cells(bounds["z_min"], bounds["z_max"],
+                                                                          cell_size) + 1)
+        # The (x, z) worldspace position of each cell, in the order of the flattened occupancy map.
+        ix, iz = np.meshgrid(np.arange(self.shape[0]), np.arange(self.shape[1]), indexing="ij")
+        self._positions: np.array = np.stack([self.x_min + ix.flatten() * cell_size,
+                                              self.z_min + iz.flatten() * cell_size], axis=1)
+        """:field
+        A boolean numpy array of cells that are out of bounds.
+        """
+        self.out_of_bounds: np.array = np.zeros(self.shape, dtype=bool)
+        # Assume that the edges of the occupancy map are out of bounds.
+        self.out_of_bounds[[0, -1], :] = True
+        self.out_of_bounds[:, [0, -1]] = True
+        """:field
+        A boolean numpy array of cells that are occupied by parts of the scene that aren't objects, such as walls.
+        """
+        self.static: np.array = np.zeros(self.shape, dtype=bool)
+        # The local bounding box corners of each model. Key = The model name.
+        self._corners: Dict[str, Optional[np.array]] = dict()
+        self._librarian: ModelLibrarian = ModelLibrarian(library=str(OBJECT_LIBRARY_PATH.resolve()))
+        scene_map_path = OCCUPANCY_MAPS_DIRECTORY.joinpath(f"{scene}_{layout}.npy")
+        if use_scene_map and scene_map_path.exists():
+            scene_map: np.array = np.load(str(scene_map_path.resolve()))
+            if scene_map.shape != self.shape:
+                raise Exception(f"Expected occupancy map shape {self.shape} but got {scene_map.shape}: "
+                                f"{scene_map_path}")
+            self.out_of_bounds |= scene_map == -1
+            # Occupied cells that aren't occupied by any object in the base layout are walls.
+            self.static = (scene_map == 1) & np.logical_not(
+                self.get_footprints(objects=BaseLayout.get_table(scene_layout=f"{scene}_{layout}")))
+
+    def rasterize(self, objects: Union[ObjectInitTable, List[MultiModalObjectInitData]]) -> np.array:
+        """
+        :param objects: Every object in the scene.
+
+        :return: An occupancy map: -1 for cells that are out of bounds, 0 for free cells, and 1 for occupied cells.
+        """
+
+        occupancy_map = np.where(self.get_footprints(objects=objects) | self.static, 1, 0)
+        occupancy_map[self.out_of_bounds] = -1
+        OccupancyRasterizer._remove_islands(occupancy_map=occupancy_map)
+        return occupancy_map
+
+    def get_footprints(self, objects: Union[ObjectInitTable, List[MultiModalObjectInitData]]) -> np.array:
+        """
+        :param objects: A list of objects.
+
+        :return: A boolean numpy array of the cells that are occupied by at least one of the objects. Objects whose models aren't in the model library are ignored.
+        """
+
+        table = ObjectInitTable.from_object_init_data(objects=objects)
+        occupied = np.zeros(len(self._positions), dtype=bool)
+        radius = self.cell_size / 2
+        for i in range(len(table)):
+            corners = self._get_corners(name=table.names[i])
+            if corners is None:
+                continue
+            rotation = OccupancyRasterizer._get_rotation_matrix(rotation=table.rotations[i])
+            # Scale, rotate, and translate the corners. Then, project them onto the xz plane.
+            corners = ((corners * table.scale_factors[i]) @ rotation.T + table.positions[i])[:, [0, 2]]
+            hull = OccupancyRasterizer._get_convex_hull(points=corners)
+            # Only test the cells that are near the footprint.
+            near = np.all((self._positions >= np.min(hull, axis=0) - radius) &
+                          (self._positions <= np.max(hull, axis=0) + radius), axis=1)
+            indices = np.flatnonzero(near & np.logical_not(occupied))
+            if len(indices) > 0:
+                occupied[indices] = OccupancyRasterizer._intersects(points=self._positions[indices], polygon=hull,
+                                                                    radius=radius)
+        return occupied.reshape(self.shape)
+
+    def validate(self, occupancy_map: np.array,
+                 objects: Union[ObjectInitTable, List[MultiModalObjectInitData]]) -> Dict[str, Union[int, float]]:
+        """
+        Compare a rasterized occupancy map to an occupancy map created with raycasts.
+
+        :param occupancy_map: The occupancy map created with raycasts.
+        :param objects: Every object in the scene when the occupancy map was created.
+
+        :return: A dictionary: `"agreement"` (the fraction of cells with the same value), `"num_cells"`, `"false_free"` (the number of cells that are free in the rasterized map but not in `occupancy_map`), `"false_occupied"` (the number of cells that are occupied in the rasterized map but free in `occupancy_map`), and `"false_out_of_bounds"` (the number of cells that are out of bounds in the rasterized map but not in `occupancy_map`).
+        """
+
+        if occupancy_map.shape != self.shape:
+            raise Exception(f"Expected occupancy map shape {self.shape} but got {occupancy_map.shape}")
+        rasterized = self.rasterize(objects=objects)
+        return {"agreement": float(np.mean(rasterized == occupancy_map)),
+                "num_cells": int(occupancy_map.size),
+                "false_free": int(np.count_nonzero((rasterized == 0) & (occupancy_map != 0))),
+                "false_occupied": int(np.count_nonzero((rasterized == 1) & (occupancy_map == 0))),
+                "false_out_of_bounds": int(np.count_nonzero((rasterized == -1) & (occupancy_map != -1)))}
+
+    def _get_corners(self, name: str) -> Optional[np.array]:
+        """
+        :param name: The name of the model.
+
+        :return: The eight corners of the model's bounding box in local space as an `(8, 3)` numpy array, or None if the model isn't in the library.
+        """
+
+        if name not in self._corners:
+            record = self._librarian.get_record(name)
+            if record is None:
+                self._corners[name] = None
+            else:
+                b = record.bounds
+                xs = [b["left"]["x"], b["right"]["x"]]
+                ys = [b["bottom"]["y"], b["top"]["y"]]
+                zs = [b["back"]["z"], b["front"]["z"]]
+                self._corners[name] = np.array([[x, y, z] for x in xs for y in ys for z in zs], dtype=np.float64)
+        return self._corners[name]
+
+    @staticmethod
+    def _get_num_cells(minimum: float, maximum: float, cell_size: float) -> int:
+        """
+        :param minimum: The minimum coordinate of the scene bounds.
+        :param maximum: The maximum coordinate of the scene bounds.
+        :param cell_size: The diameter of each cell in meters.
+
+        :return: The number of cells along an axis. This accumulates floats in the same way as `OccupancyMap.generate()`, so the grids are exactly the same.
+        """
+
+        num_cells = 0
+        p = minimum
+        while p < maximum:
+            p += cell_size
+            num_cells += 1
+        return num_cells
+
+    @staticmethod
+    def _get_rotation_matrix(rotation: np.array) -> np.array:
+        """
+        :param rotation: A rotation as an `[x, y, z, w]` quaternion. If `w` is NaN, the rotation is Euler angles in degrees.
+
+        :return: A 3x3 rotation matrix.
+        """
+
+        if np.isnan(rotation[3]):
+            # Unity applies Euler angles in this order: z, x, y.
+            x, y, z = np.deg2rad(rotation[:3]) / 2
+            qx = np.array([np.sin(x), 0, 0, np.cos(x)])
+            qy = np.array([0, np.sin(y), 0, np.cos(y)])
+            qz = np.array([0, 0, np.sin(z), np.cos(z)])
+            q = OccupancyRasterizer._multiply(OccupancyRasterizer._multiply(qy, qx), qz)
+        else:
+            q = rotation / np.linalg.norm(rotation)
+        x, y, z, w = q
+        return np.array([[1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w)],
+                         [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w)],
+                         [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y)]])
+
+    @staticmethod
+    def _multiply(q0: np.array, q1: np.array) -> np.array:
+        """
+        :param q0: An `[x, y, z, w]` quaternion.
+        :param q1: An `[x, y, z, w]` quaternion.
+
+        :return: The product `q0 * q1`.
+        """
+
+        x0, y0, z0, w0 = q0
+        x1, y1, z1, w1 = q1
+        return np.array([w0 * x1 + x0 * w1 + y0 * z1 - z0 * y1,
+                         w0 * y1 - x0 * z1 + y0 * w1 + z0 * x1,
+                         w0 * z1 + x0 * y1 - y0 * x1 + z0 * w1,
+                         w0 * w1 - x0 * x1 - y0 * y1 - z0 * z1])
+
+    @staticmethod
+    def _get_convex_hull(points: np.array) -> np.array:
+        """
+        :param points: An `(n, 2)` numpy array of points.
+
+        :return: The convex hull of the points as an `(m, 2)` numpy array in counter-clockwise order.
+        """
+
+        def __cross(o: np.array, a: np.array, b: np.array) -> float:
+            return (a[0] - o[0]) * (b[1] - o[1]) - (a[1] - o[1]) * (b[0] - o[0])
+
+        # Andrew's monotone chain algorithm.
+        points = np.unique(points, axis=0)
+        if len(points) < 3:
+            return points
+        lower: List[np.array] = list()
+        for p in points:
+            while len(lower) >= 2 and __cross(lower[-2], lower[-1], p) <= 0:
+                lower.pop()
+            lower.append(p)
+        upper: List[np.array] = list()
+        for p in points[::-1]:
+            while len(upper) >= 2 and __cross(upper[-2], upper[-1], p) <= 0:
+                upper.pop()
+            upper.append(p)
+        return np.array(lower[:-1] + upper[:-1])
+
+    @staticmethod
+    def _intersects(points: np.array, polygon: np.array, radius: float) -> np.array:
+        """
+        :param points: An `(n, 2)` numpy array of points.
+        :param polygon: A convex polygon as an `(m, 2)` numpy array of vertices in counter-clockwise order.
+        :param radius: The radius of a circle around each point.
+
+        :return: A boolean numpy array: True if the circle around the point intersects the polygon.
+        """
+
+        a = polygon
+        ab = np.roll(polygon, -1, axis=0) - a
+        ap = points[:, np.newaxis, :] - a[np.newaxis, :, :]
+        # The point is inside the polygon if it's to the left of every edge.
+        cross = ab[np.newaxis, :, 0] * ap[:, :, 1] - ab[np.newaxis, :, 1] * ap[:, :, 0]
+        inside = np.all(cross >= 0, axis=1) if len(polygon) >= 3 else np.zeros(len(points), dtype=bool)
+        # Get the distance from the point to the nearest point on each edge.
+        length_squared = np.maximum(np.sum(ab * ab, axis=1), 1e-12)
+        t = np.clip(np.sum(ap * ab[np.newaxis, :, :], axis=2) / length_squared, 0, 1)
+        distances = np.linalg.norm(ap - t[:, :, np.newaxis] * ab[np.newaxis, :, :], axis=2)
+        return inside | (np.min(distances, axis=1) <= radius)
+
+    @staticmethod
+    def _remove_islands(occupancy_map: np.array) -> None:
+        """
+        Mark every free cell that isn't in the largest continuous region of free cells as out of bounds. If regions are the same size, the last region in row-major order is kept, as in `OccupancyMap`.
+
+        :param occupancy_map: The occupancy map. This is modified in-place.
+        """
+
+        labels = np.full(occupancy_map.shape, -1, dtype=int)
+        sizes: List[int] = list()
+        for start in zip(*np.nonzero(occupancy_map == 0)):
+            if labels[start] >= 0:
+                continue
+            label = len(sizes)
+            labels[start] = label
+            size = 0
+            to_check = deque([start])
+            while len(to_check) > 0:
+                px, pz = to_check.popleft()
+                size += 1
+                for nx in range(max(px - 1, 0), min(px + 2, occupancy_map.shape[0])):
+                    for nz in range(max(pz - 1, 0), min(pz + 2, occupancy_map.shape[1])):
+                        if occupancy_map[nx, nz] == 0 and labels[nx, nz] < 0:
+                            labels[nx, nz] = label
+                            to_check.append((nx, nz))
+            sizes.append(size)
+        if len(sizes) <= 1:
+            return
+        # Keep the last of the largest regions.
+        largest = len(sizes) - 1 - int(np.argmax(np.array(sizes)[::-1]))
+        occupancy_map[(labels >= 0) & (labels != largest)] = -1
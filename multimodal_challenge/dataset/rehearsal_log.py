@@ -0,0 +1,216 @@
+from os import fsync
+from json import loads, dumps
+from pathlib import Path
+from typing import List, Optional, TextIO
+import numpy as np
+from multimodal_challenge.dataset.dataset_trial import DatasetTrial
+from multimodal_challenge.encoder import Encoder
+from multimodal_challenge.util import atomic_write
+from multimodal_challenge.dataset.rehearsal_reader import RehearsalReader
+
+
+class RehearsalLog:
+    """
+    An append-only log of the accepted [`DatasetTrials`](dataset_trial.md) of a scene_layout combination.
+
+    Each line of the log is a JSON dictionary: the `DatasetTrial`, the state of the random number generator immediately after the trial was accepted, and the attempts and rejections recorded by [`RehearsalTelemetry`](rehearsal_telemetry.md) since the previous trial.
+    Lines are written as soon as a trial is accepted and are flushed to disk in batches.
+    If the rehearsal crashes, at most the last unflushed batch is lost, and the rehearsal can resume from the last line of the log.
+
+    Call `finalize()` to compact the log into the indexed JSON lines format that `dataset.py` reads (see [`RehearsalReader`](rehearsal_reader.md)).
+    The state of the random number generator after the last trial is saved to a small state file next to the compacted trials so that a resumed rehearsal can skip the scene_layout combination and continue with the same random state as an uninterrupted rehearsal (see `load_rng_state()`).
+    """
+
+    def __init__(self, path: Path, flush_interval: int = 10):
+        """
+        :param path: The path to the log file.
+        :param flush_interval: Flush the log to disk after this many trials have been appended.
+        """
+
+        """:field
+        The path to the log file.
+        """
+        self.path: Path = path
+        """:field
+        Flush the log to disk after this many trials have been appended.
+        """
+        self.flush_interval: int = flush_interval
+        """:field
+        The number of trials in the log.
+        """
+        self.num_trials: int = 0
+        # The state of the random number generator after the last logged trial.
+        self._rng_state: Optional[tuple] = None
+        # The number of trials appended since the last flush.
+        self._num_unflushed: int = 0
+        # The open log file.
+        self._file: Optional[TextIO] = None
+        self._read()
+
+    def get_rng_state(self) -> Optional[tuple]:
+        """
+        :return: The state of the random number generator after the last logged trial, in the format used by `np.random.RandomState.set_state()`. If the log is empty, this is None.
+        """
+
+        return self._rng_state
+
+    def append(self, trial: DatasetTrial, rng_state: tuple, telemetry: dict = None) -> None:
+        """
+        Append a trial to the log. Flush the log to disk every `flush_interval` trials.
+
+        :param trial: The accepted trial.
+        :param rng_state: The state of the random number generator, as returned by `np.random.RandomState.get_state()`.
+        :param telemetry: If not None, the attempts and rejections since the previous trial, as returned by `RehearsalTelemetry.get_pending()`.
+        """
+
+        if self._file is None:
+            if not self.path.parent.exists():
+                self.path.parent.mkdir(parents=True)
+            self._file = self.path.open("at", encoding="utf-8")
+        line = {"trial": trial, "rng": rng_state}
+        if telemetry is not None:
+            line["telemetry"] = telemetry
+        self._file.write(dumps(line, cls=Encoder) + "\n")
+        self._rng_state = rng_state
+        self.num_trials += 1
+        self._num_unflushed += 1
+        if self._num_unflushed >= self.flush_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Flush any appended trials to disk.
+        """
+
+        if self._file is None or self._num_unflushed == 0:
+            return
+        self._file.flush()
+        fsync(self._file.fileno())
+        self._num_unflushed = 0
+
+    def close(self) -> None:
+        """
+        Flush any appended trials to disk and close the log file.
+        """
+
+        if self._file is None:
+            return
+        self.flush()
+        self._file.close()
+        self._file = None
+
+    def get_trials(self) -> List[DatasetTrial]:
+        """
+        :return: A list of each `DatasetTrial` in the log.
+        """
+
+        self.flush()
+        return [DatasetTrial(**line["trial"]) for line in RehearsalLog._read_lines(self.path)]
+
+    def get_telemetry(self) -> List[dict]:
+        """
+        :return: The attempts and rejections that were logged with each trial. See: `RehearsalTelemetry.commit()`.
+        """
+
+        self.flush()
+        return [line["telemetry"] for line in RehearsalLog._read_lines(self.path) if "telemetry" in line]
+
+    def finalize(self, output_path: Path, num_trials: int = None) -> None:
+        """
+        Compact the log into an indexed JSON lines file of `DatasetTrial` data (the format that `dataset.py` reads), save the state of the random number generator after the last trial, and delete the log.
+        The file, its index, and the state file are written atomically.
+
+        :param output_path: The path to the output JSON lines file. See: `RehearsalReader.get_path()`.
+        :param num_trials: If not None, only write this many trials.
+        """
+
+        self.close()
+        lines = RehearsalLog._read_lines(self.path)
+        if num_trials is not None:
+            lines = lines[:num_trials]
+        RehearsalReader.write(trials=[line["trial"] for line in lines], path=output_path)
+        # Save the random state after the last trial. The log is deleted only after the state is saved.
+        if len(lines) > 0:
+            with atomic_write(RehearsalLog.get_rng_state_path(output_path=output_path)) as temp_path:
+                temp_path.write_text(dumps(lines[-1]["rng"]), encoding="utf-8")
+        if self.path.exists():
+            self.path.unlink()
+
+    @staticmethod
+    def get_rng_state_path(output_path: Path) -> Path:
+        """
+        :param output_path: The path to the compacted JSON lines file. See: `RehearsalReader.get_path()`.
+
+        :return: The path to the file of the random number generator state that `finalize()` saves.
+        """
+
+        return output_path.parent.joinpath(output_path.name[:-len(".jsonl")] + ".rng.json")
+
+    @staticmethod
+    def load_rng_state(output_path: Path, log_path: Path = None) -> Optional[tuple]:
+        """
+        Load the state of the random number generator after the last trial of a finalized log.
+
+        :param output_path: The path to the compacted JSON lines file. See: `RehearsalReader.get_path()`.
+        :param log_path: The path to the log file. If the rehearsal was interrupted before the state file was written, the log file still exists and the state is read from it instead.
+
+        :return: The state of the random number generator, in the format used by `np.random.RandomState.set_state()`. If there is no saved state (for example, rehearsal data from an older version), this is None.
+        """
+
+        rng_path = RehearsalLog.get_rng_state_path(output_path=output_path)
+        if rng_path.exists():
+            return RehearsalLog._get_rng_state(loads(rng_path.read_text(encoding="utf-8")))
+        if log_path is not None:
+            return RehearsalLog(path=log_path).get_rng_state()
+        return None
+
+    def _read(self) -> None:
+        """
+        Read an existing log. If the last line is incomplete (because the process was killed mid-write), truncate it.
+        """
+
+        if not self.path.exists():
+            return
+        lines = RehearsalLog._read_lines(self.path)
+        self.num_trials = len(lines)
+        if self.num_trials > 0:
+            self._rng_state = RehearsalLog._get_rng_state(lines[-1]["rng"])
+
+    @staticmethod
+    def _read_lines(path: Path) -> List[dict]:
+        """
+        :param path: The path to the log file.
+
+        :return: A list of dictionaries, one per line: The `DatasetTrial` dictionary (`"trial"`), the serialized random number generator state (`"rng"`), and optionally the attempts and rejections (`"telemetry"`).
+        """
+
+        if not path.exists():
+            return []
+        text = path.read_text(encoding="utf-8")
+        lines: List[dict] = list()
+        # The number of characters in the complete lines.
+        valid_length = 0
+        for line in text.split("\n"):
+            # The last line is either empty (the log ends with a newline) or incomplete.
+            if valid_length + len(line) >= len(text):
+                break
+            try:
+                data = loads(line)
+            except ValueError:
+                break
+            lines.append(data)
+            valid_length += len(line) + 1
+        # Remove an incomplete trailing line so that new lines are appended to a valid log.
+        if valid_length < len(text):
+            path.write_text(text[:valid_length], encoding="utf-8")
+        return lines
+
+    @staticmethod
+    def _get_rng_state(state: list) -> tuple:
+        """
+        :param state: A random number generator state deserialized from JSON.
+
+        :return: A random number generator state that can be used by `np.random.RandomState.set_state()`.
+        """
+
+        return state[0], np.array(state[1], dtype=np.uint32), int(state[2]), int(state[3]), float(state[4])
@@ -0,0 +1,146 @@
+from json import loads, dumps
+from pathlib import Path
+from typing import List, Union, Optional, BinaryIO
+import numpy as np
+from multimodal_challenge.dataset.dataset_trial import DatasetTrial
+from multimodal_challenge.encoder import Encoder
+from multimodal_challenge.paths import REHEARSAL_DIRECTORY
+from multimodal_challenge.util import atomic_write
+
+
+class RehearsalReader:
+    """
+    Random access to the [`DatasetTrials`](dataset_trial.md) of a scene_layout combination generated by [`rehearsal.py`](../dataset/rehearsal.md).
+
+    The trials are stored as JSON lines (`mm_kitchen_1a_0.trials.jsonl`) with a sidecar index (`mm_kitchen_1a_0.trials.idx`) of the byte offset of each line. A trial is read and parsed only when it is requested, so memory use doesn't depend on the number of trials.
+
+    If there is only a .json list of trials (`mm_kitchen_1a_0.json`, the format of older rehearsal data), the list is read into memory. The rehearsal data is never modified.
+
+    ```python
+    from multimodal_challenge.dataset.rehearsal_reader import RehearsalReader
+
+    reader = RehearsalReader(scene="mm_kitchen_1a", layout=0)
+    for i in range(reader.get_num_trials()):
+        dataset_trial = reader.get_trial(i)
+    reader.close()
+    ```
+    """
+
+    def __init__(self, scene: str, layout: int, directory: Path = REHEARSAL_DIRECTORY):
+        """
+        :param scene: The name of the scene.
+        :param layout: The layout index.
+        :param directory: The rehearsal directory.
+        """
+
+        """:field
+        The path to the JSON lines file.
+        """
+        self.path: Path = RehearsalReader.get_path(scene=scene, layout=layout, directory=directory)
+        """:field
+        The path to the index file.
+        """
+        self.index_path: Path = RehearsalReader.get_index_path(path=self.path)
+        # The offset of each line, plus the size of the file.
+        self._offsets: np.array = np.array([], dtype="<u8")
+        # The trials of older rehearsal data. If None, the trials are read from the JSON lines file.
+        self._legacy_trials: Optional[List[dict]] = None
+        if self.path.exists() and self.index_path.exists():
+            self._offsets = np.fromfile(str(self.index_path.resolve()), dtype="<u8")
+        else:
+            legacy_path = directory.joinpath(f"{scene}_{layout}.json")
+            if not legacy_path.exists():
+                raise Exception(f"Rehearsal data not found: {self.path}")
+            self._legacy_trials = loads(legacy_path.read_text(encoding="utf-8"))
+        # The JSON lines file. This is opened when the first trial is read.
+        self._file: Optional[BinaryIO] = None
+
+    def get_num_trials(self) -> int:
+        """
+        :return: The number of trials.
+        """
+
+        if self._legacy_trials is not None:
+            return len(self._legacy_trials)
+        return len(self._offsets) - 1
+
+    def get_trial(self, index: int) -> DatasetTrial:
+        """
+        Read and parse a trial.
+
+        :param index: The index of the trial.
+
+        :return: The `DatasetTrial`.
+        """
+
+        if index < 0 or index >= self.get_num_trials():
+            raise Exception(f"Trial index {index} is out of range. There are {self.get_num_trials()} trials.")
+        if self._legacy_trials is not None:
+            return DatasetTrial(**self._legacy_trials[index])
+        if self._file is None:
+            self._file = self.path.open("rb")
+        self._file.seek(int(self._offsets[index]))
+        return DatasetTrial(**loads(self._file.read(int(self._offsets[index + 1] - self._offsets[index]))))
+
+    def close(self) -> None:
+        """
+        Close the JSON lines file.
+        """
+
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    @staticmethod
+    def get_path(scene: str, layout: int, directory: Path = REHEARSAL_DIRECTORY) -> Path:
+        """
+        :param scene: The name of the scene.
+        :param layout: The layout index.
+        :param directory: The rehearsal directory.
+
+        :return: The path to the JSON lines file of a scene_layout combination.
+        """
+
+        return directory.joinpath(f"{scene}_{layout}.trials.jsonl")
+
+    @staticmethod
+    def get_index_path(path: Path) -> Path:
+        """
+        :param path: The path to a JSON lines file.
+
+        :return: The path to the index file.
+        """
+
+        return path.parent.joinpath(path.name[:-len(".jsonl")] + ".idx")
+
+    @staticmethod
+    def exists(scene: str, layout: int, directory: Path = REHEARSAL_DIRECTORY) -> bool:
+        """
+        :param scene: The name of the scene.
+        :param layout: The layout index.
+        :param directory: The rehearsal directory.
+
+        :return: True if there is rehearsal data for the scene_layout combination, in either format.
+        """
+
+        path = RehearsalReader.get_path(scene=scene, layout=layout, directory=directory)
+        return (path.exists() and RehearsalReader.get_index_path(path=path).exists()) or \
+            directory.joinpath(f"{scene}_{layout}.json").exists()
+
+    @staticmethod
+    def write(trials: List[Union[dict, DatasetTrial]], path: Path) -> None:
+        """
+        Write trials as JSON lines and write the index. Both files are written atomically; the index is written last.
+
+        :param trials: The trials, either as `DatasetTrial` objects or as dictionaries.
+        :param path: The path to the JSON lines file.
+        """
+
+        offsets: List[int] = [0]
+        with atomic_write(path) as temp_path:
+            with temp_path.open("wb") as f:
+                for trial in trials:
+                    f.write((dumps(trial, cls=Encoder) + "\n").encode("utf-8"))
+                    offsets.append(f.tell())
+        with atomic_write(RehearsalReader.get_index_path(path=path)) as temp_path:
+            np.array(offsets, dtype="<u8").tofile(str(temp_path.resolve()))
@@ -0,0 +1,289 @@
+from json import loads, dumps
+from pathlib import Path
+from typing import Dict, List, Optional
+import numpy as np
+from multimodal_challenge.util import atomic_write
+
+
+class RehearsalTelemetry:
+    """
+    Record why [`rehearsal.py`](../dataset/rehearsal.md) rejected trials, and use the history of rejections to weight the random sampling of drop cells and models.
+
+    Each rejection is appended to `rejections.jsonl` as a JSON dictionary:
+
+    | Key | Description |
+    | --- | --- |
+    | `scene_layout` | The scene_layout combination, e.g. `mm_kitchen_1a_0`. |
+    | `reason` | Why the trial was rejected, e.g. `target_below_floor`. |
+    | `model` | The name of the model that caused the rejection. |
+    | `cell` | The occupancy map cell `[x, z]` from which the model was dropped. |
+    | `frames` | The number of physics frames simulated in the trial. |
+    | `wall_time` | The duration of the trial in seconds. |
+
+    The number of attempts and rejections per drop cell and per model of every completed run are saved to `rejection_statistics.json`.
+
+    The sampling weights are derived from the statistics of the previous runs. When a run starts, these statistics are frozen in `run_statistics.json`. If the run is interrupted and resumed, the frozen statistics are reused, so a resumed run samples exactly like an uninterrupted run with the same random seed.
+
+    Attempts and rejections are recorded in three stages:
+
+    1. `add_attempt()` and `add_rejection()` record them in memory.
+    2. `get_pending()` returns everything recorded since the last accepted trial. `rehearsal.py` saves this in the [`RehearsalLog`](rehearsal_log.md) along with the trial. Attempts and rejections after the last logged trial are discarded if `rehearsal.py` stops; the same trials are repeated when it resumes, so they are counted only once.
+    3. `commit()` adds the logged attempts and rejections of a completed scene_layout combination to `run_statistics.json` and appends its rejections to `rejections.jsonl`.
+
+    `close()` adds the statistics of the run to `rejection_statistics.json` and deletes `run_statistics.json`.
+    """
+
+    """:class_var
+    The minimum sampling weight of a drop cell or a model.
+    """
+    MIN_WEIGHT: float = 0.05
+
+    def __init__(self, directory: Path):
+        """
+        :param directory: The output directory.
+        """
+
+        """:field
+        The path to the rejections log file.
+        """
+        self.rejections_path: Path = directory.joinpath("rejections.jsonl")
+        """:field
+        The path to the statistics file of every completed run.
+        """
+        self.statistics_path: Path = directory.joinpath("rejection_statistics.json")
+        """:field
+        The path to the statistics file of the current run.
+        """
+        self.run_statistics_path: Path = directory.joinpath("run_statistics.json")
+        """:field
+        The number of attempts and rejections per drop cell per scene_layout combination of every completed run and every completed scene_layout combination of this run. Key = The scene_layout combination. Value = A dictionary: Key = The cell, e.g. `"12,34"`. Value = `[attempts, rejections]`.
+        """
+        self.cells: Dict[str, Dict[str, List[int]]] = dict()
+        """:field
+        The number of attempts and rejections per model of every completed run and every completed scene_layout combination of this run. Key = The name of the model. Value = `[attempts, rejections]`.
+        """
+        self.models: Dict[str, List[int]] = dict()
+        if self.statistics_path.exists():
+            data = loads(self.statistics_path.read_text(encoding="utf-8"))
+            self.cells = data["cells"]
+            self.models = data["models"]
+        # The statistics of the current run.
+        # `statistics` is the frozen statistics from which the sampling weights are derived.
+        # `scene_layouts` is the attempts and rejections of each completed scene_layout combination of this run.
+        if self.run_statistics_path.exists():
+            self._run: dict = loads(self.run_statistics_path.read_text(encoding="utf-8"))
+        else:
+            self._run: dict = {"statistics": {"cells": self.cells, "models": self.models},
+                               "scene_layouts": dict()}
+            self._write_run()
+        # Sampling weights are derived from the frozen statistics.
+        self._cells_snapshot: Dict[str, Dict[str, List[int]]] = loads(dumps(self._run["statistics"]["cells"]))
+        self._models_snapshot: Dict[str, List[int]] = loads(dumps(self._run["statistics"]["models"]))
+        # Add the completed scene_layout combinations of a resumed run.
+        self.cells = loads(dumps(self._run["statistics"]["cells"]))
+        self.models = loads(dumps(self._run["statistics"]["models"]))
+        for statistics in self._run["scene_layouts"].values():
+            self._add(statistics=statistics, cells=self.cells, models=self.models)
+        # The attempts and rejections since the last call to `get_pending()`.
+        self._pending: dict = RehearsalTelemetry._get_empty()
+
+    def add_attempt(self, scene_layout: str, cell: np.array, model: str) -> None:
+        """
+        Record that a model was dropped from a cell.
+
+        :param scene_layout: The scene_layout combination.
+        :param cell: The occupancy map cell `[x, z]`.
+        :param model: The name of the model.
+        """
+
+        RehearsalTelemetry._get_cell(cells=self._pending["cells"], scene_layout=scene_layout, cell=cell)[0] += 1
+        RehearsalTelemetry._get_model(models=self._pending["models"], model=model)[0] += 1
+
+    def add_rejection(self, scene_layout: str, reason: str, cell: np.array, model: str, frames: int,
+                      wall_time: float) -> None:
+        """
+        Record that a model caused a trial to be rejected.
+
+        :param scene_layout: The scene_layout combination.
+        :param reason: Why the trial was rejected.
+        :param cell: The occupancy map cell `[x, z]` from which the model was dropped.
+        :param model: The name of the model.
+        :param frames: The number of physics frames simulated in the trial.
+        :param wall_time: The duration of the trial in seconds.
+        """
+
+        RehearsalTelemetry._get_cell(cells=self._pending["cells"], scene_layout=scene_layout, cell=cell)[1] += 1
+        RehearsalTelemetry._get_model(models=self._pending["models"], model=model)[1] += 1
+        self._pending["rejections"].append({"scene_layout": scene_layout,
+                                            "reason": reason,
+                                            "model": model,
+                                            "cell": [int(cell[0]), int(cell[1])],
+                                            "frames": int(frames),
+                                            "wall_time": float(wall_time)})
+
+    def get_pending(self) -> dict:
+        """
+        Get the attempts and rejections that were recorded since the last call to this function, and stop tracking them. Save the returned dictionary with the accepted trial and pass it to `commit()` when the scene_layout combination is complete.
+
+        :return: A JSON-serializable dictionary of attempts and rejections.
+        """
+
+        pending = self._pending
+        self._pending = RehearsalTelemetry._get_empty()
+        return pending
+
+    def commit(self, scene_layout: str, pending: List[dict]) -> None:
+        """
+        Add the attempts and rejections of a completed scene_layout combination to the statistics of this run and append its rejections to `rejections.jsonl`.
+        If the scene_layout combination was already committed in this run, this doesn't do anything.
+
+        :param scene_layout: The scene_layout combination.
+        :param pending: Each dictionary returned by `get_pending()` while generating the trials of the scene_layout combination.
+        """
+
+        if scene_layout in self._run["scene_layouts"]:
+            return
+        statistics = RehearsalTelemetry._get_empty()
+        for p in pending:
+            self._add(statistics=p, cells=statistics["cells"], models=statistics["models"])
+        self._run["scene_layouts"][scene_layout] = {"cells": statistics["cells"], "models": statistics["models"]}
+        self._add(statistics=statistics, cells=self.cells, models=self.models)
+        self._write_run()
+        rejections = [r for p in pending for r in p["rejections"]]
+        if len(rejections) > 0:
+            with self.rejections_path.open("at", encoding="utf-8") as f:
+                f.write("".join([dumps(r) + "\n" for r in rejections]))
+
+    def get_cell_weights(self, scene_layout: str, cells: np.array) -> np.array:
+        """
+        :param scene_layout: The scene_layout combination.
+        :param cells: The occupancy map cells as an `(n, 2)` array.
+
+        :return: The sampling weight of each cell as an `(n,)` array. The weights are not normalized.
+        """
+
+        scene_layout_cells = self._cells_snapshot.get(scene_layout, dict())
+        return np.array([RehearsalTelemetry._get_weight(scene_layout_cells.get(RehearsalTelemetry._get_cell_key(c)))
+                         for c in cells])
+
+    def get_model_weights(self, models: List[str]) -> np.array:
+        """
+        :param models: The names of the models.
+
+        :return: The sampling weight of each model as an `(n,)` array. The weights are not normalized.
+        """
+
+        return np.array([RehearsalTelemetry._get_weight(self._models_snapshot.get(m)) for m in models])
+
+    @staticmethod
+    def get_probabilities(weights: np.array) -> np.array:
+        """
+        :param weights: Sampling weights as an `(n,)` array.
+
+        :return: The weights normalized to probabilities that can be used as the `p` parameter of `np.random.RandomState.choice()`.
+        """
+
+        return weights / np.sum(weights)
+
+    def close(self) -> None:
+        """
+        Call this when the run is complete. Write the statistics of every completed run, including this one, to `rejection_statistics.json` and delete `run_statistics.json`.
+        """
+
+        with atomic_write(self.statistics_path) as temp_path:
+            temp_path.write_text(dumps({"cells": self.cells, "models": self.models}), encoding="utf-8")
+        if self.run_statistics_path.exists():
+            self.run_statistics_path.unlink()
+
+    def _write_run(self) -> None:
+        """
+        Write the statistics of this run to disk.
+        """
+
+        with atomic_write(self.run_statistics_path) as temp_path:
+            temp_path.write_text(dumps(self._run), encoding="utf-8")
+
+    @staticmethod
+    def _get_empty() -> dict:
+        """
+        :return: A dictionary of attempts and rejections without any data.
+        """
+
+        return {"cells": dict(), "models": dict(), "rejections": list()}
+
+    @staticmethod
+    def _add(statistics: dict, cells: Dict[str, Dict[str, List[int]]], models: Dict[str, List[int]]) -> None:
+        """
+        Add attempts and rejections to statistics.
+
+        :param statistics: A dictionary of attempts and rejections per cell and per model.
+        :param cells: The statistics per cell. This will be modified.
+        :param models: The statistics per model. This will be modified.
+        """
+
+        for scene_layout in statistics["cells"]:
+            if scene_layout not in cells:
+                cells[scene_layout] = dict()
+            for key, (attempts, rejections) in statistics["cells"][scene_layout].items():
+                if key not in cells[scene_layout]:
+                    cells[scene_layout][key] = [0, 0]
+                cells[scene_layout][key][0] += attempts
+                cells[scene_layout][key][1] += rejections
+        for model, (attempts, rejections) in statistics["models"].items():
+            if model not in models:
+                models[model] = [0, 0]
+            models[model][0] += attempts
+            models[model][1] += rejections
+
+    @staticmethod
+    def _get_cell(cells: Dict[str, Dict[str, List[int]]], scene_layout: str, cell: np.array) -> List[int]:
+        """
+        :param cells: The statistics per cell.
+        :param scene_layout: The scene_layout combination.
+        :param cell: The occupancy map cell `[x, z]`.
+
+        :return: The `[attempts, rejections]` of the cell.
+        """
+
+        if scene_layout not in cells:
+            cells[scene_layout] = dict()
+        key = RehearsalTelemetry._get_cell_key(cell)
+        if key not in cells[scene_layout]:
+            cells[scene_layout][key] = [0, 0]
+        return cells[scene_layout][key]
+
+    @staticmethod
+    def _get_model(models: Dict[str, List[int]], model: str) -> List[int]:
+        """
+        :param models: The statistics per model.
+        :param model: The name of the model.
+
+        :return: The `[attempts, rejections]` of the model.
+        """
+
+        if model not in models:
+            models[model] = [0, 0]
+        return models[model]
+
+    @staticmethod
+    def _get_cell_key(cell: np.array) -> str:
+        """
+        :param cell: The occupancy map cell `[x, z]`.
+
+        :return: The cell as a dictionary key.
+        """
+
+        return f"{int(cell[0])},{int(cell[1])}"
+
+    @staticmethod
+    def _get_weight(statistics: Optional[List[int]]) -> float:
+        """
+        :param statistics: The `[attempts, rejections]` of a cell or model. Can be None.
+
+        :return: The smoothed acceptance rate, clamped to be at least `MIN_WEIGHT`.
+        """
+
+        if statistics is None:
+            return 1
+        attempts, rejections = statistics
+        return max(RehearsalTelemetry.MIN_WEIGHT, (attempts - rejections + 1) / (attempts + 2))
@@ -0,0 +1,326 @@
+from typing import List, Dict, Optional, Tuple
+import numpy as np
+from tdw.output_data import OutputData, Transforms, Rigidbodies, Raycast, Bounds
+from multimodal_challenge.dataset.settle_status import SettleStatus
+
+
+class SettleDetector:
+    """
+    Detect when falling objects stop moving.
+
+    An object has settled if its rigidbody is sleeping, or if its velocity and angular velocity are below a threshold for `num_checks` consecutive checks.
+    A trial fails if an object falls below the floor or if the objects don't settle within a budget of physics frames.
+
+    The number of physics frames between each check is adaptive.
+    While the objects are in free fall, the detector casts rays below the bounds of each object and estimates how many frames will pass before the bottom of the bounds makes contact with a surface. The step is half of that estimate, clamped between `min_step` and `max_step`.
+    Near a surface, or if there is no estimate, the step is always `min_step`.
+
+    The bounds are axis-aligned in world space, so the estimate accounts for the extent of an object below its pivot, for example an object that falls upside-down. Rays are cast from the center and the four bottom corners of the bounds and the highest surface is used, so that a surface below only part of the object (such as the edge of a table) isn't missed.
+
+    ```python
+    detector = SettleDetector(max_frames=20000)
+    detector.start(object_ids=[object_id])
+    commands = detector.get_output_data_commands()
+    commands.append({"$type": "step_physics", "frames": detector.step})
+    resp = c.communicate(commands)
+    status = detector.update(resp=resp)
+    while status == SettleStatus.moving:
+        commands = detector.get_raycast_commands()
+        commands.append({"$type": "step_physics", "frames": detector.step})
+        resp = c.communicate(commands)
+        status = detector.update(resp=resp)
+    detector.end(status=status)
+    c.communicate(detector.get_stop_commands())
+    ```
+
+    `end()` records the number of frames and the final status of the detection (see `get_statistics()`). `get_stop_commands()` stops the output data requests of `get_output_data_commands()`.
+    """
+
+    # The acceleration of gravity.
+    _GRAVITY: float = 9.81
+    # The bottom of a downward raycast.
+    _RAYCAST_DESTINATION_Y: float = -1
+    # The (x, z) corners of the bounds from which rays are cast, as indices of [x_min, x_max] and [z_min, z_max].
+    _RAYCAST_CORNERS: List[Tuple[int, int]] = [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+    def __init__(self, max_frames: int = 1000, min_step: int = 0, max_step: int = 0,
+                 velocity_threshold: float = 0.01, angular_velocity_threshold: float = 0.1, num_checks: int = 2,
+                 contact_distance: float = 0.3, min_y: float = -0.1, time_step: float = 0.01):
+        """
+        :param max_frames: The maximum number of physics frames per detection.
+        :param min_step: The minimum number of skipped physics frames between each check. If this equals `max_step`, the step isn't adaptive.
+        :param max_step: The maximum number of skipped physics frames between each check.
+        :param velocity_threshold: An object's speed must be below this value (meters per second) to be considered settled.
+        :param angular_velocity_threshold: An object's angular speed must be below this value (radians per second) to be considered settled.
+        :param num_checks: An object that isn't sleeping must be below the velocity thresholds for this many consecutive checks to be considered settled.
+        :param contact_distance: An object is considered to be near a surface if the bottom of its bounds is this close (in meters) to the surface below it.
+        :param min_y: If an object's y coordinate is below this value, it fell below the floor.
+        :param time_step: The duration of each physics frame in seconds.
+        """
+
+        """:field
+        The maximum number of physics frames per detection.
+        """
+        self.max_frames: int = max_frames
+        """:field
+        The minimum number of skipped physics frames between each check.
+        """
+        self.min_step: int = min_step
+        """:field
+        The maximum number of skipped physics frames between each check.
+        """
+        self.max_step: int = max(min_step, max_step)
+        """:field
+        An object's speed must be below this value (meters per second) to be considered settled.
+        """
+        self.velocity_threshold: float = velocity_threshold
+        """:field
+        An object's angular speed must be below this value (radians per second) to be considered settled.
+        """
+        self.angular_velocity_threshold: float = angular_velocity_threshold
+        """:field
+        An object that isn't sleeping must be below the velocity thresholds for this many consecutive checks to be considered settled.
+        """
+        self.num_checks: int = num_checks
+        """:field
+        An object is considered to be near a surface if the bottom of its bounds is this close (in meters) to the surface below it.
+        """
+        self.contact_distance: float = contact_distance
+        """:field
+        If an object's y coordinate is below this value, it fell below the floor.
+        """
+        self.min_y: float = min_y
+        """:field
+        The duration of each physics frame in seconds.
+        """
+        self.time_step: float = time_step
+        """:field
+        The number of physics frames to skip before the next check. Set this as the `frames` parameter of `step_physics` (or as the `skip_frames` of a controller).
+        """
+        self.step: int = min_step
+        """:field
+        The number of physics frames in the current detection.
+        """
+        self.frames: int = 0
+        """:field
+        The number of physics frames of each completed detection.
+        """
+        self.frames_per_detection: List[int] = list()
+        """:field
+        The number of completed detections per `SettleStatus`.
+        """
+        self.statuses: Dict[SettleStatus, int] = {s: 0 for s in SettleStatus if s != SettleStatus.moving}
+        """:field
+        The IDs of the objects that caused the current detection to fail: the object that fell below the floor, or the objects that didn't settle before the timeout.
+        """
+        self.failed_object_ids: List[int] = list()
+        # The IDs of the tracked objects.
+        self._object_ids: List[int] = list()
+        # The number of consecutive checks in which each object was below the velocity thresholds.
+        self._still: Dict[int, int] = dict()
+        # The last known position of each object.
+        self._positions: Dict[int, np.array] = dict()
+        # The last known bounds of each object.
+        # The center, the bottom y coordinate, and the minimum and maximum x and z coordinates.
+        self._bounds: Dict[int, Tuple[np.array, float, np.array, np.array]] = dict()
+        # The object ID of each raycast. Key = The raycast ID.
+        self._raycast_object_ids: Dict[int, int] = dict()
+        # The types of the output data requests that were started by `get_output_data_commands()`.
+        self._requests: List[str] = list()
+
+    def start(self, object_ids: List[int]) -> None:
+        """
+        Start a new detection.
+
+        :param object_ids: The IDs of the falling objects.
+        """
+
+        self._object_ids = object_ids[:]
+        self._still = {object_id: 0 for object_id in self._object_ids}
+        self._positions.clear()
+        self._bounds.clear()
+        self._raycast_object_ids.clear()
+        self.frames = 0
+        self.step = self.min_step
+        self.failed_object_ids.clear()
+
+    def get_output_data_commands(self, bounds_only: bool = False) -> List[dict]:
+        """
+        :param bounds_only: If True, only request `Bounds` output data. Set this to True if the controller already requests `Transforms` and `Rigidbodies` output data for every object per frame.
+
+        :return: Commands to request `Transforms` and `Rigidbodies` output data for the tracked objects per frame. If the step is adaptive, this includes a request for `Bounds` output data. To stop these requests, call `get_stop_commands()`.
+        """
+
+        commands = list()
+        if not bounds_only:
+            commands.extend([{"$type": "send_transforms",
+                              "frequency": "always",
+                              "ids": self._object_ids},
+                             {"$type": "send_rigidbodies",
+                              "frequency": "always",
+                              "ids": self._object_ids}])
+        if self.max_step > self.min_step:
+            commands.append({"$type": "send_bounds",
+                             "frequency": "always",
+                             "ids": self._object_ids})
+        self._requests = [command["$type"] for command in commands]
+        return commands
+
+    def get_stop_commands(self) -> List[dict]:
+        """
+        :return: Commands to stop each output data request that was started by `get_output_data_commands()`. If there are no such requests, this list is empty.
+        """
+
+        commands = [{"$type": request, "frequency": "never"} for request in self._requests]
+        self._requests.clear()
+        return commands
+
+    def get_raycast_commands(self) -> List[dict]:
+        """
+        :return: Commands to cast rays below the center and the bottom corners of the bounds of each tracked object. These are used to estimate when each object will make contact with a surface. If the step isn't adaptive, this list is empty.
+        """
+
+        self._raycast_object_ids.clear()
+        if self.max_step <= self.min_step:
+            return []
+        commands = list()
+        for object_id in self._bounds:
+            center, bottom, xs, zs = self._bounds[object_id]
+            # The rays start at the height of the center of the bounds.
+            # If a ray hits the object itself, the estimate is 0.
+            origins = [(center[0], center[2])]
+            origins.extend([(xs[i], zs[j]) for i, j in SettleDetector._RAYCAST_CORNERS])
+            for x, z in origins:
+                raycast_id = len(self._raycast_object_ids)
+                self._raycast_object_ids[raycast_id] = object_id
+                commands.append({"$type": "send_raycast",
+                                 "origin": {"x": float(x), "y": float(center[1]), "z": float(z)},
+                                 "destination": {"x": float(x),
+                                                 "y": SettleDetector._RAYCAST_DESTINATION_Y,
+                                                 "z": float(z)},
+                                 "id": raycast_id})
+        return commands
+
+    def update(self, resp: List[bytes]) -> SettleStatus:
+        """
+        Evaluate the response from the build. Set the step for the next check.
+
+        :param resp: The response from the build. This must include the output data requested by `get_output_data_commands()`.
+
+        :return: The `SettleStatus`. To record the statistics of the detection, call `end()`.
+        """
+
+        self.frames += self.step + 1
+        transforms: Optional[Transforms] = None
+        rigidbodies: Optional[Rigidbodies] = None
+        # Key = object ID. Value = The y coordinate of the highest surface below the object.
+        surfaces: Dict[int, float] = dict()
+        for i in range(len(resp) - 1):
+            r_id = OutputData.get_data_type_id(resp[i])
+            if r_id == "tran":
+                transforms = Transforms(resp[i])
+            elif r_id == "rigi":
+                rigidbodies = Rigidbodies(resp[i])
+            elif r_id == "boun":
+                bounds = Bounds(resp[i])
+                for j in range(bounds.get_num()):
+                    if bounds.get_id(j) not in self._still:
+                        continue
+                    xs = np.array([bounds.get_left(j)[0], bounds.get_right(j)[0]])
+                    zs = np.array([bounds.get_front(j)[2], bounds.get_back(j)[2]])
+                    self._bounds[bounds.get_id(j)] = (np.array(bounds.get_center(j)), bounds.get_bottom(j)[1],
+                                                      np.sort(xs), np.sort(zs))
+            elif r_id == "rayc":
+                raycast = Raycast(resp[i])
+                raycast_id = raycast.get_raycast_id()
+                if raycast.get_hit() and raycast_id in self._raycast_object_ids:
+                    object_id = self._raycast_object_ids[raycast_id]
+                    y = raycast.get_point()[1]
+                    if object_id not in surfaces or y > surfaces[object_id]:
+                        surfaces[object_id] = y
+        if transforms is not None:
+            for i in range(transforms.get_num()):
+                object_id = transforms.get_id(i)
+                if object_id in self._still:
+                    self._positions[object_id] = np.array(transforms.get_position(i))
+                    # The object fell below the floor.
+                    if self._positions[object_id][1] < self.min_y:
+                        self.failed_object_ids = [object_id]
+                        return SettleStatus.below_floor
+        # The estimated number of frames until an object makes contact with a surface.
+        frames_until_contact: Optional[float] = None
+        if rigidbodies is not None:
+            for i in range(rigidbodies.get_num()):
+                object_id = rigidbodies.get_id(i)
+                if object_id not in self._still:
+                    continue
+                velocity = np.array(rigidbodies.get_velocity(i))
+                if rigidbodies.get_sleeping(i):
+                    self._still[object_id] = self.num_checks
+                elif np.linalg.norm(velocity) < self.velocity_threshold and \
+                        np.linalg.norm(rigidbodies.get_angular_velocity(i)) < self.angular_velocity_threshold:
+                    self._still[object_id] += 1
+                else:
+                    self._still[object_id] = 0
+                # Estimate when the bottom of the object will make contact with the surface below it.
+                if object_id in surfaces and object_id in self._bounds:
+                    frames = self._get_frames_until_contact(distance=self._bounds[object_id][1] - surfaces[object_id],
+                                                            velocity=velocity[1])
+                else:
+                    frames = 0
+                if frames_until_contact is None or frames < frames_until_contact:
+                    frames_until_contact = frames
+        if rigidbodies is not None and all([self._still[o] >= self.num_checks for o in self._still]):
+            return SettleStatus.settled
+        if self.frames >= self.max_frames:
+            self.failed_object_ids = [o for o in self._still if self._still[o] < self.num_checks]
+            return SettleStatus.timeout
+        # Set the next step.
+        if frames_until_contact is None:
+            self.step = self.min_step
+        else:
+            self.step = int(max(self.min_step, min(self.max_step, frames_until_contact / 2)))
+        # Don't exceed the budget.
+        self.step = max(0, min(self.step, self.max_frames - self.frames - 1))
+        return SettleStatus.moving
+
+    def end(self, status: SettleStatus) -> None:
+        """
+        End the current detection and record its statistics.
+
+        :param status: The final status.
+        """
+
+        self.frames_per_detection.append(self.frames)
+        if status in self.statuses:
+            self.statuses[status] += 1
+
+    def get_statistics(self) -> Dict[str, float]:
+        """
+        :return: A dictionary of statistics of the completed detections: The number of detections, the mean, median, and maximum number of frames, and the number of detections per `SettleStatus`.
+        """
+
+        statistics: Dict[str, float] = {"num_detections": len(self.frames_per_detection)}
+        if len(self.frames_per_detection) > 0:
+            statistics["mean_frames"] = float(np.mean(self.frames_per_detection))
+            statistics["median_frames"] = float(np.median(self.frames_per_detection))
+            statistics["max_frames"] = int(np.max(self.frames_per_detection))
+        for status in self.statuses:
+            statistics[status.name] = self.statuses[status]
+        return statistics
+
+    def _get_frames_until_contact(self, distance: float, velocity: float) -> float:
+        """
+        :param distance: The distance from the bottom of the bounds of the object to the surface below it.
+        :param velocity: The vertical velocity of the object.
+
+        :return: The estimated number of physics frames until the object makes contact with the surface below it, assuming that it is in free fall.
+        """
+
+        distance -= self.contact_distance
+        if distance <= 0:
+            return 0
+        # Solve: distance = v * t + 0.5 * g * t^2 (downwards is positive).
+        v = -velocity
+        t = (-v + np.sqrt(v ** 2 + 2 * SettleDetector._GRAVITY * distance)) / SettleDetector._GRAVITY
+        return t / self.time_step
@@ -0,0 +1,12 @@
+from enum import Enum
+
+
+class SettleStatus(Enum):
+    """
+    The status of falling objects tracked by a [`SettleDetector`](settle_detector.md).
+    """
+
+    moving = 0  # At least one object is still moving.
+    settled = 1  # Every object stopped moving.
+    below_floor = 2  # At least one object fell below the floor.
+    timeout = 3  # The objects didn't stop moving within the frame budget.
@@ -0,0 +1,162 @@
+import wave
+from json import loads, dumps
+from pathlib import Path
+from typing import List, Tuple
+import numpy as np
+from multimodal_challenge.util import get_trial_filename, get_trial_data_path, load_trial, atomic_write
+
+
+class TrialManifest:
+    """
+    The completion manifest of a scene_layout directory of the dataset.
+
+    The manifest is a .json file that records the total number of trials of the scene_layout combination and lists every trial whose three files (trial data, .wav, and .npy) have been completely written. The trial data is either a .bin file or a .json file. A trial is added to the manifest only after all three files exist, and the manifest is written atomically.
+    If `dataset.py` crashes, any files of a trial that isn't in the manifest are incomplete and will be overwritten when `dataset.py` resumes.
+
+    If a scene_layout directory doesn't have a manifest (because it was generated by an older version of `dataset.py`), the manifest is created in memory from the consecutive trials that have all three files. Creating a `TrialManifest` never writes to disk; to save a manifest created from an older directory, call `migrate()`.
+
+    ```python
+    from multimodal_challenge.paths import DATASET_DIRECTORY
+    from multimodal_challenge.dataset.trial_manifest import TrialManifest
+
+    manifest = TrialManifest(directory=DATASET_DIRECTORY.joinpath("mm_kitchen_1a_0"))
+    print(manifest.get_num_completed(), manifest.num_trials)
+    ```
+    """
+
+    """:class_var
+    The filename of the manifest in each scene_layout directory.
+    """
+    FILENAME: str = "manifest.json"
+
+    def __init__(self, directory: Path):
+        """
+        :param directory: The scene_layout directory.
+        """
+
+        """:field
+        The scene_layout directory.
+        """
+        self.directory: Path = directory
+        """:field
+        The path to the manifest file.
+        """
+        self.path: Path = directory.joinpath(TrialManifest.FILENAME)
+        """:field
+        The filename (without an extension) of each completed trial, in order.
+        """
+        self.trials: List[str] = list()
+        """:field
+        The total number of trials of the scene_layout combination. If -1, the total is unknown.
+        """
+        self.num_trials: int = -1
+        if self.path.exists():
+            data = loads(self.path.read_text(encoding="utf-8"))
+            self.trials = data["trials"]
+            self.num_trials = data["num_trials"]
+        # Create a manifest from the existing files. Don't write it to disk.
+        elif self.directory.exists():
+            while True:
+                filename = get_trial_filename(len(self.trials))
+                paths = [get_trial_data_path(directory=self.directory, filename=filename),
+                         self.directory.joinpath(f"{filename}.wav"),
+                         self.directory.joinpath(f"{filename}.npy")]
+                if not all([path.exists() for path in paths]):
+                    break
+                self.trials.append(filename)
+
+    def migrate(self) -> None:
+        """
+        If the scene_layout directory was generated by an older version of `dataset.py` and doesn't have a manifest file, write the manifest that was created from the existing files. Otherwise, this doesn't do anything.
+        The total number of trials of a migrated manifest is unknown until `set_num_trials()` is called.
+        """
+
+        if not self.path.exists() and len(self.trials) > 0:
+            self._write()
+
+    def add(self, filename: str) -> None:
+        """
+        Add a completed trial to the manifest and write the manifest to disk. If the trial is already in the manifest (because it was regenerated), the manifest isn't modified.
+
+        :param filename: The filename of the trial without an extension, for example `"00000"`.
+        """
+
+        if filename in self.trials:
+            return
+        self.trials.append(filename)
+        self._write()
+
+    def set_num_trials(self, num_trials: int) -> None:
+        """
+        Set the total number of trials of the scene_layout combination and write the manifest to disk.
+
+        :param num_trials: The total number of trials.
+        """
+
+        if num_trials != self.num_trials:
+            self.num_trials = num_trials
+            self._write()
+
+    def get_num_completed(self) -> int:
+        """
+        :return: The number of completed trials.
+        """
+
+        return len(self.trials)
+
+    def is_complete(self) -> bool:
+        """
+        :return: True if the total number of trials is known and every trial has been completed.
+        """
+
+        return 0 <= self.num_trials <= len(self.trials)
+
+    @staticmethod
+    def verify_trial(directory: Path, filename: str, occupancy_map_shape: Tuple[int, int] = None) -> List[str]:
+        """
+        Check whether the files of a trial are valid: The .bin or .json file can be loaded as a `Trial`, the .wav file has a valid 16-bit header, and the occupancy map is a 2D array.
+
+        :param directory: The scene_layout directory.
+        :param filename: The filename of the trial without an extension.
+        :param occupancy_map_shape: If not None, the expected shape of the occupancy map.
+
+        :return: A list of problems. If the trial is valid, the list is empty.
+        """
+
+        problems: List[str] = list()
+        path = get_trial_data_path(directory=directory, filename=filename)
+        try:
+            load_trial(directory=directory, filename=filename)
+        except Exception as e:
+            problems.append(f"{path}: Invalid trial data: {e}")
+        path = directory.joinpath(f"{filename}.wav")
+        try:
+            with wave.open(str(path.resolve()), "rb") as f:
+                if f.getsampwidth() != 2:
+                    problems.append(f"{path}: Expected 16-bit audio but got {f.getsampwidth() * 8}-bit audio.")
+                # The header must match the size of the file.
+                expected_size = f.getnframes() * f.getnchannels() * f.getsampwidth()
+                if len(f.readframes(f.getnframes())) != expected_size:
+                    problems.append(f"{path}: The file is shorter than its header.")
+        except Exception as e:
+            problems.append(f"{path}: Invalid audio: {e}")
+        path = directory.joinpath(f"{filename}.npy")
+        try:
+            # Read only the header.
+            occupancy_map = np.load(str(path.resolve()), mmap_mode="r")
+            if len(occupancy_map.shape) != 2:
+                problems.append(f"{path}: Expected a 2D occupancy map but got shape {occupancy_map.shape}.")
+            elif occupancy_map_shape is not None and tuple(occupancy_map.shape) != tuple(occupancy_map_shape):
+                problems.append(f"{path}: Expected occupancy map shape {tuple(occupancy_map_shape)} but got "
+                                f"{occupancy_map.shape}.")
+        except Exception as e:
+            problems.append(f"{path}: Invalid occupancy map: {e}")
+        return problems
+
+    def _write(self) -> None:
+        """
+        Write the manifest to disk atomically.
+        """
+
+        with atomic_write(self.path) as temp_path:
+            temp_path.write_text(dumps({"num_trials": self.num_trials, "trials": self.trials}), encoding="utf-8")
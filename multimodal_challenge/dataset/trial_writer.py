@@ -0,0 +1,167 @@
+from json import dumps
+from pathlib import Path
+from queue import Queue
+from threading import Thread
+from typing import Optional, Union, Tuple
+import numpy as np
+from multimodal_challenge.trial import Trial
+from multimodal_challenge.encoder import Encoder
+from multimodal_challenge.util import atomic_write
+from multimodal_challenge.columnar_encoder import ColumnarEncoder
+from multimodal_challenge.dataset.audio_renderer import AudioRenderer
+from multimodal_challenge.dataset.wav_trimmer import WavTrimmer
+from multimodal_challenge.dataset.trial_manifest import TrialManifest
+
+
+class TrialWriter:
+    """
+    Write the results of [`dataset.py`](../dataset/dataset.md) trials to disk on a background thread so that the controller can start the next trial immediately.
+
+    Each trial is written as three files: the audio (.wav), the occupancy map (.npy), and the [`Trial`](trial.md) data. By default, the trial data is written by [`ColumnarEncoder`](columnar_encoder.md) as a .bin file. If `export_json == True`, it is written as a .json file instead.
+    Every file is written to a temporary path and then renamed, so a file is either complete or missing. After all three files have been written, the trial is added to the scene_layout's [`TrialManifest`](trial_manifest.md).
+
+    The queue of pending trials is bounded: if it is full, `write()` blocks until the background thread catches up.
+    If the background thread raises an exception, the exception is re-raised by the next call to `write()`, `flush()`, or `close()`.
+
+    ```python
+    writer = TrialWriter()
+    manifest = TrialManifest(directory=output_directory)
+    writer.write(output_directory=output_directory, filename="00000", trial=trial, occupancy_map=occupancy_map, audio=samples, manifest=manifest)
+    writer.close()
+    ```
+    """
+
+    def __init__(self, max_size: int = 4, wav_trimmer: WavTrimmer = None, audio_renderer: AudioRenderer = None,
+                 export_json: bool = False):
+        """
+        :param max_size: The maximum number of pending trials.
+        :param wav_trimmer: The `WavTrimmer` used to remove silence from the audio. If None, a `WavTrimmer` with default parameters is used.
+        :param audio_renderer: The `AudioRenderer` used to write rendered audio. If None, an `AudioRenderer` with default parameters is used.
+        :param export_json: If True, write the trial data as a .json file instead of a .bin file.
+        """
+
+        """:field
+        The `WavTrimmer` used to remove silence from the audio.
+        """
+        self.wav_trimmer: WavTrimmer = WavTrimmer() if wav_trimmer is None else wav_trimmer
+        """:field
+        The `AudioRenderer` used to write rendered audio.
+        """
+        self.audio_renderer: AudioRenderer = AudioRenderer() if audio_renderer is None else audio_renderer
+        """:field
+        If True, write the trial data as a .json file instead of a .bin file.
+        """
+        self.export_json: bool = export_json
+        # The pending trials. None tells the thread to stop.
+        self._queue: Queue = Queue(maxsize=max_size)
+        # An exception raised by the background thread.
+        self._error: Optional[Exception] = None
+        self._thread: Optional[Thread] = None
+
+    def write(self, output_directory: Path, filename: str, trial: Trial, occupancy_map: np.array,
+              audio: Union[Path, np.array], manifest: TrialManifest, skip: float = 0) -> None:
+        """
+        Queue a trial to be written to disk. If the queue is full, block until there is space.
+
+        :param output_directory: The output directory.
+        :param filename: The filename of each file without an extension, for example `"00000"`.
+        :param trial: The `Trial` data.
+        :param occupancy_map: The occupancy map.
+        :param audio: Either the path to a recorded .wav file or the rendered audio as an array of floats. A recorded file will be deleted after it is trimmed, so it shouldn't be reused.
+        :param manifest: The manifest of the output directory. The trial is added to the manifest after it is written. The manifest shouldn't be modified by anything else until the trial is written.
+        :param skip: Always remove this many seconds from the start of a recorded .wav file.
+        """
+
+        self._raise_error()
+        if self._thread is None:
+            self._thread = Thread(target=self._run, daemon=True)
+            self._thread.start()
+        self._queue.put((output_directory, filename, trial, occupancy_map, audio, manifest, skip))
+
+    def flush(self) -> None:
+        """
+        Block until every pending trial has been written to disk.
+        """
+
+        self._queue.join()
+        self._raise_error()
+
+    def close(self) -> None:
+        """
+        Write every pending trial to disk and stop the background thread.
+        """
+
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self._raise_error()
+
+    def _run(self) -> None:
+        """
+        Write trials until `close()` is called.
+        """
+
+        while True:
+            task: Optional[Tuple[Path, str, Trial, np.array, Union[Path, np.array], TrialManifest, float]] = \
+                self._queue.get()
+            try:
+                if task is None:
+                    return
+                # Skip the remaining trials after an error.
+                if self._error is None:
+                    self._write(*task)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _write(self, output_directory: Path, filename: str, trial: Trial, occupancy_map: np.array,
+               audio: Union[Path, np.array], manifest: TrialManifest, skip: float) -> None:
+        """
+        Write a trial to disk.
+
+        :param output_directory: The output directory.
+        :param filename: The filename of each file without an extension.
+        :param trial: The `Trial` data.
+        :param occupancy_map: The occupancy map.
+        :param audio: Either the path to a recorded .wav file or the rendered audio as an array of floats.
+        :param manifest: The manifest of the output directory.
+        :param skip: Always remove this many seconds from the start of a recorded .wav file.
+        """
+
+        # Write the audio.
+        with atomic_write(output_directory.joinpath(f"{filename}.wav")) as wav_path:
+            if isinstance(audio, Path):
+                self.wav_trimmer.trim_file(source=audio, destination=wav_path, skip=skip)
+                audio.unlink()
+            else:
+                self.audio_renderer.write(samples=self.wav_trimmer.trim(audio), path=wav_path)
+        # Write the occupancy map.
+        with atomic_write(output_directory.joinpath(f"{filename}.npy")) as npy_path:
+            with npy_path.open("wb") as f:
+                np.save(f, occupancy_map)
+        # Write the trial data.
+        if self.export_json:
+            trial_path = output_directory.joinpath(f"{filename}.json")
+            with atomic_write(trial_path) as temp_path:
+                temp_path.write_text(dumps(trial, cls=Encoder), encoding="utf-8")
+        else:
+            trial_path = output_directory.joinpath(f"{filename}{ColumnarEncoder.EXTENSION}")
+            with atomic_write(trial_path) as temp_path:
+                ColumnarEncoder.write_trial(trial=trial, path=temp_path)
+        # Remove trial data of the other format (for example, if this trial was regenerated).
+        for suffix in [".json", ColumnarEncoder.EXTENSION]:
+            path = output_directory.joinpath(f"{filename}{suffix}")
+            if path != trial_path and path.exists():
+                path.unlink()
+        # The trial is complete.
+        manifest.add(filename)
+
+    def _raise_error(self) -> None:
+        """
+        If the background thread raised an exception, raise it.
+        """
+
+        if self._error is not None:
+            raise self._error
@@ -0,0 +1,120 @@
+import wave
+from pathlib import Path
+from typing import Optional
+import numpy as np
+
+
+class WavTrimmer:
+    """
+    Remove leading and trailing silence from audio.
+
+    Audio is divided into windows. A window is silent if its RMS (root mean square) amplitude is below a threshold. Every sample before the first non-silent window and after the last non-silent window is removed.
+
+    ```python
+    from pathlib import Path
+    from multimodal_challenge.dataset.wav_trimmer import WavTrimmer
+
+    trimmer = WavTrimmer()
+    trimmer.trim_file(source=Path("temp.wav"), destination=Path("00000.wav"), skip=0.1)
+    ```
+    """
+
+    def __init__(self, threshold: float = 0.0001, window: int = 441):
+        """
+        :param threshold: A window is silent if its RMS amplitude is below this value. Amplitudes are between 0 and 1.
+        :param window: The number of audio frames per window.
+        """
+
+        """:field
+        A window is silent if its RMS amplitude is below this value. Amplitudes are between 0 and 1.
+        """
+        self.threshold: float = threshold
+        """:field
+        The number of audio frames per window.
+        """
+        self.window: int = window
+
+    def is_silent(self, samples: np.array) -> bool:
+        """
+        :param samples: Audio as an array of floats between -1 and 1. This can be either an `(n,)` array (mono) or an `(n, num_channels)` array.
+
+        :return: True if the RMS amplitude of the samples is below the threshold.
+        """
+
+        return len(samples) == 0 or WavTrimmer._get_rms(samples) < self.threshold
+
+    def trim(self, samples: np.array) -> np.array:
+        """
+        :param samples: Audio as an array of floats between -1 and 1. This can be either an `(n,)` array (mono) or an `(n, num_channels)` array.
+
+        :return: The audio without leading and trailing silence. If the audio is silent, the array is empty.
+        """
+
+        start: Optional[int] = None
+        end: int = 0
+        for i in range(0, len(samples), self.window):
+            if not self.is_silent(samples[i: i + self.window]):
+                if start is None:
+                    start = i
+                end = min(len(samples), i + self.window)
+        if start is None:
+            return samples[:0]
+        return samples[start: end]
+
+    def trim_file(self, source: Path, destination: Path, skip: float = 0) -> None:
+        """
+        Read a 16-bit .wav file one window at a time, remove leading and trailing silence, and write the result.
+
+        :param source: The path to the source .wav file.
+        :param destination: The path to the trimmed .wav file. This can't be the same as `source`.
+        :param skip: Always remove this many seconds from the start of the audio.
+        """
+
+        with wave.open(str(source.resolve()), "rb") as r:
+            if r.getsampwidth() != 2:
+                raise Exception(f"Can't trim {source}: Only 16-bit audio is supported.")
+            num_channels = r.getnchannels()
+            first_frame = min(r.getnframes(), int(skip * r.getframerate()))
+            r.setpos(first_frame)
+            # Find the first and last non-silent frames.
+            start: Optional[int] = None
+            end: int = 0
+            frame = first_frame
+            while frame < r.getnframes():
+                samples = WavTrimmer._get_samples(data=r.readframes(self.window), num_channels=num_channels)
+                # The file is shorter than its header says.
+                if len(samples) == 0:
+                    break
+                if not self.is_silent(samples):
+                    if start is None:
+                        start = frame
+                    end = frame + len(samples)
+                frame += len(samples)
+            with wave.open(str(destination.resolve()), "wb") as w:
+                w.setnchannels(num_channels)
+                w.setsampwidth(2)
+                w.setframerate(r.getframerate())
+                if start is not None:
+                    r.setpos(start)
+                    w.writeframes(r.readframes(end - start))
+
+    @staticmethod
+    def _get_samples(data: bytes, num_channels: int) -> np.array:
+        """
+        :param data: 16-bit audio data.
+        :param num_channels: The number of audio channels.
+
+        :return: The audio as an `(n, num_channels)` array of floats between -1 and 1.
+        """
+
+        return np.frombuffer(data, dtype="<i2").reshape(-1, num_channels) / 32767
+
+    @staticmethod
+    def _get_rms(samples: np.array) -> float:
+        """
+        :param samples: Audio as an array of floats.
+
+        :return: The RMS amplitude of the samples, averaged over every channel.
+        """
+
+        return float(np.sqrt(np.mean(np.square(samples))))
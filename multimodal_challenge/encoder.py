@@ -2,6 +2,8 @@ from json import JSONEncoder
 import numpy as np
 from tdw.py_impact import AudioMaterial, ObjectInfo
 from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+from multimodal_challenge.object_init_record import ObjectInitRecord
+from multimodal_challenge.object_init_table import ObjectInitTable
 from multimodal_challenge.dataset.dataset_trial import DatasetTrial
 from multimodal_challenge.trial import Trial
 
@@ -18,7 +20,9 @@ class Encoder(JSONEncoder):
             return float(obj)
         elif isinstance(obj, np.ndarray):
             return obj.tolist()
-        elif isinstance(obj, MultiModalObjectInitData):
+        elif isinstance(obj, ObjectInitTable):
+            return list(obj)
+        elif isinstance(obj, MultiModalObjectInitData) or isinstance(obj, ObjectInitRecord):
             return {"name": obj.name,
                     "position": obj.position,
                     "rotation": obj.rotation,
@@ -29,7 +33,12 @@ class Encoder(JSONEncoder):
         elif isinstance(obj, DatasetTrial):
             return obj.__dict__
         elif isinstance(obj, Trial):
-            return obj.__dict__
+            data = dict(obj.__dict__)
+            # Save only the delta against the base layout.
+            data["object_init_data"], base_indices = obj.get_delta()
+            if base_indices is not None:
+                data["base_indices"] = base_indices
+            return data
         elif isinstance(obj, AudioMaterial):
             return obj.name
         else:
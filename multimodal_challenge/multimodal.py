@@ -1,13 +1,13 @@
 import re
-from json import loads
 from typing import List, Optional, Dict, Tuple
 import numpy as np
 from tdw.tdw_utils import QuaternionUtils
 from magnebot import ActionStatus, ArmJoint, Magnebot
 from multimodal_challenge.multimodal_base import MultiModalBase
 from multimodal_challenge.paths import DATASET_DIRECTORY, KINEMATIC_OBJECTS_PATH
-from multimodal_challenge.util import get_trial_filename, get_scene_layouts
+from multimodal_challenge.util import get_trial_filename, get_scene_layouts, load_trial
 from multimodal_challenge.trial import Trial
+from multimodal_challenge.spatial_index import SpatialIndex
 
 
 class MultiModal(MultiModalBase):
@@ -37,12 +37,25 @@ class MultiModal(MultiModalBase):
     Every scene (room environment) and model (furniture, cabinets, cups, etc.) is stored in TDW as an [asset bundle](https://docs.unity3d.com/Manual/AssetBundlesIntro.html). These asset bundles are downloaded at runtime from a remote S3 server, but it is possible to download them *before* run time and load them locally. **If your Internet connection will make it difficult/slow/impossible to download large US-based files at runtime, we strongly suggest you download them locally.** To do this:
 
     1. `cd path/to/multimodal_challenge`
-    2. `python3 download.py --dst [DST]`. The `--dst` argument sets the root download directory. Example: `python3 download.py --dst /home/mm_asset_bundles`.
+    2. `python3 download.py --dst [DST]`. The `--dst` argument sets the root download directory. Example: `python3 download.py --dst /home/mm_asset_bundles`. If the download is interrupted, run the same command again to resume it.
 
     #### 2. `MULTIMODAL_DATASET`
 
     **The directory where the Trial files will be saved.** Default value: `"D:/multimodal_challenge"`
 
+    #### 3. `MULTIMODAL_ASSET_CACHE` (optional)
+
+    **The directory of a local asset bundle cache.** Default value: None (no cache)
+
+    If this is set, the build loads every asset bundle from a local server. The first time an asset bundle is requested, the server downloads it from `MULTIMODAL_ASSET_BUNDLES` and caches it; afterwards, it is loaded from the cache. The maximum size of the cache in gigabytes is set by `MULTIMODAL_ASSET_CACHE_SIZE` (default: 20); if the cache is full, the least recently used asset bundles are removed. To download the asset bundles of upcoming trials in the background before calling `init_scene()`:
+
+    ```python
+    from multimodal_challenge.asset_cache import AssetCache
+    from multimodal_challenge.util import get_asset_bundle_paths
+
+    AssetCache.get_default().prefetch(paths=get_asset_bundle_paths(trials=[("mm_kitchen_1a", 0, 1)]))
+    ```
+
     #### How to set the environment variables
 
     - Replace `[asset_bundles]` and `[dataset]` with the actual paths. For example: `export MULTIMODAL_ASSET_BUNDLES=/home/mm_asset_bundles`.
@@ -54,6 +67,10 @@ class MultiModal(MultiModalBase):
     | Windows (cmd)        | `set MULTIMODAL_ASSET_BUNDLES=[asset_bundles] && set MULTIMODAL_DATASET=[dataset] && py -3 my_controller.py` |
     | Windows (powershell) | `$env:MULTIMODAL_ASSET_BUNDLES="[asset_bundles]" ; $env:MULTIMODAL_DATASET="[dataset]" ; py -3 my_controller.py` |
 
+    ## Add-ons
+
+    Append add-ons such as a [`Benchmark`](../../multimodal_challenge/dataset/add_ons/benchmark.py) to `self.add_ons` to update them on every `communicate()` call. See: [`MultiModalBase`](multimodal_base.md).
+
     [TOC-MM]
     """
 
@@ -68,8 +85,8 @@ class MultiModal(MultiModalBase):
     TRIALS_PER_SCENE_LAYOUT: int = 0
     # We assume that all of the scene_layout combinations have the same number of trials.
     for f in DATASET_DIRECTORY.joinpath("mm_craftroom_1a_0").iterdir():
-        # Expected filename pattern: 00000.json, 00001.json, 00002.json, ... etc.
-        if re.search(r"[0-9]{5,}\.json", f.name) is not None:
+        # Expected filename pattern: 00000.bin, 00001.bin, 00002.bin, ... etc. Older trials are .json files.
+        if re.search(r"^[0-9]{5,}\.(bin|json)$", f.name) is not None:
             TRIALS_PER_SCENE_LAYOUT += 1
     """:class_var
     The lower and upper limits of the torso's position from the floor (y=0), assuming that the Magnebot is level.
@@ -96,6 +113,10 @@ class MultiModal(MultiModalBase):
         The ID of the target object (the object that fell).
         """
         self.target_object_id: int = -1
+        """:field
+        A [`SpatialIndex`](spatial_index.md) of every object in the scene for proximity queries. This is created at the end of `init_scene()`. To update it with the current positions of the objects: `self.spatial_index.update(object_transforms=self.state.object_transforms)`
+        """
+        self.spatial_index: Optional[SpatialIndex] = None
         # Data used to initialize the next trial.
         self.__trial: Optional[Trial] = None
 
@@ -118,16 +139,17 @@ class MultiModal(MultiModalBase):
         if trial is None:
             trial = 0
         trial_filename = get_trial_filename(trial)
-        self.__trial = Trial(**loads(DATASET_DIRECTORY.joinpath(f"{scene}_{layout}/{trial_filename}.json").
-                                     read_text(encoding="utf-8")))
+        self.__trial = load_trial(directory=DATASET_DIRECTORY.joinpath(f"{scene}_{layout}"), filename=trial_filename)
         self.audio: bytes = DATASET_DIRECTORY.joinpath(f"{scene}_{layout}/{trial_filename}.wav").read_bytes()
         # Get object initialization commands and find the target object.
+        object_ids: List[int] = list()
         for i, init_data in enumerate(self.__trial.object_init_data):
             if init_data.name in MultiModal._KINEMATIC:
                 init_data.kinematic = True
                 init_data.gravity = False
             object_id, object_commands = init_data.get_commands()
             self._object_init_commands[object_id] = object_commands
+            object_ids.append(object_id)
             # Get the target object ID.
             if i == self.__trial.target_object_index:
                 self.target_object_id = object_id
@@ -139,7 +161,15 @@ class MultiModal(MultiModalBase):
             self.occupancy_map = np.load(str(occupancy_map_path.resolve()))
         # Turn the Magnebot. We don't want to set the rotation in case the joints intersect with something.
         angle = QuaternionUtils.get_y_angle(QuaternionUtils.IDENTITY, self.__trial.magnebot_rotation)
-        return self.turn_by(angle, aligned_at=0.5)
+        status = self.turn_by(angle, aligned_at=0.5)
+        # Index the objects by their current positions.
+        object_ids = [o for o in object_ids if o in self.state.object_transforms]
+        self.spatial_index = SpatialIndex(object_ids=object_ids,
+                                          names=[self.objects_static[o].name for o in object_ids],
+                                          positions=np.array([self.state.object_transforms[o].position
+                                                              for o in object_ids]),
+                                          sizes=np.array([self.objects_static[o].size for o in object_ids]))
+        return status
 
     def set_torso(self, position: float) -> ActionStatus:
         """
@@ -1,16 +1,39 @@
-from typing import List
+from json import dumps
+from time import perf_counter
+from typing import List, Union, Dict, Optional
 from abc import ABC, abstractmethod
 import numpy as np
 from tdw.tdw_utils import TDWUtils
 from magnebot import Magnebot, ActionStatus
 from multimodal_challenge.util import get_scene_librarian, check_pip_version, check_build_version
 from multimodal_challenge.paths import OCCUPANCY_MAPS_DIRECTORY
+from multimodal_challenge.dataset.add_ons.add_on import AddOn
 
 
 class MultiModalBase(Magnebot, ABC):
     """
     Abstract class controller for the MultiModal challenge.
     The code in this controller shared between [`Dataset`](../dataset/dataset.md) and [`MultiModal`](multimodal.md).
+
+    Add-ons in `self.add_ons` are updated on every `communicate()` call, for example a `Benchmark`:
+
+    ```python
+    from multimodal_challenge.multimodal import MultiModal
+    from multimodal_challenge.dataset.add_ons.benchmark import Benchmark
+
+    m = MultiModal()
+    b = Benchmark()
+    m.add_ons.append(b)
+    m.init_scene(scene="mm_kitchen_1a", layout=0, trial=57)
+    print(b.fps)
+    ```
+
+    1. If the add-on hasn't been initialized, its initialization commands are sent. Otherwise, its `commands` are sent.
+    2. Magnebot's per-frame commands are added to the list and duplicate output data requests (`send_` commands) are removed. Exact duplicates are removed. Requests of the same type with the same `frequency` and non-empty `ids` lists are merged into one request with every ID. A request with `"frequency": "never"` stops every earlier request of the same type. A request with an empty `ids` list (every object) is never merged with a request for specific objects.
+    3. `before_send(commands)` is called.
+    4. After the build responds, `on_send(resp)` is called. The time spent in each add-on's `on_send()` is added to its `on_send_time`.
+
+    If there are no add-ons, duplicate requests aren't removed.
     """
 
     def __init__(self, port: int = 1071, screen_width: int = 256, screen_height: int = 256, random_seed: int = None,
@@ -32,6 +55,10 @@ class MultiModalBase(Magnebot, ABC):
         The ID of the target object.
         """
         self.target_object_id: int = -1
+        """:field
+        A list of add-ons that are updated on every `communicate()` call.
+        """
+        self.add_ons: List[AddOn] = list()
         self.scene_librarian = get_scene_librarian()
 
     def init_scene(self, scene: str, layout: int) -> ActionStatus:
@@ -58,6 +85,118 @@ class MultiModalBase(Magnebot, ABC):
                                 end=self._get_end_commands(),
                                 magnebot_position=TDWUtils.array_to_vector3(self._get_magnebot_position()))
 
+    def communicate(self, commands: Union[dict, List[dict]]) -> List[bytes]:
+        """
+        Send commands to the build and receive a response. Update every add-on in `self.add_ons`.
+
+        :param commands: Commands to send to the build.
+
+        :return: The response from the build as a list of byte arrays.
+        """
+
+        if not isinstance(commands, list):
+            commands = [commands]
+        for add_on in self.add_ons:
+            if not add_on.initialized:
+                commands.extend(add_on.get_initialization_commands())
+                add_on.initialized = True
+            else:
+                commands.extend(add_on.commands)
+                add_on.commands.clear()
+        # Magnebot appends `_next_frame_commands` and `_per_frame_commands` in `communicate()`.
+        # Append them here instead so that they're included when duplicate requests are removed.
+        commands.extend(self._next_frame_commands)
+        self._next_frame_commands.clear()
+        commands.extend(self._per_frame_commands)
+        # Only the add-ons can add duplicate requests.
+        if len(self.add_ons) > 0:
+            commands = MultiModalBase._remove_duplicate_requests(commands=commands)
+            for add_on in self.add_ons:
+                add_on.before_send(commands)
+        self._before_send(commands=commands)
+        per_frame_commands = self._per_frame_commands
+        self._per_frame_commands = list()
+        try:
+            resp = super().communicate(commands=commands)
+        finally:
+            self._per_frame_commands = per_frame_commands
+        for add_on in self.add_ons:
+            t0 = perf_counter()
+            add_on.on_send(resp=resp)
+            add_on.on_send_time += perf_counter() - t0
+        return resp
+
+    def _before_send(self, commands: List[dict]) -> None:
+        """
+        This is called in `communicate()` with the final list of commands, after the add-ons' commands and the Magnebot per-frame commands have been added and duplicate requests have been removed. By default, this function doesn't do anything.
+
+        :param commands: The commands that are about to be sent to the build.
+        """
+
+        pass
+
+    @staticmethod
+    def _remove_duplicate_requests(commands: List[dict]) -> List[dict]:
+        """
+        Remove duplicate output data requests (`send_` commands). Requests of the same type are compared if they have the same `$type` and every parameter other than `ids` and `frequency` is the same. For example, two `send_bounds` requests are compared but two `send_raycast` requests with different origins are not.
+
+        - A request that is an exact duplicate of an earlier request is removed.
+        - If two requests have the same `frequency` and both have a non-empty `ids` list, they're merged into the earlier request, which requests every ID of both.
+        - A request with `"frequency": "never"` stops every earlier request of the same type, so the earlier requests are removed.
+        - A request without `ids` or with an empty `ids` list requests every object and is never merged with a request for specific objects. Requests with different frequencies aren't merged either.
+
+        :param commands: A list of commands.
+
+        :return: The list of commands without duplicate output data requests.
+        """
+
+        # Removed requests are set to None.
+        deduplicated: List[Optional[dict]] = list()
+        # Key: The `$type` and the other parameters of a request. Value: The indices of the requests in `deduplicated`.
+        requests: Dict[str, List[int]] = dict()
+        for command in commands:
+            if not command["$type"].startswith("send_"):
+                deduplicated.append(command)
+                continue
+            key = dumps({k: v for k, v in command.items() if k != "ids" and k != "frequency"}, sort_keys=True)
+            if key not in requests:
+                requests[key] = list()
+            frequency = MultiModalBase._get_frequency(command)
+            if frequency == "never":
+                for i in requests[key]:
+                    deduplicated[i] = None
+                requests[key].clear()
+            else:
+                merged = False
+                for i in requests[key]:
+                    request = deduplicated[i]
+                    if request == command:
+                        merged = True
+                    elif frequency == MultiModalBase._get_frequency(request) and "ids" in request and \
+                            "ids" in command and len(request["ids"]) > 0 and len(command["ids"]) > 0:
+                        # Copy the request so that commands that are sent every frame aren't modified.
+                        request = dict(request)
+                        request["ids"] = request["ids"] + [j for j in command["ids"] if j not in request["ids"]]
+                        deduplicated[i] = request
+                        merged = True
+                    if merged:
+                        break
+                if merged:
+                    continue
+            requests[key].append(len(deduplicated))
+            deduplicated.append(command)
+        return [command for command in deduplicated if command is not None]
+
+    @staticmethod
+    def _get_frequency(request: dict) -> str:
+        """
+        :param request: An output data request.
+
+        :return: The `frequency` of the request. If the request doesn't have a `frequency` parameter, this is `"once"` (the default).
+        """
+
+        return request["frequency"] if "frequency" in request else "once"
+
     @abstractmethod
     def _get_magnebot_position(self) -> np.array:
         """
@@ -2,7 +2,8 @@ from os.path import join
 from typing import Dict
 from tdw.object_init_data import AudioInitData, TransformInitData
 from tdw.librarian import ModelLibrarian, ModelRecord
-from multimodal_challenge.paths import OBJECT_LIBRARY_PATH, ASSET_BUNDLES_DIRECTORY
+from multimodal_challenge.paths import OBJECT_LIBRARY_PATH, ASSET_BUNDLES_DIRECTORY, ASSET_CACHE_DIRECTORY
+from multimodal_challenge.asset_cache import AssetCache
 
 
 class MultiModalObjectInitData(AudioInitData):
@@ -36,6 +37,11 @@ class MultiModalObjectInitData(AudioInitData):
         for platform in record.urls:
             if "ROOT/" in record.urls[platform]:
                 url = record.urls[platform].split("ROOT/")[1]
+                # Load the asset bundle from the local cache.
+                if ASSET_CACHE_DIRECTORY is not None:
+                    record.urls[platform] = AssetCache.get_default().get_url(
+                        url.replace("puzzle_box_composite", "/puzzle_box_composite"))
+                    continue
                 # Fix the URLs. A few asset bundles have weird URLs.
                 url = join(ASSET_BUNDLES_DIRECTORY, url).replace("\\", "/").replace("puzzle_box_composite",
                                                                                     "/puzzle_box_composite")
@@ -0,0 +1,68 @@
+from typing import Dict, List, Tuple
+from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+
+
+class ObjectInitRecord:
+    """
+    A lightweight row of an [`ObjectInitTable`](object_init_table.md). This has the same fields as [`MultiModalObjectInitData`](multimodal_object_init_data.md) and can be used in its place, but it doesn't have any audio or physics data.
+
+    A record is created whenever the table is iterated or indexed. Modifying a record won't modify the table. To modify the table, call `table.set(index, record)`.
+
+    A `MultiModalObjectInitData` object is created only when `get_commands()` or `get_object_init_data()` is called.
+    """
+
+    __slots__ = ("name", "position", "rotation", "scale_factor", "kinematic", "gravity")
+
+    def __init__(self, name: str, position: Dict[str, float], rotation: Dict[str, float],
+                 scale_factor: Dict[str, float], kinematic: bool, gravity: bool):
+        """
+        :param name: The name of the model.
+        :param position: The position of the object.
+        :param rotation: The rotation of the object as Euler angles or a quaternion.
+        :param scale_factor: The scale factor of the object.
+        :param kinematic: If True, the object is kinematic.
+        :param gravity: If True, the object uses gravity.
+        """
+
+        """:field
+        The name of the model.
+        """
+        self.name: str = name
+        """:field
+        The position of the object.
+        """
+        self.position: Dict[str, float] = position
+        """:field
+        The rotation of the object as Euler angles or a quaternion.
+        """
+        self.rotation: Dict[str, float] = rotation
+        """:field
+        The scale factor of the object.
+        """
+        self.scale_factor: Dict[str, float] = scale_factor
+        """:field
+        If True, the object is kinematic.
+        """
+        self.kinematic: bool = kinematic
+        """:field
+        If True, the object uses gravity.
+        """
+        self.gravity: bool = gravity
+
+    def get_object_init_data(self) -> MultiModalObjectInitData:
+        """
+        :return: New `MultiModalObjectInitData` for this object.
+        """
+
+        object_init_data = MultiModalObjectInitData(name=self.name, scale_factor=self.scale_factor,
+                                                    position=self.position, rotation=self.rotation,
+                                                    kinematic=self.kinematic)
+        object_init_data.gravity = self.gravity
+        return object_init_data
+
+    def get_commands(self) -> Tuple[int, List[dict]]:
+        """
+        :return: Tuple: The ID of the object; a list of commands to create the object.
+        """
+
+        return self.get_object_init_data().get_commands()
@@ -0,0 +1,212 @@
+from typing import List, Union, Iterator, Optional, Dict
+import numpy as np
+from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+from multimodal_challenge.object_init_record import ObjectInitRecord
+
+
+class ObjectInitTable:
+    """
+    Compact initialization data for a list of objects. Instead of a list of [`MultiModalObjectInitData`](multimodal_object_init_data.md) objects (each of which has a dictionary per vector and a reference to its audio data), the data is stored as columns of numpy arrays.
+
+    The table can be used in place of a list of `MultiModalObjectInitData`. Iterating over the table or indexing it returns lightweight [`ObjectInitRecord`](object_init_record.md) rows, which have the same fields and a `get_commands()` function. A `MultiModalObjectInitData` object is created only when `get_commands()` is called:
+
+    ```python
+    from multimodal_challenge.util import load_trial
+    from multimodal_challenge.paths import DATASET_DIRECTORY
+
+    trial = load_trial(directory=DATASET_DIRECTORY.joinpath("mm_kitchen_1a_0"), filename="00000")
+    for object_init_data in trial.object_init_data:
+        object_id, commands = object_init_data.get_commands()
+    ```
+
+    Rotations are stored as `[x, y, z, w]` quaternions. Euler angles are stored with `w = NaN`.
+    """
+
+    def __init__(self, names: List[str], positions: np.array, rotations: np.array, scale_factors: np.array,
+                 kinematic: np.array, gravity: np.array = None):
+        """
+        :param names: The name of the model of each object.
+        :param positions: The position of each object as an `(n, 3)` numpy array.
+        :param rotations: The rotation of each object as an `(n, 4)` numpy array of `[x, y, z, w]` rows.
+        :param scale_factors: The scale factor of each object as an `(n, 3)` numpy array.
+        :param kinematic: Whether each object is kinematic as a boolean numpy array.
+        :param gravity: Whether each object uses gravity as a boolean numpy array. If None, every non-kinematic object uses gravity.
+        """
+
+        """:field
+        The name of the model of each object.
+        """
+        self.names: List[str] = names
+        """:field
+        The position of each object as an `(n, 3)` numpy array.
+        """
+        self.positions: np.array = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        """:field
+        The rotation of each object as an `(n, 4)` numpy array of `[x, y, z, w]` rows. If `w` is NaN, the rotation is Euler angles.
+        """
+        self.rotations: np.array = np.array(rotations, dtype=np.float64).reshape(-1, 4)
+        """:field
+        The scale factor of each object as an `(n, 3)` numpy array.
+        """
+        self.scale_factors: np.array = np.array(scale_factors, dtype=np.float64).reshape(-1, 3)
+        """:field
+        Whether each object is kinematic as a boolean numpy array.
+        """
+        self.kinematic: np.array = np.array(kinematic, dtype=bool)
+        """:field
+        Whether each object uses gravity as a boolean numpy array.
+        """
+        self.gravity: np.array = np.logical_not(self.kinematic) if gravity is None else np.array(gravity, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def __getitem__(self, index: int) -> ObjectInitRecord:
+        if index < 0:
+            index += len(self.names)
+        if index < 0 or index >= len(self.names):
+            raise IndexError(f"Object index {index} is out of range. There are {len(self.names)} objects.")
+        return self._get_record(index=index)
+
+    def __iter__(self) -> Iterator[ObjectInitRecord]:
+        for i in range(len(self.names)):
+            yield self._get_record(index=i)
+
+    def set(self, index: int, object_init_data: Union[MultiModalObjectInitData, ObjectInitRecord]) -> None:
+        """
+        Replace a row of the table.
+
+        :param index: The index of the row.
+        :param object_init_data: The new initialization data of the object.
+        """
+
+        self.names[index] = object_init_data.name
+        self.positions[index] = [object_init_data.position["x"], object_init_data.position["y"],
+                                 object_init_data.position["z"]]
+        self.rotations[index] = ObjectInitTable._get_rotation(rotation=object_init_data.rotation)
+        self.scale_factors[index] = [object_init_data.scale_factor["x"], object_init_data.scale_factor["y"],
+                                     object_init_data.scale_factor["z"]]
+        self.kinematic[index] = object_init_data.kinematic
+        self.gravity[index] = object_init_data.gravity
+
+    def select(self, indices: List[int]) -> "ObjectInitTable":
+        """
+        :param indices: The indices of the rows.
+
+        :return: A new table of only these rows.
+        """
+
+        indices = np.array(indices, dtype=int)
+        return ObjectInitTable(names=[self.names[i] for i in indices],
+                               positions=self.positions[indices],
+                               rotations=self.rotations[indices],
+                               scale_factors=self.scale_factors[indices],
+                               kinematic=self.kinematic[indices],
+                               gravity=self.gravity[indices])
+
+    def copy(self) -> "ObjectInitTable":
+        """
+        :return: A copy of the table.
+        """
+
+        return self.select(indices=list(range(len(self.names))))
+
+    def get_object_init_data(self) -> List[MultiModalObjectInitData]:
+        """
+        :return: New `MultiModalObjectInitData` for each object.
+        """
+
+        return [row.get_object_init_data() for row in self]
+
+    @staticmethod
+    def concatenate(tables: List["ObjectInitTable"]) -> "ObjectInitTable":
+        """
+        :param tables: A list of tables.
+
+        :return: A new table of the rows of every table, in order.
+        """
+
+        names: List[str] = list()
+        for table in tables:
+            names.extend(table.names)
+        return ObjectInitTable(names=names,
+                               positions=np.concatenate([t.positions for t in tables]),
+                               rotations=np.concatenate([t.rotations for t in tables]),
+                               scale_factors=np.concatenate([t.scale_factors for t in tables]),
+                               kinematic=np.concatenate([t.kinematic for t in tables]),
+                               gravity=np.concatenate([t.gravity for t in tables]))
+
+    @staticmethod
+    def from_object_init_data(objects: Union["ObjectInitTable",
+                                             List[Union[dict, MultiModalObjectInitData,
+                                                        ObjectInitRecord]]]) -> "ObjectInitTable":
+        """
+        :param objects: Either a table or a list of objects. Each object is either `MultiModalObjectInitData`, an `ObjectInitRecord`, or a dictionary of `MultiModalObjectInitData` constructor parameters.
+
+        :return: A table of the objects. If `objects` is already a table, it is returned as-is.
+        """
+
+        if isinstance(objects, ObjectInitTable):
+            return objects
+        names: List[str] = list()
+        positions = np.zeros((len(objects), 3))
+        rotations = np.zeros((len(objects), 4))
+        scale_factors = np.ones((len(objects), 3))
+        kinematic = np.zeros(len(objects), dtype=bool)
+        gravity = np.zeros(len(objects), dtype=bool)
+        for i, o in enumerate(objects):
+            if isinstance(o, dict):
+                names.append(o["name"])
+                position: Optional[dict] = o["position"] if "position" in o else None
+                rotation: Optional[dict] = o["rotation"] if "rotation" in o else None
+                scale_factor: Optional[dict] = o["scale_factor"] if "scale_factor" in o else None
+                kinematic[i] = o["kinematic"] if "kinematic" in o else False
+                gravity[i] = not kinematic[i]
+            else:
+                names.append(o.name)
+                position = o.position
+                rotation = o.rotation
+                scale_factor = o.scale_factor
+                kinematic[i] = o.kinematic
+                gravity[i] = o.gravity
+            if position is not None:
+                positions[i] = [position["x"], position["y"], position["z"]]
+            if rotation is None:
+                rotations[i] = [0, 0, 0, 1]
+            else:
+                rotations[i] = ObjectInitTable._get_rotation(rotation=rotation)
+            if scale_factor is not None:
+                scale_factors[i] = [scale_factor["x"], scale_factor["y"], scale_factor["z"]]
+        return ObjectInitTable(names=names, positions=positions, rotations=rotations, scale_factors=scale_factors,
+                               kinematic=kinematic, gravity=gravity)
+
+    def _get_record(self, index: int) -> ObjectInitRecord:
+        """
+        :param index: The index of the row.
+
+        :return: A new record of the row.
+        """
+
+        p = self.positions[index].tolist()
+        r = self.rotations[index].tolist()
+        s = self.scale_factors[index].tolist()
+        if np.isnan(r[3]):
+            rotation = {"x": r[0], "y": r[1], "z": r[2]}
+        else:
+            rotation = {"w": r[3], "x": r[0], "y": r[1], "z": r[2]}
+        return ObjectInitRecord(name=self.names[index],
+                                position={"x": p[0], "y": p[1], "z": p[2]},
+                                rotation=rotation,
+                                scale_factor={"x": s[0], "y": s[1], "z": s[2]},
+                                kinematic=bool(self.kinematic[index]),
+                                gravity=bool(self.gravity[index]))
+
+    @staticmethod
+    def _get_rotation(rotation: Dict[str, float]) -> List[float]:
+        """
+        :param rotation: A rotation as Euler angles or a quaternion.
+
+        :return: The rotation as an `[x, y, z, w]` row. If the rotation is Euler angles, `w` is NaN.
+        """
+
+        return [rotation["x"], rotation["y"], rotation["z"], rotation["w"] if "w" in rotation else np.nan]
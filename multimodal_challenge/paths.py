@@ -1,6 +1,7 @@
 from pathlib import Path
 from pkg_resources import resource_filename
 from os import environ
+from typing import Optional
 
 """
 Paths to data files in this Python module.
@@ -16,6 +17,16 @@ if __asset_bundles_key in environ:
 else:
     ASSET_BUNDLES_DIRECTORY = "https://tdw-public.s3.amazonaws.com"
 
+__asset_cache_key = "MULTIMODAL_ASSET_CACHE"
+# The path to the local asset bundle cache. If None, asset bundles are loaded from ASSET_BUNDLES_DIRECTORY.
+if __asset_cache_key in environ:
+    ASSET_CACHE_DIRECTORY: Optional[Path] = Path(environ[__asset_cache_key]).expanduser()
+else:
+    ASSET_CACHE_DIRECTORY: Optional[Path] = None
+__asset_cache_size_key = "MULTIMODAL_ASSET_CACHE_SIZE"
+# The maximum size of the local asset bundle cache in gigabytes.
+ASSET_CACHE_SIZE: float = float(environ[__asset_cache_size_key]) if __asset_cache_size_key in environ else 20
+
 __dataset_directory_key = "MULTIMODAL_DATASET"
 if __dataset_directory_key in environ:
     __data_dir: str = environ[__dataset_directory_key]
@@ -59,3 +70,5 @@ ENV_AUDIO_MATERIALS_PATH = AUDIO_DATASET_DIRECTORY.joinpath("audio_materials.jso
 DISTRACTOR_OBJECTS_PATH = AUDIO_DATASET_DIRECTORY.joinpath("distractor_objects.txt")
 # The path to the Magnebot occupancy maps.
 MAGNEBOT_OCCUPANCY_MAPS_DIRECTORY = AUDIO_DATASET_DIRECTORY.joinpath("magnebot_occupancy_maps")
+# The path to the cached Magnebot and object candidate positions.
+CANDIDATE_POSITIONS_DIRECTORY = AUDIO_DATASET_DIRECTORY.joinpath("candidate_positions")
@@ -0,0 +1,231 @@
+from typing import List, Dict, Tuple, Union
+import numpy as np
+from magnebot.transform import Transform
+
+
+class SpatialIndex:
+    """
+    A spatial index of the objects in a scene for proximity queries. Objects are sorted into a uniform grid of cells on the xz plane, so each query only checks the objects in nearby cells.
+
+    `MultiModal` creates a spatial index of every object at the end of `init_scene()`. Objects can move; to update the index with the current positions of the objects, call `update()`:
+
+    ```python
+    from multimodal_challenge.multimodal import MultiModal
+
+    m = MultiModal()
+    m.init_scene(scene="mm_kitchen_1a", layout=0, trial=57)
+    # The objects within 1 meter of the Magnebot.
+    print(m.spatial_index.get_within_radius(position=m.state.magnebot_transform.position, radius=1))
+    m.move_by(1)
+    m.spatial_index.update(object_transforms=m.state.object_transforms)
+    # The 3 objects nearest to the target object.
+    print(m.spatial_index.get_nearest(position=m.state.object_transforms[m.target_object_id].position, k=3))
+    ```
+
+    Each query returns a list of tuples: `(object_id, name)`. Distances are measured between positions in 3D space.
+    """
+
+    def __init__(self, object_ids: List[int], names: List[str], positions: np.array, sizes: np.array = None,
+                 cell_size: float = 1):
+        """
+        :param object_ids: The ID of each object.
+        :param names: The name of the model of each object.
+        :param positions: The position of each object as an `(n, 3)` numpy array.
+        :param sizes: The size of the bounds of each object as an `(n, 3)` numpy array. If None, the size of each object is 0.
+        :param cell_size: The width of each cell of the grid in meters.
+        """
+
+        """:field
+        The ID of each object as a numpy array.
+        """
+        self.object_ids: np.array = np.array(object_ids, dtype=int)
+        """:field
+        The name of the model of each object.
+        """
+        self.names: List[str] = names
+        """:field
+        The position of each object as an `(n, 3)` numpy array.
+        """
+        self.positions: np.array = np.array(positions, dtype=np.float64).reshape(-1, 3)
+        """:field
+        The radius of the footprint of each object on the xz plane (half of the diagonal of its bounds) as a numpy array.
+        """
+        if sizes is None:
+            self.footprints: np.array = np.zeros(len(self.object_ids))
+        else:
+            self.footprints: np.array = np.linalg.norm(np.array(sizes, dtype=np.float64).reshape(-1, 3)[:, [0, 2]],
+                                                       axis=1) / 2
+        """:field
+        The width of each cell of the grid in meters.
+        """
+        self.cell_size: float = cell_size
+        # The index of each object. Key = The object ID.
+        self._indices: Dict[int, int] = {int(o): i for i, o in enumerate(self.object_ids)}
+        # The indices of the objects in each cell. Key = The (x, z) coordinates of the cell.
+        self._cells: Dict[Tuple[int, int], np.array] = dict()
+        # The minimum and maximum cell coordinates.
+        self._cell_min: np.array = np.zeros(2, dtype=int)
+        self._cell_max: np.array = np.zeros(2, dtype=int)
+        self._build()
+
+    def update(self, object_transforms: Dict[int, Union[Transform, np.array]]) -> None:
+        """
+        Update the positions of the objects and rebuild the grid. Objects that aren't in the index are ignored.
+
+        :param object_transforms: The transform or position of each object. Key = The object ID. For example: `m.state.object_transforms`.
+        """
+
+        for object_id in object_transforms:
+            if object_id in self._indices:
+                t = object_transforms[object_id]
+                self.positions[self._indices[object_id]] = t.position if isinstance(t, Transform) else t
+        self._build()
+
+    def get_within_radius(self, position: np.array, radius: float,
+                          include_footprints: bool = False) -> List[Tuple[int, str]]:
+        """
+        :param position: The position as an `[x, y, z]` numpy array.
+        :param radius: The radius in meters.
+        :param include_footprints: If True, include objects whose footprint is within the radius even if their position isn't.
+
+        :return: A list of tuples `(object_id, name)` of the objects within the radius, sorted by distance.
+        """
+
+        position = np.array(position, dtype=np.float64)
+        padding = float(np.max(self.footprints)) if include_footprints and len(self.footprints) > 0 else 0
+        indices = self._get_candidates(position=position, distance=radius + padding)
+        distances = np.linalg.norm(self.positions[indices] - position, axis=1)
+        if include_footprints:
+            distances -= self.footprints[indices]
+        within = np.flatnonzero(distances <= radius)
+        within = within[np.argsort(distances[within], kind="stable")]
+        return self._get_results(indices=indices[within])
+
+    def get_nearest(self, position: np.array, k: int = 1) -> List[Tuple[int, str]]:
+        """
+        :param position: The position as an `[x, y, z]` numpy array.
+        :param k: The number of objects.
+
+        :return: A list of tuples `(object_id, name)` of the `k` objects nearest to the position, sorted by distance.
+        """
+
+        position = np.array(position, dtype=np.float64)
+        k = min(k, len(self.object_ids))
+        if k <= 0:
+            return []
+        ring = 0
+        while True:
+            # Objects outside of the checked cells are always farther away than this.
+            distance = ring * self.cell_size
+            indices = self._get_candidates(position=position, distance=distance)
+            distances = np.linalg.norm(self.positions[indices] - position, axis=1)
+            covers_grid = self._covers_grid(position=position, distance=distance)
+            if covers_grid or np.count_nonzero(distances <= distance) >= k:
+                nearest = np.argsort(distances, kind="stable")[:k]
+                return self._get_results(indices=indices[nearest])
+            ring += 1
+
+    def get_in_box(self, minimum: np.array, maximum: np.array) -> List[Tuple[int, str]]:
+        """
+        :param minimum: The minimum corner of an axis-aligned box as an `[x, y, z]` numpy array.
+        :param maximum: The maximum corner of an axis-aligned box as an `[x, y, z]` numpy array.
+
+        :return: A list of tuples `(object_id, name)` of the objects whose positions are in the box, sorted by object ID.
+        """
+
+        minimum = np.array(minimum, dtype=np.float64)
+        maximum = np.array(maximum, dtype=np.float64)
+        if len(self.object_ids) == 0:
+            return []
+        cell_min = np.maximum(self._get_cell(minimum), self._cell_min)
+        cell_max = np.minimum(self._get_cell(maximum), self._cell_max)
+        indices = self._get_indices(cell_min=cell_min, cell_max=cell_max)
+        p = self.positions[indices]
+        indices = indices[np.all((p >= minimum) & (p <= maximum), axis=1)]
+        indices = indices[np.argsort(self.object_ids[indices], kind="stable")]
+        return self._get_results(indices=indices)
+
+    def _build(self) -> None:
+        """
+        Sort the objects into cells.
+        """
+
+        self._cells.clear()
+        if len(self.object_ids) == 0:
+            return
+        cells = np.floor(self.positions[:, [0, 2]] / self.cell_size).astype(int)
+        self._cell_min = np.min(cells, axis=0)
+        self._cell_max = np.max(cells, axis=0)
+        keys, inverse = np.unique(cells, axis=0, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        order = np.argsort(inverse, kind="stable")
+        starts = np.searchsorted(inverse[order], np.arange(len(keys) + 1))
+        for i, key in enumerate(keys.tolist()):
+            self._cells[(key[0], key[1])] = order[starts[i]:starts[i + 1]]
+
+    def _get_cell(self, position: np.array) -> np.array:
+        """
+        :param position: A position as an `[x, y, z]` numpy array.
+
+        :return: The `[x, z]` coordinates of the cell that contains the position.
+        """
+
+        return np.floor(position[[0, 2]] / self.cell_size).astype(int)
+
+    def _get_candidates(self, position: np.array, distance: float) -> np.array:
+        """
+        :param position: A position as an `[x, y, z]` numpy array.
+        :param distance: A distance in meters.
+
+        :return: The indices of the objects in every cell within the distance of the position on the xz plane.
+        """
+
+        if len(self.object_ids) == 0:
+            return np.zeros(0, dtype=int)
+        cell_min = np.maximum(self._get_cell(position - distance), self._cell_min)
+        cell_max = np.minimum(self._get_cell(position + distance), self._cell_max)
+        return self._get_indices(cell_min=cell_min, cell_max=cell_max)
+
+    def _get_indices(self, cell_min: np.array, cell_max: np.array) -> np.array:
+        """
+        :param cell_min: The minimum `[x, z]` cell coordinates.
+        :param cell_max: The maximum `[x, z]` cell coordinates.
+
+        :return: The indices of the objects in every cell in the range.
+        """
+
+        if np.any(cell_min > cell_max):
+            return np.zeros(0, dtype=int)
+        # Check each occupied cell if that's faster than checking each cell in the range.
+        if np.prod(cell_max - cell_min + 1) > len(self._cells):
+            indices = [v for k, v in self._cells.items() if cell_min[0] <= k[0] <= cell_max[0] and
+                       cell_min[1] <= k[1] <= cell_max[1]]
+        else:
+            indices = list()
+            for x in range(cell_min[0], cell_max[0] + 1):
+                for z in range(cell_min[1], cell_max[1] + 1):
+                    if (x, z) in self._cells:
+                        indices.append(self._cells[(x, z)])
+        if len(indices) == 0:
+            return np.zeros(0, dtype=int)
+        return np.concatenate(indices)
+
+    def _covers_grid(self, position: np.array, distance: float) -> bool:
+        """
+        :param position: A position as an `[x, y, z]` numpy array.
+        :param distance: A distance in meters.
+
+        :return: True if every occupied cell is within the distance of the position on the xz plane.
+        """
+
+        return bool(np.all(self._get_cell(position - distance) <= self._cell_min) and
+                    np.all(self._get_cell(position + distance) >= self._cell_max))
+
+    def _get_results(self, indices: np.array) -> List[Tuple[int, str]]:
+        """
+        :param indices: The indices of the objects.
+
+        :return: A list of tuples `(object_id, name)`.
+        """
+
+        return [(int(self.object_ids[i]), self.names[i]) for i in indices]
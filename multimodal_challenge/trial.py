@@ -1,34 +1,39 @@
-from typing import List
+from typing import List, Optional, Tuple, Union
 import numpy as np
 from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+from multimodal_challenge.object_init_table import ObjectInitTable
+from multimodal_challenge.base_layout import BaseLayout
 
 
 class Trial:
     """
     Data used to initialize a trial. In a trial, the object has already been dropped and generated audio.
     This class will place the Magnebot and every object in the scene at the position at which it stopped moving.
+
+    If `scene_layout` isn't None, the trial data is saved as a delta against the [`BaseLayout`](base_layout.md) of the scene_layout combination. When the trial data is loaded, the delta is resolved against the cached base layout, so `object_init_data` is always the full list of objects.
     """
 
-    def __init__(self, object_init_data: List[MultiModalObjectInitData], target_object_index: int,
-                 magnebot_position: np.array, magnebot_rotation: np.array):
+    def __init__(self, object_init_data: Union[ObjectInitTable, List[Union[dict, MultiModalObjectInitData]]],
+                 target_object_index: int,
+                 magnebot_position: np.array, magnebot_rotation: np.array, target_object_trajectory: np.array = None,
+                 scene_layout: str = None, base_indices: List[int] = None):
         """
         :param magnebot_position: The position of the Magnebot as an `[x, y, z]` numpy array.
         :param magnebot_rotation: The rotation of the Magnebot as an `[x, y, z, w]` numpy array.
-        :param object_init_data: [Initialization data](multimodal_object_init_data.md) for each object in the scene.
+        :param object_init_data: [Initialization data](multimodal_object_init_data.md) for each object in the scene. This can be a list of `MultiModalObjectInitData`, a list of dictionaries, or an [`ObjectInitTable`](object_init_table.md).
         :param target_object_index: The index of the target object in `object_init_data`.
+        :param target_object_trajectory: The trajectory of the target object while it fell as an `(n, 4)` numpy array of `[frame, x, y, z]` rows. If None, the trajectory is empty.
+        :param scene_layout: The scene_layout combination of the base layout, for example `"mm_kitchen_1a_0"`. If None, the trial doesn't have a base layout.
+        :param base_indices: If not None, `object_init_data` is a delta against the base layout and this is the index of each of its objects in the base layout (-1 if the object isn't a scene object). If None, `object_init_data` is the full list of objects.
         """
 
-        if isinstance(object_init_data[0], dict):
-            """:field
-            Initialization data for each object in the scene. Includes the target object.
-            """
-            self.object_init_data: List[MultiModalObjectInitData] = list()
-            o: dict
-            for o in object_init_data:
-                a = MultiModalObjectInitData(**o)
-                self.object_init_data.append(a)
-        else:
-            self.object_init_data: List[MultiModalObjectInitData] = object_init_data
+        """:field
+        Initialization data for each object in the scene as an [`ObjectInitTable`](object_init_table.md). Iterate over the table to get the data of each object. Includes the target object. If there is a base layout, this is every scene object in the order of the base layout, followed by the target object and the distractors.
+        """
+        self.object_init_data: ObjectInitTable = ObjectInitTable.from_object_init_data(objects=object_init_data)
+        if scene_layout is not None and base_indices is not None:
+            self.object_init_data = BaseLayout.decode(scene_layout=scene_layout, object_init_data=self.object_init_data,
+                                                      base_indices=base_indices)
         """:field
         The index of the target object in `object_init_data`.
         """
@@ -41,3 +46,23 @@ class Trial:
         The rotation of the Magnebot as an `[x, y, z, w]` numpy array.
         """
         self.magnebot_rotation: np.array = np.array(magnebot_rotation)
+        """:field
+        The trajectory of the target object while it fell as an `(n, 4)` numpy array of `[frame, x, y, z]` rows. This is empty if the trial was generated without a trajectory.
+        """
+        if target_object_trajectory is None:
+            self.target_object_trajectory: np.array = np.zeros((0, 4))
+        else:
+            self.target_object_trajectory: np.array = np.array(target_object_trajectory).reshape(-1, 4)
+        """:field
+        The scene_layout combination of the base layout, for example `"mm_kitchen_1a_0"`. If None, the trial doesn't have a base layout and the full list of objects is saved.
+        """
+        self.scene_layout: Optional[str] = scene_layout
+
+    def get_delta(self) -> Tuple[ObjectInitTable, Optional[List[int]]]:
+        """
+        :return: Tuple: A table of the objects that are saved, and the index of each of these objects in the base layout (-1 if the object isn't a scene object). If there isn't a base layout, this is every object and None.
+        """
+
+        if self.scene_layout is None:
+            return self.object_init_data, None
+        return BaseLayout.encode(scene_layout=self.scene_layout, object_init_data=self.object_init_data)
@@ -1,15 +1,21 @@
 from packaging import version
 from json import loads
-from typing import List, Dict
+from contextlib import contextmanager
+from typing import List, Dict, Tuple, Iterator
+from platform import system
+from pathlib import Path
 from pkg_resources import get_distribution
 from os.path import join
-from tdw.librarian import SceneLibrarian
+from tdw.librarian import SceneLibrarian, ModelLibrarian
 from tdw.tdw_utils import TDWUtils
 from tdw.version import __version__
 from tdw.release.pypi import PyPi
 from multimodal_challenge.paths import TARGET_OBJECTS_PATH, OBJECT_INIT_DIRECTORY, SCENE_LIBRARY_PATH, \
-    ASSET_BUNDLES_DIRECTORY
-from multimodal_challenge.multimodal_object_init_data import MultiModalObjectInitData
+    ASSET_BUNDLES_DIRECTORY, ASSET_CACHE_DIRECTORY, OBJECT_LIBRARY_PATH, DATASET_DIRECTORY
+from multimodal_challenge.asset_cache import AssetCache
+from multimodal_challenge.trial import Trial
+from multimodal_challenge.base_layout import BaseLayout
+from multimodal_challenge.columnar_encoder import ColumnarEncoder
 
 # A list of the names of target objects models.
 TARGET_OBJECTS: List[str] = TARGET_OBJECTS_PATH.read_text(encoding="utf-8").split("\n")
@@ -30,6 +36,10 @@ def get_scene_librarian() -> SceneLibrarian:
         for platform in lib.records[i].urls:
             if "ROOT/" in lib.records[i].urls[platform]:
                 url = lib.records[i].urls[platform].split("ROOT/")[1]
+                # Load the asset bundle from the local cache.
+                if ASSET_CACHE_DIRECTORY is not None:
+                    lib.records[i].urls[platform] = AssetCache.get_default().get_url(url)
+                    continue
                 url = join(ASSET_BUNDLES_DIRECTORY, url).replace("\\", "/")
                 if not url.startswith("http"):
                     url = "file:///" + url
@@ -45,10 +55,9 @@ def get_object_init_commands(scene: str, layout: int) -> List[dict]:
     :return: A list of commands to instantiate objects.
     """
 
-    data = loads(OBJECT_INIT_DIRECTORY.joinpath(f"{scene}_{layout}.json").read_text(encoding="utf-8"))
     commands = list()
-    for o in data:
-        commands.extend(MultiModalObjectInitData(**o).get_commands()[1])
+    for o in BaseLayout.get_object_init_data(scene_layout=f"{scene}_{layout}"):
+        commands.extend(o.get_commands()[1])
     return commands
 
 
@@ -81,6 +90,91 @@ def get_trial_filename(trial: int) -> str:
     return TDWUtils.zero_padding(trial, 5)
 
 
+def get_trial_data_path(directory: Path, filename: str) -> Path:
+    """
+    :param directory: The scene_layout directory.
+    :param filename: The filename of the trial without an extension, for example `"00000"`.
+
+    :return: The path to the trial data. This is the .bin file if it exists and otherwise the .json file.
+    """
+
+    path = directory.joinpath(f"{filename}{ColumnarEncoder.EXTENSION}")
+    if path.exists():
+        return path
+    return directory.joinpath(f"{filename}.json")
+
+
+def load_trial(directory: Path, filename: str) -> Trial:
+    """
+    Load trial data from either a .bin file or a .json file. If both exist, the .bin file is loaded.
+
+    :param directory: The scene_layout directory.
+    :param filename: The filename of the trial without an extension, for example `"00000"`.
+
+    :return: The `Trial`.
+    """
+
+    path = get_trial_data_path(directory=directory, filename=filename)
+    if path.suffix == ColumnarEncoder.EXTENSION:
+        return ColumnarEncoder.read_trial(path=path)
+    return Trial(**loads(path.read_text(encoding="utf-8")))
+
+
+def get_asset_bundle_paths(trials: List[Tuple[str, int, int]], directory: Path = DATASET_DIRECTORY) -> List[str]:
+    """
+    Get the scene and model asset bundles of upcoming trials, for example to prefetch them with an [`AssetCache`](asset_cache.md).
+
+    :param trials: A list of tuples: The name of the scene, the layout variant, and the trial number.
+    :param directory: The root dataset directory.
+
+    :return: The paths of the asset bundles relative to the root of the asset bundle server, without duplicates.
+    """
+
+    scene_lib = SceneLibrarian(library=str(SCENE_LIBRARY_PATH.resolve()))
+    model_lib = ModelLibrarian(library=str(OBJECT_LIBRARY_PATH.resolve()))
+    paths: List[str] = list()
+    for scene, layout, trial_number in trials:
+        trial = load_trial(directory=directory.joinpath(f"{scene}_{layout}"),
+                           filename=get_trial_filename(trial=trial_number))
+        records = [scene_lib.get_record(scene)]
+        records.extend([model_lib.get_record(name) for name in sorted(set(trial.object_init_data.names))])
+        for record in records:
+            if record is None or "ROOT/" not in record.urls[system()]:
+                continue
+            # A few asset bundles have weird URLs.
+            path = record.urls[system()].split("ROOT/")[1].replace("puzzle_box_composite", "/puzzle_box_composite")
+            if path not in paths:
+                paths.append(path)
+    return paths
+
+
+@contextmanager
+def atomic_write(path: Path) -> Iterator[Path]:
+    """
+    Write a file atomically. Write to the temporary path that this yields; when the `with` block exits, the temporary file replaces the file. The file is therefore either complete or unchanged. If the block raises an exception, the temporary file is removed.
+
+    ```python
+    from pathlib import Path
+    from multimodal_challenge.util import atomic_write
+
+    with atomic_write(Path("manifest.json")) as temp_path:
+        temp_path.write_text("{}", encoding="utf-8")
+    ```
+
+    :param path: The path to the file.
+
+    :return: The temporary path in the same directory as `path`.
+    """
+
+    temp_path = path.parent.joinpath(path.name + ".tmp")
+    try:
+        yield temp_path
+        temp_path.replace(path)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
 def check_pip_version() -> bool:
     """
     Check the version of TDW and Magenbot.
@@ -8,7 +8,7 @@ readme = re.sub(r'!\[\]\((.*?)\)', r'https://raw.githubusercontent.com/alters-mi
 
 setup(
     name='multimodal_challenge',
-    version="0.4.5",
+    version="0.5.0",
     description='Multi-modal challenge for TDW and the Magnebot API.',
     long_description=readme,
     long_description_content_type='text/markdown',
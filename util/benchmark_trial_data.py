@@ -0,0 +1,49 @@
+from json import dumps, loads
+from pathlib import Path
+from argparse import ArgumentParser
+from timeit import timeit
+import numpy as np
+from tqdm import tqdm
+from multimodal_challenge.paths import DATASET_DIRECTORY
+from multimodal_challenge.util import load_trial
+from multimodal_challenge.encoder import Encoder
+from multimodal_challenge.trial import Trial
+from multimodal_challenge.columnar_encoder import ColumnarEncoder
+from multimodal_challenge.dataset.trial_manifest import TrialManifest
+
+"""
+Compare the size and decoding time of the trial data of the dataset as .bin files (see `ColumnarEncoder`) and as .json files. Each trial is loaded and then encoded in both formats in memory, so this doesn't depend on which format the dataset was written in. Decoding times include resolving the delta against the base layout and exclude disk I/O.
+"""
+
+parser = ArgumentParser()
+parser.add_argument("--directory", type=str, default=str(DATASET_DIRECTORY.resolve()), help="The dataset directory.")
+parser.add_argument("--max_trials", type=int, default=100,
+                    help="The maximum number of trials per scene_layout combination. If -1, compare every trial.")
+parser.add_argument("--number", type=int, default=100, help="The number of times each trial is decoded.")
+args = parser.parse_args()
+
+print("scene_layout\ttrials\tjson_bytes\tbin_bytes\tjson_ms\tbin_ms")
+# Per trial: .json size, .bin size, .json decoding time, .bin decoding time.
+totals = list()
+for directory in sorted(Path(args.directory).iterdir()):
+    if not directory.is_dir() or not directory.joinpath(TrialManifest.FILENAME).exists():
+        continue
+    filenames = TrialManifest(directory=directory).trials
+    if args.max_trials >= 0:
+        filenames = filenames[:args.max_trials]
+    if len(filenames) == 0:
+        continue
+    results = list()
+    for filename in tqdm(filenames, desc=directory.name, leave=False):
+        trial = load_trial(directory=directory, filename=filename)
+        json_data = dumps(trial, cls=Encoder).encode("utf-8")
+        bin_data = ColumnarEncoder.encode_trial(trial=trial)
+        json_time = timeit(lambda: Trial(**loads(json_data)), number=args.number) / args.number
+        bin_time = timeit(lambda: ColumnarEncoder.decode_trial(data=bin_data), number=args.number) / args.number
+        results.append([len(json_data), len(bin_data), json_time * 1000, bin_time * 1000])
+    means = np.mean(results, axis=0)
+    print(f"{directory.name}\t{len(results)}\t{means[0]:.0f}\t{means[1]:.0f}\t{means[2]:.3f}\t{means[3]:.3f}")
+    totals.extend(results)
+if len(totals) > 0:
+    means = np.mean(totals, axis=0)
+    print(f"Trials: {len(totals)} Size: {means[0] / means[1]:.1f}x smaller Decoding: {means[2] / means[3]:.1f}x faster")
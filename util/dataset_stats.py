@@ -0,0 +1,37 @@
+from pathlib import Path
+from argparse import ArgumentParser
+from multimodal_challenge.paths import DATASET_DIRECTORY
+from multimodal_challenge.dataset.dataset_stats import DatasetStats
+
+"""
+Update the cached per-trial statistics of the dataset and print a summary of a column per group.
+
+Example: `python3 util/dataset_stats.py --column audio_duration --by target_model`
+
+If the column isn't numeric (for example, `target_model`), print the number of trials per value instead.
+"""
+
+parser = ArgumentParser()
+parser.add_argument("--directory", type=str, default=str(DATASET_DIRECTORY.resolve()), help="The dataset directory.")
+parser.add_argument("--processes", type=int, default=None,
+                    help="The number of processes. If not included, use every CPU.")
+parser.add_argument("--column", type=str, default="target_distance", help="The column to summarize.")
+parser.add_argument("--by", type=str, default="scene", help="The column to group by.")
+args = parser.parse_args()
+
+stats = DatasetStats(directory=Path(args.directory))
+num_updated = stats.update(processes=args.processes)
+for error in stats.errors:
+    print(error)
+print(f"Trials: {len(stats.columns['key'])} Updated: {num_updated} Errors: {len(stats.errors)}")
+if stats.columns[args.column].dtype.kind == "U":
+    summary = stats.count(column=args.column, by=args.by)
+    print(f"{args.by}\t{args.column}\tcount")
+    for group, value, count in zip(summary["group"], summary["value"], summary["count"]):
+        print(str(group) + "\t" + str(value) + "\t" + str(count))
+else:
+    summary = stats.summarize(column=args.column, by=args.by)
+    keys = ["count", "mean", "std", "min", "median", "max"]
+    print(args.by + "\t" + "\t".join(keys))
+    for i in range(len(summary["group"])):
+        print(str(summary["group"][i]) + "\t" + "\t".join([f"{summary[k][i]:.4g}" for k in keys]))
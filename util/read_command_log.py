@@ -0,0 +1,29 @@
+from json import dumps
+from pathlib import Path
+from argparse import ArgumentParser
+from multimodal_challenge.paths import DATASET_DIRECTORY
+from multimodal_challenge.dataset.command_log import CommandLog
+
+"""
+Decode a command log written by `dataset.py --log` and print each logged list of commands as a line of JSON.
+"""
+
+parser = ArgumentParser()
+parser.add_argument("--directory", type=str, default=str(DATASET_DIRECTORY.joinpath("log").resolve()),
+                    help="The log directory.")
+parser.add_argument("--start", type=int, default=0, help="Don't print commands sent before this frame.")
+parser.add_argument("--end", type=int, default=-1,
+                    help="Don't print commands sent after this frame. If -1, print every frame.")
+parser.add_argument("--type", type=str, default="", help="If not empty, only print commands of this type.")
+args = parser.parse_args()
+
+for frame, commands in CommandLog.read(directory=Path(args.directory)):
+    if frame < args.start:
+        continue
+    if 0 <= args.end < frame:
+        break
+    if args.type != "":
+        commands = [c for c in commands if c["$type"] == args.type]
+        if len(commands) == 0:
+            continue
+    print(dumps({"frame": frame, "commands": commands}))
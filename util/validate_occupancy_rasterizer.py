@@ -0,0 +1,49 @@
+from pathlib import Path
+from argparse import ArgumentParser
+from typing import Dict
+import numpy as np
+from tqdm import tqdm
+from multimodal_challenge.paths import DATASET_DIRECTORY
+from multimodal_challenge.util import load_trial
+from multimodal_challenge.dataset.trial_manifest import TrialManifest
+from multimodal_challenge.dataset.occupancy_rasterizer import OccupancyRasterizer
+
+"""
+Compare occupancy maps created by `OccupancyRasterizer` to the occupancy maps in the dataset, which were created with raycasts. For each scene_layout combination, print the mean agreement (the fraction of cells with the same value) and the number of cells that are incorrectly free, occupied, or out of bounds.
+"""
+
+parser = ArgumentParser()
+parser.add_argument("--directory", type=str, default=str(DATASET_DIRECTORY.resolve()), help="The dataset directory.")
+parser.add_argument("--max_trials", type=int, default=-1,
+                    help="The maximum number of trials per scene_layout combination. If -1, compare every trial.")
+parser.add_argument("--no_scene_map", action="store_true",
+                    help="Don't use the scene's occupancy map to find walls and out-of-bounds cells.")
+args = parser.parse_args()
+
+keys = ["false_free", "false_occupied", "false_out_of_bounds"]
+agreements = list()
+print("scene_layout\ttrials\tagreement\t" + "\t".join(keys))
+for directory in sorted(Path(args.directory).iterdir()):
+    if not directory.is_dir() or not directory.joinpath(TrialManifest.FILENAME).exists():
+        continue
+    scene, layout = directory.name.rsplit("_", 1)
+    rasterizer = OccupancyRasterizer(scene=scene, layout=int(layout), use_scene_map=not args.no_scene_map)
+    filenames = TrialManifest(directory=directory).trials
+    if args.max_trials >= 0:
+        filenames = filenames[:args.max_trials]
+    if len(filenames) == 0:
+        continue
+    totals: Dict[str, int] = {k: 0 for k in keys}
+    scene_layout_agreements = list()
+    for filename in tqdm(filenames, desc=directory.name, leave=False):
+        trial = load_trial(directory=directory, filename=filename)
+        occupancy_map = np.load(str(directory.joinpath(f"{filename}.npy").resolve()))
+        result = rasterizer.validate(occupancy_map=occupancy_map, objects=trial.object_init_data)
+        scene_layout_agreements.append(result["agreement"])
+        for k in keys:
+            totals[k] += result[k]
+    agreements.extend(scene_layout_agreements)
+    print(f"{directory.name}\t{len(filenames)}\t{np.mean(scene_layout_agreements):.4f}\t" +
+          "\t".join([str(totals[k]) for k in keys]))
+if len(agreements) > 0:
+    print(f"Trials: {len(agreements)} Mean agreement: {np.mean(agreements):.4f} Minimum: {np.min(agreements):.4f}")
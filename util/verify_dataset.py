@@ -0,0 +1,46 @@
+from pathlib import Path
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+import numpy as np
+from tqdm import tqdm
+from multimodal_challenge.paths import DATASET_DIRECTORY, OCCUPANCY_MAPS_DIRECTORY
+from multimodal_challenge.dataset.trial_manifest import TrialManifest
+
+"""
+Verify every completed trial in the dataset in parallel. For each trial in each scene_layout's manifest, check that the trial data can be loaded, that the .wav file has a valid header, and that the occupancy map has the expected shape.
+"""
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--directory", type=str, default=str(DATASET_DIRECTORY.resolve()),
+                        help="The dataset directory.")
+    parser.add_argument("--processes", type=int, default=None,
+                        help="The number of processes. If not included, use every CPU.")
+    args = parser.parse_args()
+
+    # Get every trial in every manifest.
+    tasks: List[Tuple[Path, str, Optional[Tuple[int, int]]]] = list()
+    for directory in sorted(Path(args.directory).iterdir()):
+        if not directory.is_dir() or not directory.joinpath(TrialManifest.FILENAME).exists():
+            continue
+        manifest = TrialManifest(directory=directory)
+        # Every occupancy map of a scene_layout combination has the same shape as the scene's occupancy map.
+        occupancy_map_path = OCCUPANCY_MAPS_DIRECTORY.joinpath(f"{directory.name}.npy")
+        if occupancy_map_path.exists():
+            occupancy_map_shape = np.load(str(occupancy_map_path.resolve()), mmap_mode="r").shape
+        else:
+            occupancy_map_shape = None
+        if 0 <= manifest.num_trials != manifest.get_num_completed():
+            print(f"{directory}: {manifest.get_num_completed()} of {manifest.num_trials} trials are complete.")
+        for filename in manifest.trials:
+            tasks.append((directory, filename, occupancy_map_shape))
+
+    num_problems = 0
+    with ProcessPoolExecutor(max_workers=args.processes) as executor:
+        futures = [executor.submit(TrialManifest.verify_trial, *task) for task in tasks]
+        for future in tqdm(futures):
+            for problem in future.result():
+                tqdm.write(problem)
+                num_problems += 1
+    print(f"Verified {len(tasks)} trials. Problems: {num_problems}")